@@ -1,8 +1,6 @@
-import os
 import json
 
 from django.db import IntegrityError
-from django.http import HttpResponse
 
 from dlkit.runtime.errors import *
 from dlkit.runtime.primitives import Type
@@ -12,6 +10,7 @@ from rest_framework.renderers import BrowsableAPIRenderer
 
 from utilities import assessment as autils
 from utilities import general as gutils
+from utilities import search as sutils
 from producer.views import ProducerAPIViews, DLJSONRenderer
 
 
@@ -239,6 +238,8 @@ class ItemsList(ProducerAPIViews):
                     afc = autils.set_answer_form_genus_and_feedback(answer, afc)
                     new_answer = bank.create_answer(afc)
 
+            sutils.invalidate_search_caches(bank.ident)
+
             full_item = bank.get_item(new_item.ident)
             data = gutils.convert_dl_object(full_item)
             return gutils.CreatedResponse(data)
@@ -271,6 +272,8 @@ class ItemDetails(ProducerAPIViews):
                                           object_type='item',
                                           bank_id=None)
             data = bank.delete_item(gutils.clean_id(item_id))
+            gutils.forget_object_catalog_id(item_id)
+            sutils.invalidate_search_caches(bank.ident)
             return gutils.DeletedResponse(data)
         except PermissionDenied as ex:
             gutils.handle_exceptions(ex)
@@ -374,6 +377,8 @@ class ItemDetails(ProducerAPIViews):
                             afc = autils.update_answer_form(answer, afc)
                         bank.create_answer(afc)
 
+            sutils.invalidate_search_caches(bank.ident)
+
             full_item = bank.get_item(gutils.clean_id(item_id))
 
             data = gutils.convert_dl_object(full_item)
@@ -398,13 +403,7 @@ class ItemDownload(ProducerAPIViews):
 
             filename, olx = item.export_standalone_olx()
 
-            response = HttpResponse(content_type="application/tar")
-            response['Content-Disposition'] = 'attachment; filename=%s' % filename
-            olx.seek(0, os.SEEK_END)
-            response.write(olx.getvalue())
-            olx.close()
-
-            return response
+            return gutils.get_olx_download_response(filename, olx)
         except (PermissionDenied, InvalidArgument, NotFound) as ex:
             gutils.handle_exceptions(ex)
 
@@ -84,6 +84,7 @@ class GradeSystemDetails(ProducerAPIViews):
                                                      gradesystem_id,
                                                      'grade_system')
             gradebook.delete_grade_system(gutils.clean_id(gradesystem_id))
+            gutils.forget_object_catalog_id(gradesystem_id)
 
             return gutils.DeletedResponse()
         except (PermissionDenied, InvalidArgument) as ex:
@@ -200,6 +201,7 @@ class GradebookColumnDetails(ProducerAPIViews):
                                                      column_id,
                                                      'gradebook_column')
             gradebook.delete_gradebook_column(gutils.clean_id(column_id))
+            gutils.forget_object_catalog_id(column_id)
 
             return gutils.DeletedResponse()
         except (PermissionDenied) as ex:
@@ -649,6 +651,7 @@ class GradeEntryDetails(ProducerAPIViews):
                                                      entry_id,
                                                      'grade_entry')
             gradebook.delete_grade_entry(gutils.clean_id(entry_id))
+            gutils.forget_object_catalog_id(entry_id)
 
             return gutils.DeletedResponse()
         except (PermissionDenied, IllegalState) as ex:
@@ -0,0 +1,31 @@
+"""
+Sets the hasContents flag on the assets that do not have it yet, i.e. those
+created before the flag existed, including enclosure assets. Searches treat
+an asset without the flag as unknown and check its contents one by one, so
+run this once after upgrading:
+
+    python manage.py backfill_has_contents <username>
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from dlkit.runtime.proxy_example import SimpleRequest
+
+from utilities.general import get_service_manager
+from utilities.repository import get_asset_ids_without_has_contents, update_asset_has_contents
+
+
+class Command(BaseCommand):
+    args = '<username>'
+    help = 'Set hasContents on the assets that were created before it existed.'
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the username to update the assets as.')
+        rm = get_service_manager(SimpleRequest(username=args[0]), 'REPOSITORY')
+        updated_ids = set()
+        for repository in rm.get_repositories():
+            for asset_id in get_asset_ids_without_has_contents(repository):
+                if str(asset_id) not in updated_ids:
+                    update_asset_has_contents(repository, asset_id)
+                    updated_ids.add(str(asset_id))
+        self.stdout.write('Updated {0} assets.'.format(len(updated_ids)))
@@ -0,0 +1,26 @@
+"""
+Publishes new / changed / deleted assets, compositions and items to the
+dashboards, until stopped. Run exactly one of these per deployment, next to
+the web and celery processes:
+
+    python manage.py listen_for_notifications
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError, NoArgsCommand
+
+from producer.notifications import start_object_notifications
+
+
+class Command(NoArgsCommand):
+    help = 'Publish asset, composition and item events to the dashboards.'
+
+    def handle_noargs(self, **options):
+        if not settings.ENABLE_OBJECT_NOTIFICATIONS:
+            raise CommandError('ENABLE_OBJECT_NOTIFICATIONS is off.')
+        start_object_notifications()
+        self.stdout.write('Listening for notifications as {0}.'.format(settings.NOTIFICATION_USERNAME))
+        # the notification sessions and the publisher run on their own threads
+        while True:
+            time.sleep(60)
@@ -0,0 +1,194 @@
+"""
+Listens for new / changed / deleted assets, compositions and items, and
+publishes them to the dashboards.
+
+The DLKit notification sessions call the receiver from their own thread,
+so it only puts the events on a bounded queue and never blocks on
+RabbitMQ. When the queue is full, an event is merged into the queued
+one with the same verb and object type, or else the oldest event is
+dropped. A background thread publishes the queued events.
+
+Only one process per deployment should listen (see the
+listen_for_notifications command), or every event is published once
+per listening process.
+"""
+import logging
+import threading
+
+from collections import deque
+
+from django.conf import settings
+
+from dlkit.runtime.proxy_example import SimpleRequest
+
+from producer.receivers import RabbitMQReceiver
+
+from utilities import general as gutils
+
+
+class NotificationQueue(object):
+    """
+    at most max_size events, each with at most max_ids ids. publish is
+    called as publish(verb, obj_type, notification_id, ids) from the
+    background thread. dropped counts the ids that were thrown away
+    """
+    def __init__(self, publish, max_size=1000, max_ids=1000):
+        self.publish = publish
+        self.max_size = max_size
+        self.max_ids = max_ids
+        self.dropped = 0
+        self._events = deque()
+        self._latest = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._events)
+
+    def _merge(self, event, ids):
+        """call with the condition held"""
+        for id_ in ids:
+            if id_ in event['seen']:
+                continue
+            if len(event['ids']) >= self.max_ids:
+                self.dropped += 1
+                continue
+            event['seen'].add(id_)
+            event['ids'].append(id_)
+
+    def _pop(self):
+        """call with the condition held"""
+        event = self._events.popleft()
+        if self._latest.get(event['key']) is event:
+            del self._latest[event['key']]
+        return event
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._events) == 0:
+                    self._condition.wait()
+                event = self._pop()
+            try:
+                self.publish(event['verb'],
+                             event['obj_type'],
+                             event['notification_id'],
+                             event['ids'])
+            except Exception as ex:
+                # notifications are best-effort; keep the publisher thread alive
+                logging.exception('Could not publish notification: {0!r}'.format(ex))
+
+    def drain(self):
+        """publish every queued event now, i.e. for tests"""
+        while True:
+            with self._condition:
+                if len(self._events) == 0:
+                    return
+                event = self._pop()
+            self.publish(event['verb'],
+                         event['obj_type'],
+                         event['notification_id'],
+                         event['ids'])
+
+    def put(self, verb, obj_type, notification_id, id_list):
+        """never blocks"""
+        ids = [str(i) for i in id_list]
+        key = (verb, obj_type)
+        with self._condition:
+            if len(self._events) >= self.max_size:
+                if key in self._latest:
+                    self._merge(self._latest[key], ids)
+                    return
+                oldest = self._pop()
+                self.dropped += len(oldest['ids'])
+            event = {
+                'ids': [],
+                'key': key,
+                'notification_id': str(notification_id),
+                'obj_type': obj_type,
+                'seen': set(),
+                'verb': verb
+            }
+            self._merge(event, ids)
+            self._events.append(event)
+            self._latest[key] = event
+            self.start()
+            self._condition.notify()
+
+    def start(self):
+        """start the publisher thread, if it is not running yet"""
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='notification-queue')
+                self._thread.daemon = True
+                self._thread.start()
+
+
+class QueuedReceiver(object):
+    """
+    asset, composition and item receiver that puts the events on
+    the queue, i.e. for the DLKit notification sessions
+    """
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __getattr__(self, item):
+        verb = item.split('_')[0]
+        obj_type = item.split('_')[-1]
+        if (verb in ['new', 'changed', 'deleted'] and
+                obj_type in ['assets', 'compositions', 'items']):
+
+            def wrapper(notification_id, id_list):
+                return self.queue.put(verb, obj_type, notification_id, id_list)
+            return wrapper
+        raise AttributeError
+
+
+_SESSIONS = []
+
+
+def _register(session, obj_type):
+    for verb in ['new', 'changed', 'deleted']:
+        getattr(session, 'register_for_{0}_{1}'.format(verb, obj_type))()
+    _SESSIONS.append(session)
+
+
+def get_notification_queue():
+    """
+    a queue that publishes to every dashboard, through the
+    RabbitMQReceiver of NOTIFICATION_BROADCAST_USERNAME
+    """
+    receiver = RabbitMQReceiver(SimpleRequest(
+        username=getattr(settings, 'NOTIFICATION_BROADCAST_USERNAME', 'all')))
+    return NotificationQueue(receiver._pub_wrapper,
+                             max_size=getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 1000),
+                             max_ids=getattr(settings, 'NOTIFICATION_MAX_IDS', 1000))
+
+
+def start_object_notifications():
+    """
+    register for asset, composition and item events. The sessions run as
+    NOTIFICATION_USERNAME, so only see what that user is authorized to.
+    Events arrive on the sessions' own threads, so the caller has to keep
+    the process running
+    """
+    if len(_SESSIONS) > 0:
+        return
+    request = SimpleRequest(username=settings.NOTIFICATION_USERNAME)
+    receiver = QueuedReceiver(get_notification_queue())
+    rm = gutils.get_service_manager(request, 'REPOSITORY')
+    am = gutils.get_service_manager(request, 'ASSESSMENT')
+
+    session = rm.get_asset_notification_session(asset_receiver=receiver)
+    session.use_federated_repository_view()
+    _register(session, 'assets')
+
+    session = rm.get_composition_notification_session(composition_receiver=receiver)
+    session.use_federated_repository_view()
+    _register(session, 'compositions')
+
+    session = am.get_item_notification_session(item_receiver=receiver)
+    session.use_federated_bank_view()
+    _register(session, 'items')
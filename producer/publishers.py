@@ -0,0 +1,281 @@
+"""Process-wide publishers that the notification receivers send messages through"""
+import os
+import json
+import time
+import Queue
+import atexit
+import logging
+import threading
+
+from collections import OrderedDict
+
+import pika
+
+from pika.exceptions import AMQPError
+
+from django.conf import settings
+
+
+class PublishNotConfirmed(AMQPError):
+    """the broker did not confirm a published message"""
+
+
+class InMemoryPublisher(object):
+    """keeps the published messages in a list, i.e. for tests"""
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            del self.messages[:]
+
+    def publish(self, exchange, body, routing_key=''):
+        with self._lock:
+            self.messages.append({
+                'body': body,
+                'exchange': exchange,
+                'routing_key': routing_key
+            })
+
+
+class NotificationBatcher(object):
+    """
+    Coalesces the messages for one exchange, user, object type and verb
+    that arrive within window seconds of the first one into a single
+    message, whose data is all of their ids. A background thread
+    publishes each batch when its window closes
+    """
+    def __init__(self, publisher, window=1.0):
+        self.publisher = publisher
+        self.window = window
+        self._batches = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _get_due_batches(self, flush_all=False):
+        """pop the batches whose window has closed; call with the condition held"""
+        now = time.time()
+        due = []
+        for key, batch in self._batches.items():
+            if flush_all or batch['deadline'] <= now:
+                due.append(self._batches.pop(key))
+        return due
+
+    def _publish(self, batches):
+        for batch in batches:
+            try:
+                self.publisher.publish(batch['exchange'],
+                                       json.dumps(batch['message']),
+                                       routing_key=batch['routing_key'])
+            except Exception as ex:
+                # notifications are best-effort; keep the flush thread alive
+                logging.exception('Could not publish notification: {0!r}'.format(ex))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._batches) == 0:
+                    self._condition.wait()
+                wait = min(batch['deadline'] for batch in self._batches.values()) - time.time()
+                if wait > 0:
+                    self._condition.wait(wait)
+                due = self._get_due_batches()
+            self._publish(due)
+
+    def add(self, exchange, message, routing_key=''):
+        key = (exchange,
+               routing_key,
+               message['username'],
+               message['objType'],
+               message['verb'],
+               message.get('status', ''))
+        with self._condition:
+            batch = self._batches.get(key)
+            if batch is None:
+                self._batches[key] = {
+                    'deadline': time.time() + self.window,
+                    'exchange': exchange,
+                    'ids': set(message['data']),
+                    'message': dict(message, data=list(message['data'])),
+                    'routing_key': routing_key
+                }
+            else:
+                for id_ in message['data']:
+                    if id_ not in batch['ids']:
+                        batch['ids'].add(id_)
+                        batch['message']['data'].append(id_)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='notification-batcher')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """publish every pending batch now"""
+        with self._condition:
+            due = self._get_due_batches(flush_all=True)
+        self._publish(due)
+
+
+class PooledChannel(object):
+    """
+    a connection with its one channel, and the exchanges declared on it.
+    With confirm_delivery, the broker acknowledges every message
+    """
+    def __init__(self, connection, confirm_delivery=False):
+        self.connection = connection
+        self.channel = connection.channel()
+        self.confirm_delivery = confirm_delivery
+        if confirm_delivery:
+            self.channel.confirm_delivery()
+        self.declared_exchanges = set()
+
+    def close(self):
+        try:
+            self.connection.close()
+        except (AMQPError, EnvironmentError):
+            pass
+
+    def publish(self, exchange, body, routing_key=''):
+        if exchange not in self.declared_exchanges:
+            self.channel.exchange_declare(exchange=exchange,
+                                          type='fanout')
+            self.declared_exchanges.add(exchange)
+        result = self.channel.basic_publish(exchange=exchange,
+                                            routing_key=routing_key,
+                                            body=body)
+        if self.confirm_delivery and result is False:
+            raise PublishNotConfirmed()
+        return result
+
+
+class RabbitMQPublisher(object):
+    """
+    Reuses connections (and their channel) across messages, instead of
+    connecting for every one. BlockingConnections are not thread-safe,
+    so each publish takes a connection out of the pool, and returns it
+    afterwards. Connections are only opened when needed, and one that
+    fails (or a message that is not confirmed) is retried once on a new
+    connection before giving up
+    """
+    def __init__(self, pool_size=4, connection_factory=None, confirm_delivery=False):
+        self._pool = Queue.Queue(maxsize=pool_size)
+        self._connection_factory = connection_factory or self._connect
+        self.confirm_delivery = confirm_delivery
+
+    def _connect(self):
+        credentials = pika.PlainCredentials(settings.RABBITMQ_USER,
+                                            settings.RABBITMQ_PWD)
+        return pika.BlockingConnection(pika.ConnectionParameters('localhost',
+                                                                 5672,
+                                                                 settings.RABBITMQ_VHOST,
+                                                                 credentials))
+
+    def _get_channel(self):
+        try:
+            return self._pool.get_nowait()
+        except Queue.Empty:
+            return self._open_channel()
+
+    def _open_channel(self):
+        return PooledChannel(self._connection_factory(),
+                             confirm_delivery=self.confirm_delivery)
+
+    def _release_channel(self, pooled_channel):
+        try:
+            self._pool.put_nowait(pooled_channel)
+        except Queue.Full:
+            pooled_channel.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Queue.Empty:
+                break
+
+    def publish(self, exchange, body, routing_key=''):
+        pooled_channel = self._get_channel()
+        try:
+            result = pooled_channel.publish(exchange, body, routing_key)
+        except (AMQPError, EnvironmentError):
+            # the pooled connection may have been closed by the broker
+            pooled_channel.close()
+            pooled_channel = self._open_channel()
+            try:
+                result = pooled_channel.publish(exchange, body, routing_key)
+            except (AMQPError, EnvironmentError):
+                pooled_channel.close()
+                raise
+        self._release_channel(pooled_channel)
+        return result
+
+
+_PUBLISHERS = {}
+_BATCHERS = {}
+_PUBLISHERS_LOCK = threading.Lock()
+_PUBLISHERS_PID = None
+
+
+def _check_pid():
+    """call with the lock held"""
+    global _PUBLISHERS_PID
+    if _PUBLISHERS_PID != os.getpid():
+        _PUBLISHERS.clear()
+        _BATCHERS.clear()
+        _PUBLISHERS_PID = os.getpid()
+
+
+def _get_publisher(backend):
+    """call with the lock held"""
+    if backend not in _PUBLISHERS:
+        if backend == 'memory':
+            _PUBLISHERS[backend] = InMemoryPublisher()
+        else:
+            _PUBLISHERS[backend] = RabbitMQPublisher(
+                pool_size=getattr(settings, 'RABBITMQ_POOL_SIZE', 4),
+                confirm_delivery=getattr(settings, 'RABBITMQ_CONFIRM_DELIVERY', True))
+    return _PUBLISHERS[backend]
+
+
+def flush_batchers():
+    with _PUBLISHERS_LOCK:
+        batchers = _BATCHERS.values()
+    for batcher in batchers:
+        batcher.flush()
+
+
+def get_batcher():
+    """
+    the batcher in front of get_publisher(), or None when
+    NOTIFICATION_BATCH_WINDOW is 0
+    """
+    window = getattr(settings, 'NOTIFICATION_BATCH_WINDOW', 1.0)
+    if not window:
+        return None
+    backend = getattr(settings, 'NOTIFICATION_BACKEND', 'rabbitmq')
+    with _PUBLISHERS_LOCK:
+        _check_pid()
+        key = (backend, window)
+        if key not in _BATCHERS:
+            _BATCHERS[key] = NotificationBatcher(_get_publisher(backend), window=window)
+        return _BATCHERS[key]
+
+
+def get_publisher():
+    """
+    the publisher for NOTIFICATION_BACKEND ('rabbitmq' or 'memory'),
+    shared by the whole process. Forked processes (i.e. celery workers)
+    get their own, instead of sharing their parent's sockets
+    """
+    backend = getattr(settings, 'NOTIFICATION_BACKEND', 'rabbitmq')
+    with _PUBLISHERS_LOCK:
+        _check_pid()
+        return _get_publisher(backend)
+
+
+# don't drop the pending notifications when the process exits
+atexit.register(flush_batchers)
@@ -1,30 +1,34 @@
 """Define the Notification receivers here"""
 import json
-import pika
+
+from collections import deque
 
 from django.conf import settings
 
+from producer.publishers import get_batcher, get_publisher
+
 
 class RabbitMQReceiver(object):
-    """receiver class that sends messages to RabbitMQ, on the app's channel"""
+    """receiver class that sends messages to RabbitMQ, on the app's channel.
+    Messages go through the process-wide publisher, so creating a
+    receiver does not open a connection"""
 
     def __init__(self, request):
         self.username = request.user.username
         self.exch = settings.WEBSOCKET_EXCHANGE or ''
-        creds = pika.PlainCredentials(settings.RABBITMQ_USER,
-                                      settings.RABBITMQ_PWD)
-        conn = pika.BlockingConnection(pika.ConnectionParameters('localhost', 5672, settings.RABBITMQ_VHOST, creds))
-        self.ch = conn.channel()
-        self.ch.exchange_declare(exchange=self.exch,
-                                 type='fanout')
         super(RabbitMQReceiver, self).__init__()
 
     def _pub(self, data, routing_key=''):
-        return self.ch.basic_publish(exchange=self.exch,
-                                     routing_key=routing_key,
-                                     body=json.dumps(data))
+        return get_publisher().publish(self.exch,
+                                       json.dumps(data),
+                                       routing_key=routing_key)
 
     def _pub_wrapper(self, verb, obj_type='', notification_id=None, id_list=None, status=''):
+        """
+        events without a status (i.e. new / changed / deleted objects) are
+        coalesced per user and object type by the batcher, while status
+        messages for the user are sent right away
+        """
         ids = [str(i) for i in id_list]
         message = {
             'data': ids,
@@ -37,6 +41,10 @@ class RabbitMQReceiver(object):
             message.update({
                 'status': status
             })
+        else:
+            batcher = get_batcher()
+            if batcher is not None:
+                return batcher.add(self.exch, message)
         return self._pub(message)
 
     # def new_resources(self, id_list):
@@ -46,7 +54,7 @@ class RabbitMQReceiver(object):
         verb = item.split('_')[0]
         obj_type = item.split('_')[-1]
         if (verb in ['new', 'changed', 'deleted'] and
-                obj_type in ['assets', 'resources', 'items', 'banks', 'repositories']):
+                obj_type in ['assets', 'compositions', 'resources', 'items', 'banks', 'repositories']):
 
             def wrapper(*args, **kwargs):
                 return self._pub_wrapper(verb, obj_type, args[0], args[1])
@@ -58,8 +66,9 @@ class SimpleAssetReceiver(object):
     """The asset receiver is the consumer supplied interface for receiving notifications pertaining to new, updated or deleted
         ``Asset`` objects."""
 
-    def __init__(self):
-        self._notifications = list()
+    def __init__(self, max_size=1000):
+        # only keeps the latest max_size notifications
+        self._notifications = deque(maxlen=max_size)
 
     def new_assets(self, notification_id, asset_ids):
         """The callback for notifications of new assets.
@@ -1,5 +1,5 @@
 """
-Celery tasks for import module.
+Celery tasks for import / export module.
 """
 from __future__ import unicode_literals
 
@@ -7,14 +7,84 @@ import os
 import shutil
 
 from celery import Task
+from django.contrib.auth.models import User
 from django.core.files.storage import default_storage
 from django.conf import settings
 
+from dlkit.runtime.errors import NotFound
 from dlkit.runtime.proxy_example import SimpleRequest
 
 from producer.receivers import RabbitMQReceiver
 from producer_main.celery_app import app
-from utilities.general import upload_class
+from utilities.general import clean_id, get_service_manager, upload_class
+from utilities.imports import ImportJournal, delete_expired_journals
+from utilities.repository import finish_export, get_asset_ids_without_has_contents,\
+    save_export_artifact, update_asset_has_contents
+from utilities.search import invalidate_search_caches
+
+
+def clean_up_upload(path):
+    """delete the uploaded course, and the directory it was extracted to"""
+    default_storage.delete(path)
+    extracted_path = path.replace('.zip', '').replace('.tar.gz', '')
+    if os.path.isdir(extracted_path):
+        shutil.rmtree(extracted_path)
+
+
+def course_exists(rm, repository_ids):
+    """
+    whether the repositories that an earlier attempt of the import
+    created are all still there, i.e. were not deleted by the user
+    """
+    for repository_id in repository_ids:
+        try:
+            rm.get_repository(clean_id(repository_id))
+        except NotFound:
+            return False
+    return True
+
+
+def get_descendant_repository_ids(rm, repository_id):
+    """the ids of the repositories below this one, i.e. its courses and runs"""
+    descendant_ids = set()
+    level = [repository_id]
+    while len(level) > 0:
+        next_level = []
+        for parent_id in level:
+            try:
+                child_ids = [str(child_id) for child_id in rm.get_child_repository_ids(parent_id)]
+            except NotFound:
+                # not in the hierarchy
+                child_ids = []
+            next_level += [child_id for child_id in child_ids if child_id not in descendant_ids]
+            descendant_ids.update(child_ids)
+        level = [clean_id(child_id) for child_id in next_level]
+    return descendant_ids
+
+
+def notify(user, message, status):
+    """publish a message to the user's notifications, if they are enabled"""
+    if not settings.TEST and settings.ENABLE_NOTIFICATIONS:
+        test_request = SimpleRequest(username=user.username)
+        rabbit = RabbitMQReceiver(request=test_request)
+        rabbit._pub_wrapper('new',
+                            obj_type='repositories',
+                            id_list=[message],
+                            status=status)
+
+
+def update_imported_assets(rm, repository_ids):
+    """
+    set hasContents on the assets in the repositories that an import
+    created, but not on the other assets of the target repository
+    """
+    updated_ids = set()
+    for repository_id in repository_ids:
+        repository = rm.get_repository(clean_id(repository_id))
+        for asset_id in get_asset_ids_without_has_contents(repository):
+            if str(asset_id) not in updated_ids:
+                update_asset_has_contents(repository, asset_id)
+                updated_ids.add(str(asset_id))
 
 
 class ErrorHandlingTask(Task):
@@ -24,25 +94,19 @@ class ErrorHandlingTask(Task):
         """
         :param exc:
         :param task_id:
-        :param args: path, domain_repo, user (args to import_file)
+        :param args: path, domain_repo, user, import_key (args to import_file)
         :param kwargs:
         :param einfo: Traceback (str(einfo))
         :return:
         """
-        if not settings.TEST and settings.ENABLE_NOTIFICATIONS:
-            test_request = SimpleRequest(username=targs[2].username)
-            rabbit = RabbitMQReceiver(request=test_request)
-            msg = 'Import of {0} raised exception: {1!r}'.format(targs[0].split('/')[-1],
-                                                                 str(exc))
-            rabbit._pub_wrapper('new',
-                                obj_type='repositories',
-                                id_list=[msg],
-                                status='error')
-        default_storage.delete(targs[0])
-        extracted_path = targs[0].replace('.zip', '').replace('.tar.gz', '')
-        if os.path.isdir(extracted_path):
-            shutil.rmtree(extracted_path)
-
+        # even a failed import may have created some of the course
+        invalidate_search_caches(targs[1].ident)
+        # after the last retry, so uploading the course again starts over
+        ImportJournal(targs[3]).delete()
+        msg = 'Import of {0} raised exception: {1!r}'.format(targs[0].split('/')[-1],
+                                                             str(exc))
+        notify(targs[2], msg, 'error')
+        clean_up_upload(targs[0])
 
     def on_success(self, retval, task_id, targs, tkwargs):
         """
@@ -53,22 +117,88 @@ class ErrorHandlingTask(Task):
         :param tkwargs:
         :return:
         """
-        if not settings.TEST and settings.ENABLE_NOTIFICATIONS:
-            test_request = SimpleRequest(username=targs[2].username)
-            rabbit = RabbitMQReceiver(request=test_request)
-            rabbit._pub_wrapper('new',
-                                obj_type='repositories',
-                                id_list=["Upload successful. You may now view your course."],
-                                status='success')
-        default_storage.delete(targs[0])
-        extracted_path = targs[0].replace('.zip', '').replace('.tar.gz', '')
-        if os.path.isdir(extracted_path):
-            shutil.rmtree(extracted_path)
+        notify(targs[2], "Upload successful. You may now view your course.", 'success')
+        clean_up_upload(targs[0])
+
+
+class ExportTask(Task):
+    abstract = True
+
+    def _notify_waiting_users(self, targs, message, status):
+        """the user who started the export, and everyone who asked for it while it ran"""
+        usernames = set(finish_export(targs[0].ident, targs[1]))
+        usernames.discard(targs[2].username)
+        notify(targs[2], message, status)
+        for user in User.objects.filter(username__in=usernames):
+            notify(user, message, status)
+
+    def on_failure(self, exc, task_id, targs, tkwargs, einfo):
+        """
+        :param targs: repo, version, user (args to export_run)
+        """
+        msg = 'Export of {0} raised exception: {1!r}'.format(targs[0].display_name.text,
+                                                             str(exc))
+        self._notify_waiting_users(targs, msg, 'error')
+
+    def on_success(self, retval, task_id, targs, tkwargs):
+        """
+        :param retval: path to the exported OLX
+        """
+        msg = 'Export of {0} is ready. You may now download it.'.format(targs[0].display_name.text)
+        self._notify_waiting_users(targs, msg, 'success')
+
+
+@app.task(base=ExportTask)
+def export_run(repo, version, user):
+    """Asynchronously export a course run, to download later."""
+    notify(user, 'Export of {0} started.'.format(repo.display_name.text), 'pending')
+    filename, olx = repo.export_olx()
+    try:
+        return save_export_artifact(repo.ident, version, filename, olx)
+    finally:
+        olx.close()
+
 
+@app.task(base=ErrorHandlingTask, bind=True)
+def import_file(self, path, repo, user, import_key):
+    """
+    Asynchronously import a course. DysonX parses and creates the
+    course in one go, then its assets get their hasContents flag.
+    DysonX cannot resume part way through, so if it fails the import
+    fails. Once it is done, the journal records that (and the
+    repositories it created), so a retry of the hasContents step, or
+    uploading the same course again, does not run DysonX twice
+    """
+    filename = path.split('/')[-1]
+    delete_expired_journals()
+    journal = ImportJournal(import_key)
+    rm = get_service_manager(SimpleRequest(username=user.username), 'REPOSITORY')
 
-@app.task(base=ErrorHandlingTask)
-def import_file(path, repo, user):
-    """Asynchronously import a course."""
-    upload_class(path, repo, user)
+    try:
+        if journal.is_done('course') and course_exists(rm, journal.get_done_ids('course')):
+            notify(user, 'Import of {0} resumed, the course was already created.'.format(filename),
+                   'pending')
+        else:
+            # nothing done yet, or the course was deleted since
+            journal.delete()
+            notify(user, 'Import of {0} started.'.format(filename), 'pending')
+            existing_ids = get_descendant_repository_ids(rm, repo.ident)
+            upload_class(path, repo, user)
+            journal.add_done_ids('course',
+                                 get_descendant_repository_ids(rm, repo.ident) - existing_ids)
+            journal.mark_done('course')
 
+        notify(user, 'Import of {0}: course created, updating its assets.'.format(filename),
+               'pending')
+        update_imported_assets(rm, journal.get_done_ids('course'))
+    except Exception as ex:
+        if journal.is_done('course'):
+            invalidate_search_caches(repo.ident)
+            raise self.retry(exc=ex,
+                             countdown=getattr(settings, 'IMPORT_RETRY_DELAY', 60),
+                             max_retries=getattr(settings, 'IMPORT_MAX_RETRIES', 3))
+        # DysonX cannot pick up where it left off, so it is not retried
+        raise
 
+    invalidate_search_caches(repo.ident)
+    journal.delete()
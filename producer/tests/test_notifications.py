@@ -0,0 +1,94 @@
+import threading
+
+from utilities.testing import DjangoTestCase
+
+from ..notifications import NotificationQueue, QueuedReceiver
+from ..receivers import SimpleAssetReceiver
+
+
+class NotificationQueueTest(DjangoTestCase):
+    def setUp(self):
+        super(NotificationQueueTest, self).setUp()
+        self.published = []
+        # not started, so events stay queued until drained
+        self.queue = NotificationQueue(self.publish, max_size=2, max_ids=3)
+        self.queue.start = lambda: None
+        self.receiver = QueuedReceiver(self.queue)
+
+    def tearDown(self):
+        super(NotificationQueueTest, self).tearDown()
+
+    def publish(self, verb, obj_type, notification_id, ids):
+        self.published.append((verb, obj_type, ids))
+
+    def test_events_are_published_in_order(self):
+        self.receiver.new_assets('1', ['asset1'])
+        self.receiver.changed_compositions('2', ['composition1'])
+        self.queue.drain()
+        self.assertEqual(self.published, [
+            ('new', 'assets', ['asset1']),
+            ('changed', 'compositions', ['composition1'])
+        ])
+
+    def test_full_queue_merges_events(self):
+        self.receiver.new_assets('1', ['asset1'])
+        self.receiver.new_items('2', ['item1'])
+        self.receiver.new_assets('3', ['asset2', 'asset1'])
+        self.assertEqual(len(self.queue), 2)
+
+        self.queue.drain()
+        self.assertEqual(self.published[0], ('new', 'assets', ['asset1', 'asset2']))
+        self.assertEqual(self.queue.dropped, 0)
+
+    def test_full_queue_drops_oldest_event(self):
+        self.receiver.new_assets('1', ['asset1'])
+        self.receiver.new_items('2', ['item1'])
+        self.receiver.deleted_items('3', ['item2'])
+        self.assertEqual(self.queue.dropped, 1)
+
+        self.queue.drain()
+        self.assertEqual(self.published, [
+            ('new', 'items', ['item1']),
+            ('deleted', 'items', ['item2'])
+        ])
+
+    def test_merged_events_are_bounded(self):
+        self.receiver.new_assets('1', ['asset1'])
+        self.receiver.new_items('2', ['item1'])
+        self.receiver.new_assets('3', ['asset{0}'.format(i) for i in range(2, 10)])
+        self.assertEqual(self.queue.dropped, 6)
+
+        self.queue.drain()
+        self.assertEqual(self.published[0], ('new', 'assets', ['asset1', 'asset2', 'asset3']))
+
+    def test_other_object_types_are_not_received(self):
+        self.assertRaises(AttributeError, getattr, self.receiver, 'new_banks')
+
+    def test_background_thread_publishes_events(self):
+        published = threading.Event()
+
+        def publish(verb, obj_type, notification_id, ids):
+            self.publish(verb, obj_type, notification_id, ids)
+            published.set()
+
+        queue = NotificationQueue(publish)
+        QueuedReceiver(queue).new_assets('1', ['asset1'])
+        self.assertTrue(published.wait(5))
+        self.assertEqual(self.published, [('new', 'assets', ['asset1'])])
+
+
+class SimpleAssetReceiverTest(DjangoTestCase):
+    def setUp(self):
+        super(SimpleAssetReceiverTest, self).setUp()
+        self.receiver = SimpleAssetReceiver(max_size=2)
+
+    def tearDown(self):
+        super(SimpleAssetReceiverTest, self).tearDown()
+
+    def test_only_latest_notifications_are_kept(self):
+        for i in range(5):
+            self.receiver.new_assets(str(i), ['asset{0}'.format(i)])
+        self.assertEqual(list(self.receiver._notifications), [
+            {'3': ['asset3']},
+            {'4': ['asset4']}
+        ])
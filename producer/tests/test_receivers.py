@@ -1,15 +1,32 @@
 """without an async listener, no way to check that the message was
 received properly. But we can at least make sure no exceptions thrown"""
 
+import json
+import threading
 import unittest
 
 from django.test.utils import override_settings
 from dlkit.runtime.proxy_example import SimpleRequest
+from pika.exceptions import AMQPError
 
 from utilities.testing import DjangoTestCase
 
+from ..publishers import InMemoryPublisher, NotificationBatcher, PublishNotConfirmed,\
+    RabbitMQPublisher, get_batcher, get_publisher
 from ..receivers import RabbitMQReceiver
 
+
+class EventPublisher(InMemoryPublisher):
+    """sets published once a message is published"""
+    def __init__(self):
+        super(EventPublisher, self).__init__()
+        self.published = threading.Event()
+
+    def publish(self, exchange, body, routing_key=''):
+        super(EventPublisher, self).publish(exchange, body, routing_key)
+        self.published.set()
+
+
 @override_settings(WEBSOCKET_EXCHANGE='test.backstage.producer')
 class RabbitMQReceiverTest(DjangoTestCase):
     def setUp(self):
@@ -29,3 +46,163 @@ class RabbitMQReceiverTest(DjangoTestCase):
     def test_can_emit_new_items(self):
         self.mq.new_items('456', ['id'])
 
+
+
+@override_settings(NOTIFICATION_BACKEND='memory',
+                   NOTIFICATION_BATCH_WINDOW=0,
+                   WEBSOCKET_EXCHANGE='test.backstage.producer')
+class InMemoryPublisherTest(DjangoTestCase):
+    def setUp(self):
+        super(InMemoryPublisherTest, self).setUp()
+        self.publisher = get_publisher()
+        self.publisher.clear()
+
+        req = SimpleRequest(username='cjshaw@mit.edu')
+        self.mq = RabbitMQReceiver(req)
+
+    def tearDown(self):
+        self.publisher.clear()
+        super(InMemoryPublisherTest, self).tearDown()
+
+    def test_receivers_share_the_publisher(self):
+        self.mq.new_items('456', ['id'])
+        RabbitMQReceiver(SimpleRequest(username='cjshaw@mit.edu')).new_items('789', ['id'])
+        self.assertEqual(len(self.publisher.messages), 2)
+
+        message = self.publisher.messages[0]
+        self.assertEqual(message['exchange'], 'test.backstage.producer')
+        self.assertEqual(json.loads(message['body'])['objType'], 'items')
+
+
+@override_settings(NOTIFICATION_BACKEND='memory',
+                   NOTIFICATION_BATCH_WINDOW=60,
+                   WEBSOCKET_EXCHANGE='test.backstage.producer')
+class NotificationBatcherTest(DjangoTestCase):
+    def setUp(self):
+        super(NotificationBatcherTest, self).setUp()
+        self.publisher = get_publisher()
+        self.publisher.clear()
+        self.batcher = get_batcher()
+
+        req = SimpleRequest(username='cjshaw@mit.edu')
+        self.mq = RabbitMQReceiver(req)
+
+    def tearDown(self):
+        self.batcher.flush()
+        self.publisher.clear()
+        super(NotificationBatcherTest, self).tearDown()
+
+    def get_messages(self):
+        return [json.loads(message['body']) for message in self.publisher.messages]
+
+    def test_events_are_coalesced_per_object_type(self):
+        for i in range(100):
+            self.mq.new_assets(str(i), ['asset{0}'.format(i)])
+        self.mq.new_items('100', ['item'])
+        self.mq.new_assets('101', ['asset0'])
+        self.assertEqual(self.publisher.messages, [])
+
+        self.batcher.flush()
+        messages = self.get_messages()
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]['objType'], 'assets')
+        self.assertEqual(messages[0]['data'], ['asset{0}'.format(i) for i in range(100)])
+        self.assertEqual(messages[1]['data'], ['item'])
+
+    def test_status_messages_are_not_delayed(self):
+        self.mq._pub_wrapper('new',
+                             obj_type='repositories',
+                             id_list=['Upload successful.'],
+                             status='success')
+        self.assertEqual(len(self.publisher.messages), 1)
+
+    def test_batches_are_published_when_window_closes(self):
+        publisher = EventPublisher()
+        batcher = NotificationBatcher(publisher, window=0.05)
+        batcher.add('exchange', {
+            'data': ['id'],
+            'id': '1',
+            'objType': 'assets',
+            'username': 'cjshaw@mit.edu',
+            'verb': 'new'
+        })
+        self.assertTrue(publisher.published.wait(5))
+        self.assertEqual(len(publisher.messages), 1)
+
+
+class FakeChannel(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.confirming = False
+        self.num_declares = 0
+
+    def basic_publish(self, exchange, routing_key, body):
+        if self.connection.closed:
+            raise AMQPError()
+        if self.confirming and self.connection.nack:
+            return False
+        self.connection.num_published += 1
+        return True if self.confirming else None
+
+    def confirm_delivery(self):
+        self.confirming = True
+
+    def exchange_declare(self, exchange, type):
+        self.num_declares += 1
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+        self.nack = False
+        self.num_published = 0
+        self.channels = []
+
+    def channel(self):
+        self.channels.append(FakeChannel(self))
+        return self.channels[-1]
+
+    def close(self):
+        self.closed = True
+
+
+class RabbitMQPublisherTest(DjangoTestCase):
+    def setUp(self):
+        super(RabbitMQPublisherTest, self).setUp()
+        self.connections = []
+        self.publisher = RabbitMQPublisher(pool_size=2,
+                                           connection_factory=self.connect)
+
+    def tearDown(self):
+        self.publisher.close()
+        super(RabbitMQPublisherTest, self).tearDown()
+
+    def connect(self):
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+    def test_connection_and_channel_are_reused(self):
+        for i in range(5):
+            self.publisher.publish('exchange', 'body')
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(len(self.connections[0].channels), 1)
+        self.assertEqual(self.connections[0].channels[0].num_declares, 1)
+        self.assertEqual(self.connections[0].num_published, 5)
+
+    def test_unconfirmed_messages_raise(self):
+        def connect_nacking():
+            connection = self.connect()
+            connection.nack = True
+            return connection
+
+        publisher = RabbitMQPublisher(connection_factory=connect_nacking,
+                                      confirm_delivery=True)
+        self.assertRaises(PublishNotConfirmed, publisher.publish, 'exchange', 'body')
+        self.assertEqual(len(self.connections), 2)  # retried once
+
+    def test_closed_connection_is_replaced(self):
+        self.publisher.publish('exchange', 'body')
+        self.connections[0].close()
+        self.publisher.publish('exchange', 'body')
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1].num_published, 1)
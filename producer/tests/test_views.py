@@ -3,7 +3,45 @@ from dlkit.runtime.proxy_example import User
 from repository.tests.test_views import RepositoryTestCase
 
 from utilities import general as gutils
-from utilities.testing import ABS_PATH
+from utilities.testing import ABS_PATH, DjangoTestCase
+
+from ..views import ProducerAPIViews
+
+
+class LazyManagerTests(DjangoTestCase):
+    """Test that views only load the managers they use
+
+    """
+    def setUp(self):
+        super(LazyManagerTests, self).setUp()
+        self.view = ProducerAPIViews()
+        self.view.request = self.req
+        self.view._loaded_managers = {}
+
+    def tearDown(self):
+        super(LazyManagerTests, self).tearDown()
+
+    def test_managers_not_loaded_until_accessed(self):
+        self.assertEqual(
+            self.view._loaded_managers,
+            {}
+        )
+
+        gm = self.view.gm
+        self.assertEqual(
+            self.view._loaded_managers.keys(),
+            ['gm']
+        )
+        self.assertIs(
+            gm,
+            gutils.get_session_data(self.req, 'gm')
+        )
+
+    def test_accessing_manager_twice_returns_same_manager(self):
+        self.assertIs(
+            self.view.rm,
+            self.view.rm
+        )
 
 
 class ImportTests(RepositoryTestCase):
@@ -1,8 +1,6 @@
 from django.conf import settings
 from rest_framework.renderers import JSONRenderer
 
-from producer.receivers import RabbitMQReceiver, SimpleAssetReceiver
-
 from utilities import general as gutils
 
 
@@ -15,32 +13,46 @@ class DLJSONRenderer(JSONRenderer):
                                                   renderer_context)
 
 
+class LazyManager(object):
+    """Descriptor that only gets a service manager from the pool (or
+    creates it) the first time a view touches it"""
+    def __init__(self, nickname):
+        self.nickname = nickname
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        loaded_managers = instance.__dict__.setdefault('_loaded_managers', {})
+        if self.nickname not in loaded_managers:
+            loaded_managers[self.nickname] = gutils.get_manager(instance.request,
+                                                                self.nickname)
+        return loaded_managers[self.nickname]
+
+    def __set__(self, instance, value):
+        instance.__dict__.setdefault('_loaded_managers', {})[self.nickname] = value
+
+
 class ProducerAPIViews(gutils.DLKitSessionsManager):
     """Set up the managers"""
+    am = LazyManager('am')
+    cm = LazyManager('cm')
+    gm = LazyManager('gm')
+    lm = LazyManager('lm')
+    rm = LazyManager('rm')
+
     def initial(self, request, *args, **kwargs):
-        """set up the managers"""
+        """managers are set up lazily, on first access"""
+        self._loaded_managers = {}
+        gutils.clear_request_catalogs(start_request=True)
         super(ProducerAPIViews, self).initial(request, *args, **kwargs)
-        gutils.activate_managers(request)
-
-        self._managers = ['am', 'cm', 'gm', 'lm', 'rm']
-        for manager in self._managers:
-            setattr(self, manager, gutils.get_session_data(request, manager))
-
-        # for testing only
-        # if settings.DEBUG:
-        #     asset_notification_session = self.rm.get_asset_notification_session(
-        #         asset_receiver=RabbitMQReceiver(request=request))
-        #     asset_notification_session.register_for_new_assets()
 
     def finalize_response(self, request, response, *args, **kwargs):
-        """save the updated managers"""
-        try:
-            for manager in self._managers:
-                gutils.set_session_data(request, manager, getattr(self, manager))
-        except AttributeError:
-            pass  # with an exception, the RM may not be set
+        """save the managers that this request touched"""
+        for nickname, manager in getattr(self, '_loaded_managers', {}).items():
+            if manager is not None:
+                gutils.set_session_data(request, nickname, manager)
+        gutils.clear_request_catalogs()
         return super(ProducerAPIViews, self).finalize_response(request,
                                                                response,
                                                                *args,
                                                                **kwargs)
-
@@ -102,15 +102,70 @@ BROKER_URL = settings_credentials.__dict__.get('BROKER_URL', '')
 CELERY_RESULT_BACKEND = settings_credentials.__dict__.get('CELERY_RESULT_BACKEND', '')
 CELERY_RESULT_PERSISTENT = settings_credentials.__dict__.get('CELERY_RESULT_PERSISTENT', True)
 CELERY_IGNORE_RESULT = settings_credentials.__dict__.get('CELERY_IGNORE_RESULT', '')
+# imports are checkpointed per upload here (default: MEDIA_ROOT/import_journals),
+# until they finish or fail for good, or the journal is unused for the TTL,
+# and the step after DysonX (which cannot resume) is retried this many times
+IMPORT_JOURNAL_ROOT = settings_credentials.__dict__.get('IMPORT_JOURNAL_ROOT')
+IMPORT_JOURNAL_TTL = settings_credentials.__dict__.get('IMPORT_JOURNAL_TTL', 86400)  # seconds
+IMPORT_MAX_RETRIES = settings_credentials.__dict__.get('IMPORT_MAX_RETRIES', 3)
+IMPORT_RETRY_DELAY = settings_credentials.__dict__.get('IMPORT_RETRY_DELAY', 60)  # seconds
 
 RABBITMQ_USER = settings_credentials.__dict__.get('RABBITMQ_USER', '')
 RABBITMQ_PWD = settings_credentials.__dict__.get('RABBITMQ_PWD', True)
 RABBITMQ_VHOST = settings_credentials.__dict__.get('RABBITMQ_VHOST', '')
+RABBITMQ_POOL_SIZE = settings_credentials.__dict__.get('RABBITMQ_POOL_SIZE', 4)
+# 'rabbitmq', or 'memory' to keep notifications in a list in the process (for tests)
+NOTIFICATION_BACKEND = settings_credentials.__dict__.get('NOTIFICATION_BACKEND', 'rabbitmq')
+# new / changed / deleted events are coalesced per user and object type for this
+# many seconds (0 sends each one right away), and published with broker confirms
+NOTIFICATION_BATCH_WINDOW = settings_credentials.__dict__.get('NOTIFICATION_BATCH_WINDOW', 1.0)
+RABBITMQ_CONFIRM_DELIVERY = settings_credentials.__dict__.get('RABBITMQ_CONFIRM_DELIVERY', True)
+# let the listen_for_notifications command (run once per deployment) register
+# for asset, composition and item events, as NOTIFICATION_USERNAME, and
+# broadcast them to every dashboard. Events wait on a bounded queue; under
+# load they are merged per verb and object type (at most NOTIFICATION_MAX_IDS
+# ids each), or the oldest are dropped
+ENABLE_OBJECT_NOTIFICATIONS = settings_credentials.__dict__.get('ENABLE_OBJECT_NOTIFICATIONS', False)
+NOTIFICATION_USERNAME = settings_credentials.__dict__.get('NOTIFICATION_USERNAME', '')
+NOTIFICATION_BROADCAST_USERNAME = settings_credentials.__dict__.get('NOTIFICATION_BROADCAST_USERNAME', 'all')
+NOTIFICATION_QUEUE_SIZE = settings_credentials.__dict__.get('NOTIFICATION_QUEUE_SIZE', 1000)
+NOTIFICATION_MAX_IDS = settings_credentials.__dict__.get('NOTIFICATION_MAX_IDS', 1000)
 
 ENABLE_NOTIFICATIONS = settings_credentials.__dict__.get('ENABLE_NOTIFICATIONS', False)
 ENABLE_OBJECTIVE_FACETS = settings_credentials.__dict__.get('ENABLE_OBJECTIVE_FACETS', False)
 FORCE_TLSV1 = settings_credentials.__dict__.get('FORCE_TLSV1', False)
 
+# per-process pool of DLKit service managers, keyed by user + proxy condition
+MANAGER_POOL_SIZE = settings_credentials.__dict__.get('MANAGER_POOL_SIZE', 256)
+MANAGER_POOL_TTL = settings_credentials.__dict__.get('MANAGER_POOL_TTL', 3600)  # seconds
+# per-process cache of which repository / bank / gradebook each object is in
+CATALOG_ID_CACHE_SIZE = settings_credentials.__dict__.get('CATALOG_ID_CACHE_SIZE', 10000)
+CATALOG_ID_CACHE_TTL = settings_credentials.__dict__.get('CATALOG_ID_CACHE_TTL', 300)  # seconds
+
+# whether CACHES is shared by every process, which the search / query plan
+# caches and tree snapshots need to see invalidations. None guesses from the
+# backend: LocMemCache and DummyCache are not shared, so those caches are off
+SHARED_CACHE = settings_credentials.__dict__.get('SHARED_CACHE', None)
+# max age of the shared repository search / query plan caches, which are also
+# invalidated whenever objects in the repository change
+SEARCH_CACHE_TIMEOUT = settings_credentials.__dict__.get('SEARCH_CACHE_TIMEOUT', 3600)  # seconds
+# max number of threads per process that run backend queries concurrently,
+# i.e. for the runs of a domain in search / query plans
+CONCURRENT_QUERY_WORKERS = settings_credentials.__dict__.get('CONCURRENT_QUERY_WORKERS', 8)
+# exported OLX downloads are streamed to the client in chunks of this many bytes
+OLX_DOWNLOAD_CHUNK_SIZE = settings_credentials.__dict__.get('OLX_DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+# exported run OLX is kept here until anything in the run changes (default: MEDIA_ROOT/exports)
+EXPORT_ROOT = settings_credentials.__dict__.get('EXPORT_ROOT')
+EXPORT_LOCK_TIMEOUT = settings_credentials.__dict__.get('EXPORT_LOCK_TIMEOUT', 3600)  # seconds
+# signed CloudFront URLs are cached until this many seconds before they expire
+SIGNED_URL_EXPIRATION_MARGIN = settings_credentials.__dict__.get('SIGNED_URL_EXPIRATION_MARGIN', 300)  # seconds
+# cached snapshots of nested composition trees (?nested and ?fullMap), which
+# hold signed asset URLs, so keep the timeout below their expiration
+ENABLE_TREE_SNAPSHOTS = settings_credentials.__dict__.get('ENABLE_TREE_SNAPSHOTS', False)
+TREE_SNAPSHOT_TIMEOUT = settings_credentials.__dict__.get('TREE_SNAPSHOT_TIMEOUT', 300)  # seconds
+# learning objective display names, from the learning service
+OBJECTIVE_NAME_TIMEOUT = settings_credentials.__dict__.get('OBJECTIVE_NAME_TIMEOUT', 86400)  # seconds
+
 SECRET_KEY = settings_credentials.__dict__.get('SECRET_KEY', rand_generator())
 
 if "default" not in DATABASES or "PASSWORD" not in DATABASES["default"] or DATABASES["default"]["PASSWORD"]=="":
@@ -246,7 +301,20 @@ SESSION_SERIALIZER='django.contrib.sessions.serializers.JSONSerializer'
 
 TEMPLATE_CONTEXT_PROCESSORS += ("django.core.context_processors.request",)
 
-SESSION_SAVE_EVERY_REQUEST = True
+# sessions only hold small keys now (see utilities.general.MANAGER_POOL),
+# so only write them back when they actually change. For a read-mostly
+# backend, set SESSION_ENGINE to 'django.contrib.sessions.backends.cached_db'
+# in settings_credentials.py -- but only with a CACHES backend that is shared
+# across processes (i.e. memcached), otherwise processes can read stale sessions.
+SESSION_ENGINE = settings_credentials.__dict__.get('SESSION_ENGINE',
+                                                   'django.contrib.sessions.backends.db')
+SESSION_SAVE_EVERY_REQUEST = settings_credentials.__dict__.get('SESSION_SAVE_EVERY_REQUEST', False)
+
+CACHES = settings_credentials.__dict__.get('CACHES', {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
 
 # Django CORS from:
 # https://github.com/ottoyiu/django-cors-headers/
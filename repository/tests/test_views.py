@@ -20,6 +20,7 @@ from django.utils.http import unquote
 from dysonx.dysonx import get_or_create_user_repo
 
 from utilities import general as gutils
+from utilities import imports as iutils
 from utilities import repository as rutils
 from utilities.testing import DjangoTestCase, ABS_PATH
 
@@ -295,6 +296,16 @@ class AssetCrUDTests(RepositoryTestCase):
             asset_content['url']
         )
 
+    def test_created_assets_are_flagged_as_having_contents(self):
+        payload = {
+            'my_asset_label': self.test_file,
+            'repositoryId': str(self.repo.ident)
+        }
+        req = self.client.post(self.url, payload)
+        self.created(req)
+        asset_id = self.json(req)['my_asset_label']
+        self.assertTrue(self.get_asset(asset_id)._my_map['hasContents'])
+
     def test_can_upload_multiple_assets_simultaneously(self):
         url = self.url
         payload = {
@@ -1440,6 +1451,22 @@ class CompositionCrUDTests(AssessmentTestCase, RepositoryTestCase):
         self.num_items(orchestrated_bank, 1)
         self.num_items(new_bank, 1)
 
+    def test_enclosures_of_items_added_to_composition_have_no_contents(self):
+        composition = self.setup_composition(self.repo_id)
+        user_repo = get_or_create_user_repo(self.username)
+        item = self.create_item(self.get_bank(user_repo.ident))
+
+        url = self.url + unquote(str(composition.ident))
+        payload = {
+            'childIds': str(item.ident)
+        }
+        req = self.client.put(url, payload, format='json')
+        self.updated(req)
+
+        enclosures = self.get_repo(self.repo_id).get_assets()
+        self.assertEqual(enclosures.available(), 1)
+        self.assertFalse(enclosures.next()._my_map['hasContents'])
+
     def test_assigning_assets_to_composition_does_not_assign_to_run_repo(self):
         from dysonx.dysonx import get_or_create_user_repo
 
@@ -2243,6 +2270,83 @@ class EdXCompositionCrUDTests(RepositoryTestCase):
             composition['id']
         )
 
+    def test_nested_compositions_include_every_level(self):
+        run_repo = self.create_new_run_repo()
+        url = self.url
+
+        parent_id = None
+        composition_ids = []
+        for genus in ['chapter', 'sequential', 'vertical']:
+            payload = {
+                'displayName': genus,
+                'description': 'for testing',
+                'repositoryId': str(run_repo.ident),
+                'genusTypeId': 'edx-composition%3A{0}%40EDX.ORG'.format(genus),
+            }
+            if parent_id is not None:
+                payload['parentId'] = parent_id
+            req = self.client.post(url, payload, format='json')
+            self.created(req)
+            parent_id = self.json(req)['id']
+            composition_ids.append(parent_id)
+
+        url = self.base_url + 'repository/repositories/' + str(run_repo.ident) + '/compositions/?nested'
+        req = self.client.get(url)
+        self.ok(req)
+        data = self.json(req)
+
+        node = data['data']['results'][0]
+        for composition_id in composition_ids:
+            self.assertEqual(node['id'], composition_id)
+            self.assertIn('canEdit', node)
+            if composition_id != composition_ids[-1]:
+                self.assertEqual(len(node['children']), 1)
+                node = node['children'][0]
+        self.assertEqual(node['children'], [])
+
+    def test_nested_compositions_keep_sibling_order_and_assets(self):
+        run_repo = self.create_new_run_repo()
+        url = self.url
+
+        payload = {
+            'displayName': 'chapter',
+            'description': 'for testing',
+            'repositoryId': str(run_repo.ident),
+            'genusTypeId': 'edx-composition%3Achapter%40EDX.ORG',
+        }
+        req = self.client.post(url, payload, format='json')
+        self.created(req)
+        chapter_id = self.json(req)['id']
+
+        sequential_ids = []
+        for index in range(2):
+            payload = {
+                'displayName': 'sequential {0}'.format(index),
+                'description': 'for testing',
+                'repositoryId': str(run_repo.ident),
+                'genusTypeId': 'edx-composition%3Asequential%40EDX.ORG',
+                'parentId': chapter_id
+            }
+            req = self.client.post(url, payload, format='json')
+            self.created(req)
+            sequential_ids.append(self.json(req)['id'])
+
+        asset = self.setup_asset(run_repo.ident)
+        req = self.client.put(url + unquote(sequential_ids[1]),
+                              {'childIds': str(asset.ident)},
+                              format='json')
+        self.updated(req)
+
+        url = self.base_url + 'repository/repositories/' + str(run_repo.ident) + '/compositions/?nested'
+        req = self.client.get(url)
+        self.ok(req)
+        chapter = self.json(req)['data']['results'][0]
+        self.assertEqual([child['id'] for child in chapter['children']], sequential_ids)
+        self.assertEqual(chapter['children'][0]['children'], [])
+        self.assertEqual(len(chapter['children'][1]['children']), 1)
+        self.assertEqual(chapter['children'][1]['children'][0]['id'], str(asset.ident))
+        self.assertFalse(chapter['children'][1]['children'][0]['canEdit'])
+
 
 class EdXAssetUnitTests(RepositoryTestCase):
     """Test the basic query functionality for assets
@@ -2753,6 +2857,32 @@ class RepositorySearchTests(AssessmentTestCase, RepositoryTestCase):
                     'Item'
                 )
 
+    def test_query_plans_count_objects_per_run(self):
+        url = self.url.replace('/search/?', '/queryplans/')
+        for i in range(0, 2):
+            # second time is served from the facet index
+            req = self.client.get(url)
+            self.ok(req)
+            data = self.json(req)
+            self.assertEqual(len(data['facets']['course']), 1)
+            self.assertEqual(data['facets']['course'][0][1], 30)
+
+    def test_query_plans_are_updated_when_assets_change(self):
+        url = self.url.replace('/search/?', '/queryplans/')
+        req = self.client.get(url)
+        self.ok(req)
+
+        req = self.client.get(self.url + 'page=1&limit=1')
+        self.ok(req)
+        asset_id = self.json(req)['objects'][0]['id']
+        req = self.client.delete(self.base_url + 'repository/assets/' + asset_id + '/')
+        self.deleted(req)
+
+        req = self.client.get(url)
+        self.ok(req)
+        data = self.json(req)
+        self.assertEqual(data['facets']['course'][0][1], 29)
+
 
 @override_settings(CELERY_ALWAYS_EAGER=True,
                    WEBSOCKET_EXCHANGE='test.backstage.producer')
@@ -3129,6 +3259,37 @@ class RepositoryCrUDTests(AssessmentTestCase, RepositoryTestCase):
             0
         )
 
+    def test_uploaded_assets_get_has_contents(self):
+        user_repo = self.create_new_user_repo()
+        url = self.url + str(user_repo.ident) + '/upload/'
+        payload = {
+            'myFile': self.demo_course
+        }
+        req = self.client.post(url, data=payload)
+        self.ok(req)
+        rm = gutils.get_session_data(self.req, 'rm')
+        querier = rm.get_repository_query()
+        querier.match_genus_type(Type(**REPOSITORY_GENUS_TYPES['course-run-repo']), True)
+        course_run_repo = rm.get_repository(rm.get_repositories_by_query(querier).next().ident)
+        self.assertEqual(rutils.get_asset_ids_without_has_contents(course_run_repo), [])
+
+    def test_journal_of_deleted_course_is_not_resumed(self):
+        user_repo = self.create_new_user_repo()
+        self.num_repos(1)
+        journal = iutils.ImportJournal(iutils.get_import_key(self.demo_course, user_repo.ident))
+        self.demo_course.seek(0)
+        journal.add_done_ids('course', ['repository.Repository%3A000000000000000000000001%40ODL.MIT.EDU'])
+        journal.mark_done('course')
+
+        url = self.url + str(user_repo.ident) + '/upload/'
+        payload = {
+            'myFile': self.demo_course
+        }
+        req = self.client.post(url, data=payload)
+        self.ok(req)
+        self.num_repos(5)  # Users, user-repo, target repo, course repo, run repo
+        self.assertFalse(journal.is_done('course'))
+
     def test_bad_file_upload_throws_exception(self):
         domain = self.create_new_repo()
         self.num_repos(1)
@@ -1,5 +1,7 @@
 import os
+import json
 import stat
+import hashlib
 
 from bson.errors import InvalidId
 
@@ -8,7 +10,6 @@ from rest_framework import exceptions
 
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.http import HttpResponse
 
 from dlkit.abstract_osid.assessment.objects import Item
 from dlkit.abstract_osid.repository.objects import Asset
@@ -22,9 +23,13 @@ from dlkit.records.registry import COMPOSITION_GENUS_TYPES,\
 from dysonx.dysonx import get_or_create_user_repo, _get_genus_type,\
     _get_asset_content_genus_type
 
+from utilities import assessment as autils
 from utilities import general as gutils
+from utilities import imports as iutils
 from utilities import repository as rutils
-from producer.tasks import import_file
+from utilities import search as sutils
+from utilities import snapshots as snutils
+from producer.tasks import export_run, import_file
 from producer.views import ProducerAPIViews
 
 LORE_REPO_RECORD_TYPE = Type(**REPOSITORY_RECORD_TYPES['lore-repo'])
@@ -53,6 +58,10 @@ EDX_ASSESSMENT_GENUS_TYPES_FOR_FACETS = [str(Type(**genus_type))
 ENCLOSURE_TYPE = Type(**OSID_OBJECT_RECORD_TYPES['enclosure'])
 
 
+def get_asset_content_genus_types(asset):
+    # read from the map, instead of building every asset content
+    return set(asset_content['genusTypeId'] for asset_content in asset._my_map.get('assetContents', []))
+
 def get_facets_values(params, facet_prefix):
     if 'selected_facets' in params or 'selected_facets[]' in params:
         param_list = params.getlist('selected_facets')
@@ -69,6 +78,12 @@ def get_facets_values(params, facet_prefix):
     else:
         return None
 
+def get_genus_types(obj):
+    return set([obj._my_map['genusTypeId']])
+
+def get_learning_objective_ids(obj):
+    return set(obj._my_map.get('learningObjectiveIds', []))
+
 def get_page_and_limits(params):
     """default of 10 items per page"""
     page = 1
@@ -93,36 +108,180 @@ def increment(dictionary, key):
         dictionary[key] = 0
     dictionary[key] += 1
 
+def merge_counts(counts, run_counts):
+    """add the [count, name] facet counts of one run into the totals"""
+    for key, value in run_counts.iteritems():
+        if key not in counts:
+            counts[key] = [value[0], value[1]]
+        else:
+            counts[key][0] += value[0]
+
 
 class CompositionMapMixin(object):
+    def _get_asset_repository(self, asset, asset_repos):
+        """look up each asset repository once per tree, instead of once per asset"""
+        repository_id = str(asset.object_map['repositoryId'])
+        if repository_id not in asset_repos:
+            asset_repos[repository_id] = self.rm.get_repository(gutils.clean_id(repository_id))
+        return asset_repos[repository_id]
+
+    def _get_children(self, compositions, repository=None):
+        """
+        the (child, can_edit) tuples of each composition in one level of the
+        tree, like all_children(), but with one lookup per object kind for the
+        whole level. Children in the composition's own repository can be edited
+        """
+        def get_repository_id(composition):
+            if repository is not None:
+                return str(repository.ident)
+            return str(composition._my_map['assignedRepositoryIds'][0])
+
+        child_ids = {}
+        repository_child_ids = {}
+        for composition in compositions:
+            ids = [str(child_id) for child_id in composition.get_child_ids()]
+            child_ids[str(composition.ident)] = ids
+            repository_child_ids.setdefault(get_repository_id(composition), set()).update(ids)
+
+        children = {}
+        for repository_id, ids in repository_child_ids.items():
+            lookup_session = rutils.get_session_for_repository(self.rm, 'composition', 'lookup',
+                                                               repository_id)
+            lookup_session.use_unsequestered_composition_view()
+            for child in lookup_session.get_compositions_by_ids([gutils.clean_id(i) for i in ids]):
+                children[(repository_id, str(child.ident))] = (child, True)
+
+        other_ids = set()
+        for composition in compositions:
+            repository_id = get_repository_id(composition)
+            other_ids.update(child_id for child_id in child_ids[str(composition.ident)]
+                             if (repository_id, child_id) not in children)
+        other_children = {}
+        if len(other_ids) > 0:
+            lookup_session = rutils.get_session(self.rm, 'composition', 'lookup')
+            lookup_session.use_unsequestered_composition_view()
+            for child in lookup_session.get_compositions_by_ids([gutils.clean_id(i) for i in other_ids]):
+                other_children[str(child.ident)] = (child, False)
+
+        # the assets of sequestered children take their place in the tree
+        asset_ids = set()
+        for child, can_edit in children.values() + other_children.values():
+            if child.is_sequestered():
+                asset_ids.update(child._my_map.get('assetIds', []))
+        assets = {}
+        if len(asset_ids) > 0:
+            lookup_session = rutils.get_session(self.rm, 'asset', 'lookup')
+            for asset in lookup_session.get_assets_by_ids([gutils.clean_id(i) for i in asset_ids]):
+                assets[str(asset.ident)] = asset
+        item_ids = set()
+        for asset in assets.values():
+            enclosed_object_id = asset.object_map.get('enclosedObjectId')
+            if enclosed_object_id is not None and \
+                    gutils.clean_id(enclosed_object_id).namespace == 'assessment.Item':
+                item_ids.add(enclosed_object_id)
+        items = {}
+        if len(item_ids) > 0:
+            lookup_session = autils.get_session(self.am, 'item', 'lookup')
+            for item in lookup_session.get_items_by_ids([gutils.clean_id(i) for i in item_ids]):
+                items[str(item.ident)] = item
+
+        def get_sequestered_assets(child):
+            sequestered_assets = []
+            for asset_id in child._my_map.get('assetIds', []):
+                if asset_id not in assets:
+                    continue
+                enclosed_object_id = assets[asset_id].object_map.get('enclosedObjectId')
+                if enclosed_object_id is None:
+                    sequestered_assets.append(assets[asset_id])
+                elif enclosed_object_id in items:
+                    sequestered_assets.append(items[enclosed_object_id])
+                else:
+                    # an enclosed assessment, expanded to its items by dlkit
+                    return list(child.assets)
+            return sequestered_assets
+
+        level_children = {}
+        for composition in compositions:
+            repository_id = get_repository_id(composition)
+            composition_children = []
+            for child_id in child_ids[str(composition.ident)]:
+                child_tuple = children.get((repository_id, child_id),
+                                           other_children.get(child_id))
+                if child_tuple is None:
+                    # deleted or no longer authorized. all_children() replaces
+                    # the missing children with error compositions
+                    composition_children = composition.all_children(repository=repository)
+                    break
+                child, can_edit = child_tuple
+                if child.is_sequestered():
+                    composition_children += [(asset, False)
+                                             for asset in get_sequestered_assets(child)]
+                else:
+                    composition_children.append((child, can_edit))
+            level_children[str(composition.ident)] = composition_children
+        return level_children
+
     def _get_map_with_children(self, obj, renderable=False, repository=None):
+        """
+        loads the tree one level at a time, with batched lookups per
+        level, and assembles the nested map in memory
+        """
+        asset_repos = {}
         obj_map = obj.object_map
-        obj_map['children'] = []
-        for child_tuple in obj.all_children(repository=repository):
-            child = child_tuple[0]
-            can_edit = child_tuple[1]
-            if isinstance(child, Item):
-                child_map = child.object_map
-                if renderable:
-                    child_map['texts']['edxml'] = child.get_edxml_with_aws_urls()
-            elif isinstance(child, Asset):
-                if renderable:
-                    asset_repo = self.rm.get_repository(gutils.clean_id(child.object_map['repositoryId']))
-                    child_map = rutils.update_asset_urls(asset_repo,
-                                                         child,
-                                                         {'renderable_edxml': True})
-                else:
-                    child_map = child.object_map
-            else:
-                child_map = self._get_map_with_children(child,
-                                                        renderable=renderable,
-                                                        repository=repository)
-            child_map.update({
-                'canEdit': can_edit
-            })
-            obj_map['children'].append(child_map)
+        level = [(obj, obj_map)]
+        while len(level) > 0:
+            next_level = []
+            level_children = self._get_children([composition for composition, _ in level],
+                                                repository=repository)
+            for composition, composition_map in level:
+                composition_map['children'] = []
+                for child_tuple in level_children[str(composition.ident)]:
+                    child = child_tuple[0]
+                    can_edit = child_tuple[1]
+                    if isinstance(child, Item):
+                        child_map = child.object_map
+                        if renderable:
+                            child_map['texts']['edxml'] = child.get_edxml_with_aws_urls()
+                    elif isinstance(child, Asset):
+                        if renderable:
+                            child_map = rutils.update_asset_urls(self._get_asset_repository(child,
+                                                                                            asset_repos),
+                                                                 child,
+                                                                 {'renderable_edxml': True})
+                        else:
+                            child_map = child.object_map
+                    else:
+                        child_map = child.object_map
+                        next_level.append((child, child_map))
+                    child_map.update({
+                        'canEdit': can_edit
+                    })
+                    composition_map['children'].append(child_map)
+            level = next_level
         return obj_map
 
+    def _get_tree(self, request, obj, renderable=False, repository=None):
+        """
+        _get_map_with_children, served from a cached snapshot when
+        ENABLE_TREE_SNAPSHOTS is on
+        """
+        if not settings.ENABLE_TREE_SNAPSHOTS:
+            return self._get_map_with_children(obj, renderable=renderable, repository=repository)
+
+        pool_key = gutils.get_manager_pool_key(request)
+        params = [obj.ident, renderable]
+        if repository is not None:
+            params.append(repository.ident)
+        tree = snutils.get_tree_snapshot(pool_key, 'tree', *params)
+        if tree is None:
+            catalog_ids = obj._my_map.get('assignedRepositoryIds', [])
+            if repository is not None:
+                catalog_ids = catalog_ids + [str(repository.ident)]
+            versions = snutils.get_tree_versions(catalog_ids, pool_key, 'tree', *params)
+            tree = self._get_map_with_children(obj, renderable=renderable, repository=repository)
+            snutils.set_tree_snapshot(versions, tree, pool_key, 'tree', *params)
+        return tree
+
 
 class AssetDetails(ProducerAPIViews):
     """
@@ -153,6 +312,8 @@ class AssetDetails(ProducerAPIViews):
                 repository.delete_asset_content(asset_content.ident)
 
             repository.delete_asset(gutils.clean_id(asset_id))
+            gutils.forget_object_catalog_id(asset_id)
+            sutils.invalidate_search_caches(repository.ident)
             return gutils.DeletedResponse()
         except (PermissionDenied, IllegalState, InvalidId) as ex:
             gutils.handle_exceptions(ex)
@@ -195,6 +356,9 @@ class AssetDetails(ProducerAPIViews):
                         'repository': repository
                     })
 
+                if len(self.data['files']) == 0:
+                    rutils.set_asset_has_contents(repository, original_asset.ident, False)
+
             if 'displayName' in self.data or 'description' in self.data:
                 form = repository.get_asset_form_for_update(gutils.clean_id(asset_id))
                 form = gutils.set_form_basics(form, self.data)
@@ -208,6 +372,8 @@ class AssetDetails(ProducerAPIViews):
                                                  for i in self.data['learningObjectiveIds']])
                 updated_asset = repository.update_asset(form)
 
+            sutils.invalidate_search_caches(repository.ident)
+
             data = updated_asset.object_map
             return gutils.UpdatedResponse(data)
         except (PermissionDenied, InvalidArgument, NoAccess, InvalidId, KeyError) as ex:
@@ -230,13 +396,7 @@ class AssetDownload(ProducerAPIViews):
 
             filename, olx = asset.export_standalone_olx()
 
-            response = HttpResponse(content_type="application/tar")
-            response['Content-Disposition'] = 'attachment; filename=%s' % filename
-            olx.seek(0, os.SEEK_END)
-            response.write(olx.getvalue())
-            olx.close()
-
-            return response
+            return gutils.get_olx_download_response(filename, olx)
         except (PermissionDenied, InvalidArgument, NotFound) as ex:
             gutils.handle_exceptions(ex)
 
@@ -283,8 +443,7 @@ class AssetsList(ProducerAPIViews):
             data = gutils.extract_items(request, assets)
 
             # need to replace each URL here with CloudFront URL...
-            for asset in data['data']['results']:
-                asset = rutils.update_asset_urls(asset_lookup_session, asset)
+            rutils.update_assets_urls(asset_lookup_session, data['data']['results'])
 
             return Response(data)
         except (PermissionDenied, NotFound) as ex:
@@ -304,6 +463,8 @@ class AssetsList(ProducerAPIViews):
                 created_asset = rutils.create_asset(repository, asset)
                 return_data[created_asset[0]] = created_asset[1]  # (asset_label: asset_id)
 
+            sutils.invalidate_search_caches(repository.ident)
+
             return gutils.CreatedResponse(return_data)
         except (PermissionDenied, InvalidArgument, KeyError) as ex:
             gutils.handle_exceptions(ex)
@@ -373,17 +534,17 @@ class CompositionAssetsList(ProducerAPIViews):
                                                       composition_id,
                                                       'composition')
             try:
-                assets = repository.get_composition_assets(gutils.clean_id(composition_id))
+                # keep the asset objects, to get their URLs after serializing the page
+                assets = list(repository.get_composition_assets(gutils.clean_id(composition_id)))
             except NotFound:
                 assets = []
+            asset_objects = dict((str(asset.ident), asset) for asset in assets)
 
             data = gutils.extract_items(request, assets)
             # need to replace each URL here with CloudFront URL...
-            for asset in data['data']['results']:
-                asset_repo = rutils.get_object_repository(self.rm,
-                                                          asset['id'],
-                                                          'asset')
-                asset = rutils.update_asset_urls(asset_repo, asset)
+            rutils.update_assets_urls_by_repository(self.rm,
+                                                    data['data']['results'],
+                                                    asset_objects=asset_objects)
 
             return Response(data)
         except (PermissionDenied, NotFound) as ex:
@@ -403,6 +564,7 @@ class CompositionAssetsList(ProducerAPIViews):
                                                       repository,
                                                       composition_id,
                                                       self.data['assetIds'])
+            sutils.invalidate_search_caches(repository.ident)
             data = gutils.extract_items(request, assets)
 
             return gutils.UpdatedResponse(data)
@@ -486,6 +648,7 @@ class CompositionDetails(ProducerAPIViews, CompositionMapMixin):
                                                                 child_id,
                                                                 'composition')
                         sub_repo.delete_composition(child_id)
+                        gutils.forget_object_catalog_id(child_id)
                     except NotFound:
                         pass  # not unlocked / cloned into the target repo
 
@@ -493,11 +656,15 @@ class CompositionDetails(ProducerAPIViews, CompositionMapMixin):
                                                     composition_id,
                                                     'composition')
             sub_repo.delete_composition(gutils.clean_id(composition_id))
+            gutils.forget_object_catalog_id(composition_id)
 
             # have to remove references to it in other repo / compositions
             # that may not have cloned it locally
             rutils.clean_up_dangling_references(self.rm, composition_id)
 
+            sutils.invalidate_search_caches(sub_repo.ident)
+            sutils.invalidate_search_caches(user_repository.ident)
+
             return gutils.DeletedResponse()
         except (PermissionDenied, IllegalState, InvalidId, NotFound, KeyError) as ex:
             gutils.handle_exceptions(ex)
@@ -512,7 +679,7 @@ class CompositionDetails(ProducerAPIViews, CompositionMapMixin):
 
             if 'fullMap' in self.data:
                 # add in the assets and children compositions, in renderable_edxml format
-                composition_map = self._get_map_with_children(composition, renderable=True)
+                composition_map = self._get_tree(request, composition, renderable=True)
             else:
                 composition_map = composition.object_map
 
@@ -591,6 +758,8 @@ class CompositionDetails(ProducerAPIViews, CompositionMapMixin):
                                                    username=request.user.username)
                 composition = repository.get_composition(composition.ident)
 
+            sutils.invalidate_search_caches(repository.ident)
+
             return gutils.UpdatedResponse(composition.object_map)
         except (PermissionDenied, InvalidArgument, InvalidId, KeyError) as ex:
             gutils.handle_exceptions(ex)
@@ -617,13 +786,7 @@ class CompositionDownload(ProducerAPIViews):
             else:
                 filename, olx = composition.export_run_olx()
 
-            response = HttpResponse(content_type="application/tar")
-            response['Content-Disposition'] = 'attachment; filename=%s' % filename
-            olx.seek(0, os.SEEK_END)
-            response.write(olx.getvalue())
-            olx.close()
-
-            return response
+            return gutils.get_olx_download_response(filename, olx)
         except (PermissionDenied, InvalidArgument, NotFound) as ex:
             gutils.handle_exceptions(ex)
 
@@ -733,10 +896,11 @@ class CompositionsList(ProducerAPIViews, CompositionMapMixin):
                 compositions = []
                 course_node = rutils.get_course_node(composition_query_session)
                 if repository_id is not None:
-                    compositions.append(self._get_map_with_children(course_node,
-                                                                    repository=composition_lookup_session))
+                    compositions.append(self._get_tree(request,
+                                                       course_node,
+                                                       repository=composition_lookup_session))
                 else:
-                    compositions.append(self._get_map_with_children(course_node))
+                    compositions.append(self._get_tree(request, course_node))
                 compositions = compositions[0]['children']  # remove the phantom course_node
             else:
                 allowable_query_terms = ['displayName', 'description', 'course', 'chapter',
@@ -844,6 +1008,9 @@ class CompositionsList(ProducerAPIViews, CompositionMapMixin):
                 composition = repository.get_composition(composition.ident)
             except AlreadyExists:
                 composition = repository.get_composition(composition.ident)
+            gutils.forget_object_catalog_id(composition.ident)
+
+            sutils.invalidate_search_caches(repository.ident)
 
             return gutils.CreatedResponse(composition.object_map)
         except (PermissionDenied, InvalidArgument, IllegalState, KeyError) as ex:
@@ -868,6 +1035,7 @@ class RepositoryDetails(ProducerAPIViews):
     def delete(self, request, repository_id, format=None):
         try:
             self.rm.delete_repository(gutils.clean_id(repository_id))
+            sutils.invalidate_search_caches(repository_id)
             return gutils.DeletedResponse()
         except (PermissionDenied, NotFound, InvalidId) as ex:
             gutils.handle_exceptions(ex)
@@ -900,6 +1068,9 @@ class RepositoryDetails(ProducerAPIViews):
                                                       self.data['childIds'])
                 updated_repository = self.rm.get_repository(updated_repository.ident)
 
+            # names and children show up in the search run maps
+            sutils.invalidate_search_caches(updated_repository.ident)
+
             updated_repository = gutils.convert_dl_object(updated_repository)
 
             return gutils.UpdatedResponse(updated_repository)
@@ -987,14 +1158,17 @@ class RepositoriesList(ProducerAPIViews):
 
                 form = gutils.set_form_basics(form, self.data)
                 repo = finalize_method(form)
+                sutils.invalidate_search_caches(repo.ident)
 
                 if 'genusTypeId' in self.data:
                     if self.data['genusTypeId'] == str(COURSE_RUN_REPO_GENUS):
                         self.rm.add_child_repository(gutils.clean_id(self.data['parentId']),
                                                      repo.ident)
+                        sutils.invalidate_search_caches(self.data['parentId'])
                     elif self.data['genusTypeId'] == str(COURSE_REPO_GENUS):
-                        self.rm.add_child_repository(get_or_create_user_repo(request.user.username).ident,
-                                                     repo.ident)
+                        user_repo = get_or_create_user_repo(request.user.username)
+                        self.rm.add_child_repository(user_repo.ident, repo.ident)
+                        sutils.invalidate_search_caches(user_repo.ident)
 
             new_repo = gutils.convert_dl_object(repo)
 
@@ -1040,71 +1214,136 @@ class RepositoryChildrenList(ProducerAPIViews):
             self.rm.remove_child_repositories(repository_id)
             for child_id in self.data['childIds']:
                 self.rm.add_child_repository(repository_id, gutils.clean_id(child_id))
+            sutils.invalidate_search_caches(repository_id)
             return gutils.UpdatedResponse()
         except (PermissionDenied, InvalidArgument, NotFound, KeyError) as ex:
             gutils.handle_exceptions(ex)
 
 
-class RepositoryDownload(ProducerAPIViews):
+class RepositoryDownload(CompositionMapMixin, ProducerAPIViews):
     """
     Download a RUN.
     api/v1/repository/repositories/<repository_id>/download/
 
     GET
+    The export is kept on disk until anything in the run changes. With ?background,
+    a run that has not been exported yet is exported by a celery task,
+    and a 202 is returned -- GET again once the notification arrives. Every
+    user who gets a 202 while the export runs is notified.
     """
+    def _get_export_version(self, run_repo):
+        """
+        a hash of everything that goes into the export: the run, its course,
+        and every object in the run's tree, some of which can be in other
+        repositories and banks. The stored maps are hashed, not the object
+        maps, which have signed URLs in them. Cached until one of those
+        repositories or banks changes, so polls do not walk the tree
+        """
+        version = sutils.get_export_version(run_repo.ident)
+        if version is not None:
+            return version
+
+        digest = hashlib.sha1()
+        catalog_ids = set()
+
+        def add(obj_map):
+            digest.update(json.dumps(obj_map, sort_keys=True, default=str))
+            catalog_ids.update(obj_map.get('assignedRepositoryIds', []))
+            catalog_ids.update(obj_map.get('assignedBankIds', []))
+
+        course_repos = list(self.rm.get_parent_repositories(run_repo.ident))
+        generations = sutils.get_export_generations(run_repo.ident,
+                                                    [course_repo.ident for course_repo in course_repos])
+        add(run_repo.object_map)
+        for course_repo in course_repos:
+            add(course_repo.object_map)
+        catalog_ids.update(str(catalog.ident) for catalog in [run_repo] + course_repos)
+        level = [rutils.get_course_node(run_repo)]
+        while len(level) > 0:
+            next_level = []
+            level_children = self._get_children(level, repository=run_repo)
+            for composition in level:
+                add(composition._my_map)
+                for child, can_edit in level_children[str(composition.ident)]:
+                    if isinstance(child, (Asset, Item)):
+                        add(child._my_map)
+                    else:
+                        next_level.append(child)
+            level = next_level
+        version = digest.hexdigest()
+        sutils.set_export_version(run_repo.ident, version, generations, catalog_ids)
+        return version
+
     def get(self, request, repository_id, format=None):
         try:
             run_repo = self.rm.get_repository(gutils.clean_id(repository_id))
             if str(run_repo.genus_type) != str(Type(**REPOSITORY_GENUS_TYPES['course-run-repo'])):
                 raise InvalidArgument('You can only download run repositories.')
 
-            filename, olx = run_repo.export_olx()
+            version = self._get_export_version(run_repo)
+            artifact = rutils.open_export_artifact(run_repo.ident, version)
+            if artifact is None:
+                if 'background' in self.data:
+                    if rutils.start_export(run_repo.ident, version, request.user.username):
+                        export_run.apply_async((run_repo, version, request.user))
+                    return gutils.AcceptedResponse()
 
-            response = HttpResponse(content_type="application/tar")
-            response['Content-Disposition'] = 'attachment; filename=%s' % filename
-            olx.seek(0, os.SEEK_END)
-            response.write(olx.getvalue())
-            olx.close()
+                filename, olx = run_repo.export_olx()
+                rutils.save_export_artifact(run_repo.ident, version, filename, olx)
+                artifact = (filename, olx)
 
-            return response
+            filename, olx = artifact
+            return gutils.get_olx_download_response(filename, olx)
         except (PermissionDenied, InvalidArgument, NotFound) as ex:
             gutils.handle_exceptions(ex)
 
 
 class QueryHelpersMixin(object):
     def _get_current_los(self, repo):
-        bank = self.am.get_bank(repo.ident)
-        bank.use_federated_bank_view()
-        repo.use_federated_repository_view()
-        repo.use_unsequestered_composition_view()
-
-        asset_querier = repo.get_asset_query()
-        composition_querier = repo.get_composition_query()
-        item_querier = bank.get_item_query()
-
-        asset_querier.match_any_learning_objective(True)
-        composition_querier.match_any_learning_objective(True)
-        item_querier.match_any_learning_objective(True)
-
-        assets = repo.get_assets_by_query(asset_querier)
-        compositions = repo.get_compositions_by_query(composition_querier)
-        items = bank.get_items_by_query(item_querier)
-
-        los = [str(lo) for a in assets for lo in a.get_learning_objective_ids()]
-        los += [str(lo) for c in compositions for lo in c.get_learning_objective_ids()]
-        los += [str(lo) for i in items for lo in i.get_learning_objective_ids()]
+        """(objective id, display name) of every learning objective used in the repository"""
+        objective_counts = sutils.get_objective_counts(repo.ident)
+        if objective_counts is None:
+            generations = sutils.get_generations(repo.ident, self._get_run_map(repo).keys())
+            bank = self.am.get_bank(repo.ident)
+            bank.use_federated_bank_view()
+            repo.use_federated_repository_view()
+            repo.use_unsequestered_composition_view()
 
-        los = list(set(los))
-
-        # ols = self.lm._instantiate_session(method_name='get_objective_lookup_session',
-        #                                    proxy=self.lm._proxy)
-        ols = self.lm.get_objective_lookup_session(proxy=self.lm._proxy)
-
-        results = ols.get_objectives_by_ids([gutils.clean_id(i) for i in los])
-
-        return results
+            asset_querier = repo.get_asset_query()
+            composition_querier = repo.get_composition_query()
+            item_querier = bank.get_item_query()
 
-    def _construct_count_queries(self, repo, composition_id=None, with_los=False, with_types=False):
+            asset_querier.match_any_learning_objective(True)
+            composition_querier.match_any_learning_objective(True)
+            item_querier.match_any_learning_objective(True)
+
+            objective_counts = {}
+            for objects in [repo.get_assets_by_query(asset_querier),
+                            repo.get_compositions_by_query(composition_querier),
+                            bank.get_items_by_query(item_querier)]:
+                for obj in objects:
+                    for lo in obj.get_learning_objective_ids():
+                        increment(objective_counts, str(lo))
+            sutils.set_objective_counts(repo.ident, objective_counts, generations)
+
+        los = objective_counts.keys()
+        names = sutils.get_objective_names(los)
+        missing_los = [lo for lo in los if lo not in names]
+
+        if len(missing_los) > 0:
+            # ols = self.lm._instantiate_session(method_name='get_objective_lookup_session',
+            #                                    proxy=self.lm._proxy)
+            ols = self.lm.get_objective_lookup_session(proxy=self.lm._proxy)
+
+            objectives = ols.get_objectives_by_ids([gutils.clean_id(i) for i in missing_los])
+            missing_names = dict((str(objective.ident), str(objective.display_name.text))
+                                 for objective in objectives)
+            sutils.set_objective_names(missing_names)
+            names.update(missing_names)
+
+        return [(lo, names[lo]) for lo in los if lo in names]
+
+    def _construct_count_queries(self, repo, composition_id=None):
         bank = self.am.get_bank(repo.ident)
         bank.use_federated_bank_view()
 
@@ -1118,26 +1357,6 @@ class QueryHelpersMixin(object):
                 composition_querier.match_keyword(term, gutils.WORDIGNORECASE_STRING_MATCH_TYPE, True)
                 item_querier.match_keyword(term, gutils.WORDIGNORECASE_STRING_MATCH_TYPE, True)
 
-        # match learning objectives
-        if with_los:
-            if self.facet_learning_objectives is not None and self.facet_learning_objectives != ['']:
-                for objective_id in self.facet_learning_objectives:
-                    asset_querier.match_learning_objective(objective_id, True)
-                    composition_querier.match_learning_objective(objective_id, True)
-                    item_querier.match_learning_objective_id(objective_id, True)
-
-        # match the selected genus types:
-        if with_types:
-            if self.facet_resource_types is not None:
-                for resource_type in self.facet_resource_types:
-                    resource_genus_type = Type(resource_type)
-                    if resource_type in COMPOSITION_GENUS_TYPES_STR:
-                        composition_querier.match_genus_type(resource_genus_type, True)
-                    elif resource_type == 'edx-assessment-item%3Aproblem%40EDX.ORG':
-                        pass  # already have an item query from above
-                    else:
-                        asset_querier.match_asset_content_genus_type(resource_genus_type, True)
-
         if composition_id is not None:
             # match the composition descendants
             asset_querier.match_composition_descendants(composition_id, repo.ident, True)
@@ -1146,7 +1365,13 @@ class QueryHelpersMixin(object):
 
         return asset_querier, composition_querier, item_querier
 
-    def _count_by_learning_objectives(self, run_identifier, lo_counts, domain_repo):
+    def _count_facets(self, run_identifier, run_counts, domain_repo):
+        """
+        count the objects of one run per resource type and per learning
+        objective, in a single query and pass for each kind of object.
+        Resource types are counted among the objects that match the selected
+        objectives, and objectives among those that match the selected types
+        """
         if isinstance(run_identifier, basestring):
             run_identifier = gutils.clean_id(run_identifier)
         if 'repository.Repository' in str(run_identifier):
@@ -1160,144 +1385,127 @@ class QueryHelpersMixin(object):
         bank.use_federated_bank_view()
 
         asset_querier, composition_querier, item_querier = self._construct_count_queries(repo,
-                                                                                         composition_id,
-                                                                                         with_types=True)
-        self._count_los(lo_counts,
-                        self.current_los,
-                        asset_querier,
-                        repo,
-                        'clear_match_learning_objective',
-                        'match_learning_objective',
-                        'get_assets_by_query')
-
-        self._count_los(lo_counts,
-                        self.current_los,
-                        composition_querier,
-                        repo,
-                        'clear_match_learning_objective',
-                        'match_learning_objective',
-                        'get_compositions_by_query')
-
-        self._count_los(lo_counts,
-                        self.current_los,
-                        item_querier,
-                        bank,
-                        'clear_learning_objective_id_terms',
-                        'match_learning_objective_id',
-                        'get_items_by_query')
-
-    def _count_los(self, counts, iterator, querier, catalog, clear_method, match_method, get_method):
-        for objective in iterator:
-            objective_id = objective.ident
-            objective_name = objective.display_name.text
-            if self.facet_learning_objectives is not None and self.facet_learning_objectives != ['']:
-                if str(objective_id) in self.facet_learning_objectives:
-                    getattr(querier, clear_method)()
-                    getattr(querier, match_method)(objective_id, True)
-                    if str(objective_id) not in counts:
-                        counts.update({
-                            str(objective_id): [getattr(catalog, get_method)(querier).available(), str(objective_name)]
-                        })
-                    else:
-                        counts[str(objective_id)][0] += getattr(catalog, get_method)(querier).available()
-                else:
-                    if str(objective_id) not in counts:
-                        counts[str(objective_id)] = [0, str(objective_name)]
+                                                                                         composition_id)
+        asset_types, composition_types = self._get_selected_genus_types()
+
+        for objects, genus_types, get_keys, selected_types in [
+                (repo.get_assets_by_query(asset_querier),
+                 EDX_ASSET_CONTENT_GENUS_TYPES_FOR_FACETS,
+                 get_asset_content_genus_types,
+                 asset_types),
+                (repo.get_compositions_by_query(composition_querier),
+                 COMPOSITION_GENUS_TYPES_FOR_FACETS,
+                 get_genus_types,
+                 composition_types),
+                (bank.get_items_by_query(item_querier),
+                 EDX_ASSESSMENT_GENUS_TYPES_FOR_FACETS,
+                 get_genus_types,
+                 None)]:
+            genus_counts = {}
+            objective_counts = {}
+            for obj in objects:
+                obj_types = get_keys(obj)
+                objective_ids = get_learning_objective_ids(obj)
+                if (self.facet_learning_objectives is None or self.facet_learning_objectives == [''] or
+                        len(objective_ids.intersection(self.facet_learning_objectives)) > 0):
+                    for genus in obj_types:
+                        increment(genus_counts, genus)
+                if selected_types is None or len(obj_types & selected_types) > 0:
+                    for objective_id in objective_ids:
+                        increment(objective_counts, objective_id)
+
+            self._count_type(run_counts['resource_type'], genus_types, genus_counts)
+            if settings.ENABLE_OBJECTIVE_FACETS:
+                self._count_los(run_counts['learning_objective'], self.current_los, objective_counts)
+
+    def _count_los(self, counts, iterator, objective_counts):
+        """add the {objective_id: count} of one kind of object to the facet counts"""
+        for objective_id, objective_name in iterator:
+            if (self.facet_learning_objectives is not None and self.facet_learning_objectives != [''] and
+                    objective_id not in self.facet_learning_objectives):
+                count = 0
             else:
-                getattr(querier, clear_method)()
-                getattr(querier, match_method)(objective_id, True)
-                if str(objective_id) not in counts:
-                    counts.update({
-                        str(objective_id): [getattr(catalog, get_method)(querier).available(), str(objective_name)]
-                    })
-                else:
-                    counts[str(objective_id)][0] += getattr(catalog, get_method)(querier).available()
+                count = objective_counts.get(objective_id, 0)
+            if objective_id not in counts:
+                counts[objective_id] = [count, objective_name]
+            else:
+                counts[objective_id][0] += count
 
-    def _count_type(self, counts, iterator, querier, catalog, clear_method, match_method, get_method):
+    def _count_type(self, counts, iterator, genus_counts):
+        """add the {genus_type: count} of one kind of object to the facet counts"""
         for genus in iterator:
             genus_type = Type(genus)
-            if self.facet_resource_types is not None:
-                if genus in self.facet_resource_types:
-                    getattr(querier, clear_method)()
-                    getattr(querier, match_method)(genus_type, True)
-                    if genus_type.identifier not in counts:
-                        counts.update({
-                            genus_type.identifier: [getattr(catalog, get_method)(querier).available(), str(genus_type)]
-                        })
-                    else:
-                        counts[genus_type.identifier][0] += getattr(catalog, get_method)(querier).available()
-                else:
-                    if genus_type.identifier not in counts:
-                        counts[genus_type.identifier] = [0, str(genus_type)]
+            if self.facet_resource_types is not None and genus not in self.facet_resource_types:
+                count = 0
             else:
-                getattr(querier, clear_method)()
-                getattr(querier, match_method)(genus_type, True)
-                if genus_type.identifier not in counts:
-                    counts.update({
-                        genus_type.identifier: [getattr(catalog, get_method)(querier).available(), str(genus_type)]
-                    })
-                else:
-                    counts[genus_type.identifier][0] += getattr(catalog, get_method)(querier).available()
-
-    def _count_objects(self, run_identifier, asset_counts, domain_repo):
-        if isinstance(run_identifier, basestring):
-            run_identifier = gutils.clean_id(run_identifier)
-        if 'repository.Repository' in str(run_identifier):
-            repo = self.rm.get_repository(gutils.clean_id(run_identifier))
-            composition_id = None
-        else:
-            repo = domain_repo
-            composition_id = run_identifier
-
-        bank = self.am.get_bank(repo.ident)
-        bank.use_federated_bank_view()
-
-        asset_genus_types = EDX_ASSET_CONTENT_GENUS_TYPES_FOR_FACETS
-        composition_genus_types = COMPOSITION_GENUS_TYPES_FOR_FACETS
-        item_genus_types = EDX_ASSESSMENT_GENUS_TYPES_FOR_FACETS
-
-        asset_querier, composition_querier, item_querier = self._construct_count_queries(repo,
-                                                                                         composition_id,
-                                                                                         with_los=True)
-
-        self._count_type(asset_counts,
-                         asset_genus_types,
-                         asset_querier,
-                         repo,
-                         'clear_match_asset_content_genus_type',
-                         'match_asset_content_genus_type',
-                         'get_assets_by_query')
-
-        self._count_type(asset_counts,
-                         composition_genus_types,
-                         composition_querier,
-                         repo,
-                         'clear_genus_type_terms',
-                         'match_genus_type',
-                         'get_compositions_by_query')
-
-        self._count_type(asset_counts,
-                         item_genus_types,
-                         item_querier,
-                         bank,
-                         'clear_genus_type_terms',
-                         'match_genus_type',
-                         'get_items_by_query')
-
-    def _get_all_items(self, run_id, repository=None):
+                count = genus_counts.get(genus, 0)
+            if genus_type.identifier not in counts:
+                counts[genus_type.identifier] = [count, str(genus_type)]
+            else:
+                counts[genus_type.identifier][0] += count
+
+    def _count_run(self, run_identifier, domain_repo):
+        """total objects, plus resource type and learning objective counts for one run"""
+        run_id = gutils.clean_id(run_identifier)
+        run_counts = {
+            'total': 0,
+            'resource_type': {},
+            'learning_objective': {}
+        }
+
+        assets, compositions, items = self._get_all_items(run_id, domain_repo)
+        for obj in [assets, compositions, items]:
+            if obj is not None:
+                run_counts['total'] += obj.available()
+
+        if settings.ENABLE_OBJECTIVE_FACETS and self.current_los is None:
+            self.current_los = self._get_current_los(domain_repo)
+        self._count_facets(run_id, run_counts, domain_repo)
+        return run_counts
+
+    def _get_content_items(self, run_identifier, domain_repo):
+        """the search results of one run, leaving out enclosure assets"""
+        return self._get_all_items(gutils.clean_id(run_identifier),
+                                   domain_repo,
+                                   with_contents_only=True)
+
+    def _get_all_items(self, run_id, repository=None, with_contents_only=False):
         if isinstance(run_id, basestring):
             run_id = gutils.clean_id(run_id)
         if 'repository.Repository' in str(run_id):
             repo = self.rm.get_repository(run_id)
-            assets, compositions, items = self._get_all_items_by_repo(repo)
+            assets, compositions, items = self._get_all_items_by_repo(repo, with_contents_only)
         else:
             # is a composition run
             repository.use_unsequestered_composition_view()
             composition = repository.get_composition(run_id)
-            assets, compositions, items = self._get_all_items_by_composition(composition, repository)
+            assets, compositions, items = self._get_all_items_by_composition(composition,
+                                                                             repository,
+                                                                             with_contents_only)
         return assets, compositions, items
 
-    def _get_all_items_by_composition(self, composition, repo):
+    def _get_assets_by_query(self, repo, querier, with_contents_only=False):
+        """
+        with_contents_only leaves out assets without any asset contents,
+        i.e. enclosures, and returns a list of asset lists to chain together.
+        Assets flagged with hasContents are filtered in the query; older
+        assets without the flag are still checked one by one.
+        """
+        if not with_contents_only:
+            return repo.get_assets_by_query(querier)
+
+        querier._add_match('hasContents', True, True)
+        asset_lists = [repo.get_assets_by_query(querier)]
+
+        querier._clear_terms('hasContents')
+        querier._add_match('hasContents', None, True)
+        unflagged_assets = repo.get_assets_by_query(querier)
+        if unflagged_assets.available() > 0:
+            asset_lists.append(a for a in unflagged_assets
+                               if a.get_asset_contents().available() > 0)
+        return asset_lists
+
+    def _get_all_items_by_composition(self, composition, repo, with_contents_only=False):
         # these items / assets / compositions must be children
         # of the descendants of the passed-in composition
         # So add in a query filter for them all
@@ -1367,7 +1575,7 @@ class QueryHelpersMixin(object):
 
         # run query
         if asset_querier is not None:
-            all_assets = repo.get_assets_by_query(asset_querier)
+            all_assets = self._get_assets_by_query(repo, asset_querier, with_contents_only)
         else:
             all_assets = None
         if composition_querier is not None:
@@ -1381,7 +1589,7 @@ class QueryHelpersMixin(object):
 
         return all_assets, all_compositions, all_items
 
-    def _get_all_items_by_repo(self, repo):
+    def _get_all_items_by_repo(self, repo, with_contents_only=False):
         if isinstance(repo, dict):
             repo = self.rm.get_repository(gutils.clean_id(repo['id']))
         bank = self.am.get_bank(repo.ident)
@@ -1440,7 +1648,7 @@ class QueryHelpersMixin(object):
 
         # run query
         if asset_querier is not None:
-            all_assets = repo.get_assets_by_query(asset_querier)
+            all_assets = self._get_assets_by_query(repo, asset_querier, with_contents_only)
         else:
             all_assets = None
         if composition_querier is not None:
@@ -1454,7 +1662,48 @@ class QueryHelpersMixin(object):
 
         return all_assets, all_compositions, all_items
 
+    def _get_selected_genus_types(self):
+        """
+        the selected resource types that filter assets (by their asset
+        contents) and compositions, or None if none of them do. Items
+        are never filtered by type
+        """
+        asset_types = set()
+        composition_types = set()
+        for resource_type in self.facet_resource_types or []:
+            if resource_type in COMPOSITION_GENUS_TYPES_STR:
+                composition_types.add(resource_type)
+            elif resource_type != 'edx-assessment-item%3Aproblem%40EDX.ORG':
+                asset_types.add(resource_type)
+        return asset_types or None, composition_types or None
+
+    def _get_selected_runs(self, run_map):
+        """the run ids in run_map that match the selected course facets, if any"""
+        return [run_identifier for run_identifier in run_map
+                if (self.facet_course_runs is None or
+                    any(run_identifier in course for course in self.facet_course_runs))]
+
+    def _get_child_repository_ids(self, repository_id):
+        try:
+            return [str(child_id) for child_id in self.rm.get_child_repository_ids(repository_id)]
+        except NotFound:
+            # not in the hierarchy
+            return []
+
     def _get_run_map(self, repository):
+        run_map = sutils.get_run_map(repository.ident)
+        if run_map is not None:
+            return run_map
+
+        # the course and run ids are looked up first, to take their
+        # generations before reading the names. A course or run added
+        # after that changes the generation of its parent
+        course_ids = self._get_child_repository_ids(repository.ident)
+        hierarchy_ids = course_ids + [run_id
+                                      for course_id in course_ids
+                                      for run_id in self._get_child_repository_ids(gutils.clean_id(course_id))]
+        generations = sutils.get_generations(repository.ident, hierarchy_ids)
+
         # if repository.genus_type == DOMAIN_REPO_GENUS:
         repo_nodes = self.rm.get_repository_nodes(repository_id=gutils.clean_id(repository.ident),
                                                   ancestor_levels=0,
@@ -1482,8 +1731,26 @@ class QueryHelpersMixin(object):
         for run in runs:
             run_map[run[0]] = run[1]
 
+        sutils.set_run_map(repository.ident, run_map, generations)
+
         return run_map
 
+    def _map_runs(self, func, run_identifiers, domain_repo):
+        """
+        call func(run_identifier, domain_repo) for each of the runs concurrently,
+        and return the results in the same order as run_identifiers
+        """
+        # the managers are loaded lazily, so load them here instead of in
+        # the worker threads
+        self.am, self.lm, self.rm
+
+        def _run(run_identifier):
+            # composition views are set on the repository object, so each
+            # run needs its own copy of the domain repository
+            return func(run_identifier, self.rm.get_repository(domain_repo.ident))
+
+        return gutils.map_concurrently(_run, run_identifiers)
+
 
 class RepositoryQueryPlansAvailable(ProducerAPIViews, QueryHelpersMixin):
     """
@@ -1514,49 +1781,41 @@ class RepositoryQueryPlansAvailable(ProducerAPIViews, QueryHelpersMixin):
             if domain_repo.genus_type not in [DOMAIN_REPO_GENUS, USER_REPO_GENUS]:
                 raise InvalidArgument('You can only get query plans for domains or user repos.')
 
-            self.current_los = list(self._get_current_los(domain_repo))
-
             run_map = self._get_run_map(domain_repo)
+            self.current_los = None
+
+            # per-run counts are kept in an index that is shared across
+            # requests, and only the runs missing from it get counted
+            signature = sutils.get_query_signature(self.facet_resource_types,
+                                                   self.facet_learning_objectives,
+                                                   self.query_params,
+                                                   settings.ENABLE_OBJECTIVE_FACETS)
+            facet_index = sutils.get_facet_index(domain_repo.ident, signature)
 
             # first for each repository, get count of its total objects that
-            # meet the keyword filter requirement and other facet requirements
+            # meet the keyword filter requirement and other facet requirements.
+            # The runs are counted concurrently
+            selected_runs = self._get_selected_runs(run_map)
+            missing_runs = [run_identifier for run_identifier in selected_runs
+                            if run_identifier not in facet_index]
+            if len(missing_runs) > 0:
+                generations = sutils.get_generations(domain_repo.ident, run_map.keys())
+                if settings.ENABLE_OBJECTIVE_FACETS:
+                    self.current_los = self._get_current_los(domain_repo)
+                facet_index.update(zip(missing_runs,
+                                       self._map_runs(self._count_run, missing_runs, domain_repo)))
+                sutils.set_facet_index(domain_repo.ident, signature, facet_index, generations)
+
             for run_identifier, run_name in run_map.iteritems():
                 course_run_counts[run_name] = [0, run_identifier]
-                if self.facet_course_runs is None:
-                    # do all courses
-                    run_id = gutils.clean_id(run_identifier)
-                    assets, compositions, items = self._get_all_items(run_id, domain_repo)
-
-                    for obj in [assets, compositions, items]:
-                        if obj is not None:
-                            course_run_counts[run_name][0] += obj.available()
-
-                    self._count_objects(run_id,
-                                        asset_counts,
-                                        domain_repo)
-
-                    if settings.ENABLE_OBJECTIVE_FACETS:
-                        self._count_by_learning_objectives(run_id,
-                                                           learning_objective_counts,
-                                                           domain_repo)
-                else:
+                if run_identifier not in selected_runs:
                     # only do courses that have been selected
-                    if any(run_identifier in course for course in self.facet_course_runs):
-                        run_id = gutils.clean_id(run_identifier)
-                        assets, compositions, items = self._get_all_items(run_id, domain_repo)
-
-                        for obj in [assets, compositions, items]:
-                            if obj is not None:
-                                course_run_counts[run_name][0] += obj.available()
+                    continue
+                run_counts = facet_index[run_identifier]
 
-                        self._count_objects(run_id,
-                                            asset_counts,
-                                            domain_repo)
-
-                        if settings.ENABLE_OBJECTIVE_FACETS:
-                            self._count_by_learning_objectives(run_id,
-                                                               learning_objective_counts,
-                                                               domain_repo)
+                course_run_counts[run_name][0] += run_counts['total']
+                merge_counts(asset_counts, run_counts['resource_type'])
+                merge_counts(learning_objective_counts, run_counts['learning_objective'])
 
             count_cases = [(asset_counts, 'resource_type', False),
                            (course_run_counts, 'course', False),
@@ -1597,7 +1856,6 @@ class RepositorySearch(ProducerAPIViews, QueryHelpersMixin):
 
             self.query_params = get_query_values(self.data.get('q', None))
             self.cursor_limits = get_page_and_limits(self.data)
-            object_list = []
 
             domain_repo = self.rm.get_repository(gutils.clean_id(repository_id))
 
@@ -1610,125 +1868,25 @@ class RepositorySearch(ProducerAPIViews, QueryHelpersMixin):
 
             run_map = self._get_run_map(domain_repo)
             # first for each repository, get OsidLists of total objects that
-            # meet the keyword filter requirement and other facet requirements
-            for run_identifier, run_name in run_map.iteritems():
-                if self.facet_course_runs is None:
-                    # do all courses
-                    run_id = gutils.clean_id(run_identifier)
-                    assets, compositions, items = self._get_all_items(run_id, domain_repo)
-
-                    for obj in [(assets, asset_lists),
-                                (compositions, composition_lists),
-                                (items, item_lists)]:
-                        if obj[0] is not None:
-                            if obj[0] == assets:
-                                non_enclosed_assets = [a for a in assets if
-                                                       a.get_asset_contents().available() > 0]
-                                list_to_add = non_enclosed_assets
-                                number = len(list_to_add)
-                            else:
-                                list_to_add = obj[0]
-                                number = list_to_add.available()
-                            obj[1].append((list_to_add, number))
-                else:
-                    # only do courses that have been selected
-                    if any(run_identifier in course for course in self.facet_course_runs):
-                        run_id = gutils.clean_id(run_identifier)
-                        assets, compositions, items = self._get_all_items(run_id, domain_repo)
-
-                        for obj in [(assets, asset_lists),
-                                    (compositions, composition_lists),
-                                    (items, item_lists)]:
-                            if obj[0] is not None:
-                                if obj[0] == assets:
-                                    non_enclosed_assets = [a for a in assets if
-                                                           a.get_asset_contents().available() > 0]
-                                    list_to_add = non_enclosed_assets
-                                    number = len(list_to_add)
-                                else:
-                                    list_to_add = obj[0]
-                                    number = list_to_add.available()
-                                obj[1].append((list_to_add, number))
+            # meet the keyword filter requirement and other facet requirements.
+            # The runs are queried concurrently, but nothing is pulled out of
+            # the lists until the page is sliced
+            run_lists = self._map_runs(self._get_content_items,
+                                       self._get_selected_runs(run_map),
+                                       domain_repo)
+            for assets, compositions, items in run_lists:
+                if assets is not None:
+                    asset_lists += assets
+                composition_lists.append(compositions)
+                item_lists.append(items)
 
             # slice / paginate from assets first...
             lower_index = self.cursor_limits[0]
             upper_index = self.cursor_limits[1]
 
-            counter = 0
-            list_index = 0
-            compiled_lists = asset_lists + composition_lists + item_lists
-            if len(compiled_lists) > 0:
-                while counter < upper_index:
-                    active_list = compiled_lists[list_index][0]
-                    active_list_len = compiled_lists[list_index][1]
-
-                    if (counter + active_list_len) <= lower_index:
-                        # the page we need is not part of this list.
-                        # skip it and move on
-                        counter += active_list_len
-                    elif (counter <= lower_index and
-                            (counter + active_list_len) >= upper_index):
-                        # we only need this list -- yay
-                        start_index = lower_index - counter
-                        num_skip = start_index
-                        end_index = upper_index - counter
-                        if num_skip > 0:
-                            try:
-                                active_list.skip(num_skip)
-                            except AttributeError:
-                                del active_list[0:num_skip]
-                            counter += num_skip
-                        num_added = 0
-                        for obj in active_list:
-                            object_list.append(obj.object_map)
-                            start_index += 1
-                            num_added += 1
-                            if start_index == end_index:
-                                break
-                        counter += num_added
-                    elif (counter <= lower_index and
-                              (counter + active_list_len) < upper_index):
-                        # need this list + at least one more
-                        # so append the items from this list, and keep
-                        # going through the loop
-                        start_index = lower_index - counter
-                        num_skip = start_index
-                        if num_skip > 0:
-                            try:
-                                active_list.skip(num_skip)
-                            except AttributeError:
-                                del active_list[0:num_skip]
-                            counter += num_skip
-                        num_added = 0
-                        for obj in active_list:
-                            object_list.append(obj.object_map)
-                            num_added += 1
-                        counter += num_added
-                    else:
-                        # counter > lower_index...so we just need to check
-                        # the upper_index to see what we need from this list
-                        if (counter + active_list_len) < upper_index:
-                            # take this entire list and go to the next one
-                            num_added = 0
-                            for obj in active_list:
-                                object_list.append(obj.object_map)
-                                num_added += 1
-                            counter += num_added
-                        else:
-                            # take only a portion of this list
-                            end_index = upper_index - counter
-                            num_added = 0
-                            for obj in active_list:
-                                object_list.append(obj.object_map)
-                                num_added += 1
-                                if num_added == end_index:
-                                    break
-                            counter += num_added
-
-                    list_index += 1
-                    if list_index == len(compiled_lists):
-                        # no results...break
-                        break
+            compiled_lists = gutils.ChainedList(asset_lists + composition_lists + item_lists)
+            object_list = [obj.object_map
+                           for obj in compiled_lists.get_slice(lower_index, upper_index - lower_index)]
 
             return_data = {
                 'objects': object_list,
@@ -1777,6 +1935,8 @@ class UnlockComposition(ProducerAPIViews):
                     child_clone = child.clone_to(target_repo=target_repository,
                                                  target_parent=clone)
 
+            sutils.invalidate_search_caches(target_repository.ident)
+
             return gutils.CreatedResponse(clone.object_map)
         except (PermissionDenied, InvalidArgument, InvalidId, KeyError) as ex:
             gutils.handle_exceptions(ex)
@@ -1804,7 +1964,14 @@ class UploadNewClassFile(ProducerAPIViews):
                                                               uploaded_file.name),
                                              uploaded_file)
             os.chmod(self.path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IWGRP)
-            self.async_result = import_file.apply_async((self.path, domain_repo, request.user))
+            # hashed once here, instead of on every attempt of the task
+            upload = default_storage.open(self.path)
+            try:
+                import_key = iutils.get_import_key(upload, domain_repo.ident)
+            finally:
+                upload.close()
+            self.async_result = import_file.apply_async((self.path, domain_repo, request.user,
+                                                         import_key))
             return Response()
         except (PermissionDenied, TypeError, InvalidArgument, NotFound, KeyError) as ex:
             gutils.handle_exceptions(ex)
\ No newline at end of file
@@ -49,6 +49,10 @@ if (enableNotifications) {
                         } else if (msg.status === 'error') {
                             ProducerManager.vent.trigger('msg:error',
                                 msg);
+                        } else if (msg.status === 'pending') {
+                            // progress of imports / exports
+                            ProducerManager.vent.trigger('msg:pending',
+                                msg);
                         }
                     } else {
                         ProducerManager.vent.trigger("msg:status",
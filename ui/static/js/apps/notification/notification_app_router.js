@@ -47,6 +47,12 @@ define(["app",
             }));
       });
 
+      ProducerManager.vent.on('msg:pending', function (data) {
+            ProducerManager.regions.notifications.show(new NotificationViews.StatusView({
+                msg: data.data
+            }));
+      });
+
       ProducerManager.vent.on('msg:success', function (data) {
             ProducerManager.regions.notifications.show(new NotificationViews.SuccessView({
                 msg: data.data
@@ -7,7 +7,8 @@ from assessments.types import *
 from dlkit.records.registry import ANSWER_GENUS_TYPES, ANSWER_RECORD_TYPES
 
 from dlkit.runtime import PROXY_SESSION, RUNTIME
-from dlkit.runtime.errors import NotFound, InvalidArgument, Unsupported, NullArgument
+from dlkit.runtime.errors import NotFound, InvalidArgument, Unsupported, NullArgument,\
+    Unimplemented, IllegalState
 from dlkit.runtime.primitives import Type, DataInputStream, Id
 from dlkit.runtime.proxy_example import SimpleRequest
 
@@ -193,10 +194,11 @@ def get_object_bank(manager, object_id, object_type='item', bank_id=None):
     """Get the object's bank even without the bankId"""
     # primarily used for Item and AssessmentsOffered
     if bank_id is None:
-        lookup_session = get_session(manager, object_type, 'lookup')
-        object_ = getattr(lookup_session, 'get_{0}'.format(object_type))(gutils.clean_id(object_id))
-        bank_id = object_.object_map['bankId']
-    return manager.get_bank(gutils.clean_id(bank_id))
+        bank_id = gutils.get_object_catalog_id(lambda: get_session(manager, object_type, 'lookup'),
+                                               object_id,
+                                               object_type,
+                                               'bankId')
+    return gutils.get_catalog(manager, 'bank', bank_id)
 
 def get_object_bank_from_request(request):
     """parse out the right params before passing to get_object_bank
@@ -243,22 +245,59 @@ def get_question_status(bank, section, question_id):
         # Now need to actually check the answers against the
         # item answers.
         answers = bank.get_answers(section.ident, question_id)
-        # compare these answers to the submitted response
-        response = student_response._my_map
-        response.update({
-            'type' : str(response['recordTypeIds'][0]).replace('answer-record-type', 'answer-record-type')
-        })
-        correct = validate_response(student_response._my_map, answers)
-        data = {
-            'responded' : True,
-            'correct'   : correct
-        }
+        data = get_response_status(student_response, answers)
     else:
         data = {
             'responded' : False
         }
     return data
 
+def get_question_statuses(bank, section, question_ids):
+    """
+    Batched get_question_status, for a page of questions in the same section.
+    All of the section's responses are fetched in one call, and the answers
+    of the questions that were responded to in one item lookup
+    :param bank:
+    :param section:
+    :param question_ids:
+    :return: dict of str(question_id) -> status
+    """
+    responses = get_section_responses(bank, section)
+    if responses is None:
+        return dict((str(question_id), get_question_status(bank, section, question_id))
+                    for question_id in question_ids)
+
+    section_answers = get_section_answers(section, [question_id for question_id in question_ids
+                                                    if str(question_id) in responses])
+    statuses = {}
+    for question_id in question_ids:
+        key = str(question_id)
+        if key in statuses:
+            continue
+        if key in responses:
+            if key in section_answers:
+                answers = section_answers[key]
+            else:
+                answers = bank.get_answers(section.ident, question_id)
+            statuses[key] = get_response_status(responses[key], answers)
+        else:
+            statuses[key] = {
+                'responded' : False
+            }
+    return statuses
+
+def get_response_status(student_response, answers):
+    # compare these answers to the submitted response
+    response = student_response._my_map
+    response.update({
+        'type' : str(response['recordTypeIds'][0]).replace('answer-record-type', 'answer-record-type')
+    })
+    correct = validate_response(student_response._my_map, answers)
+    return {
+        'responded' : True,
+        'correct'   : correct
+    }
+
 def get_response_submissions(response):
     if response['type'] == 'answer-record-type%3Alabel-ortho-faces%40ODL.MIT.EDU':
         submission = response['integerValues']
@@ -271,6 +310,58 @@ def get_response_submissions(response):
         raise Unsupported
     return submission
 
+def get_section_answers(section, question_ids):
+    """
+    Return the answers (right and wrong) of these questions in a section, as
+    a dict of str(question_id) -> answers, from a single lookup of their
+    items. Questions whose item was not found are left out, and the dict is
+    empty if the section cannot map its questions to items
+    """
+    try:
+        question_maps = dict((str(question_map['_id']), question_map)
+                             for question_map in section._my_map['questions'])
+        item_ids = dict((str(question_id), question_maps[question_id.identifier]['questionId'])
+                        for question_id in question_ids)
+        if len(item_ids) == 0:
+            return {}
+        items = section._get_item_lookup_session().get_items_by_ids([Id(item_id)
+                                                                    for item_id in set(item_ids.values())])
+    except (AttributeError, KeyError, Unimplemented):
+        return {}
+
+    item_answers = {}
+    for item in items:
+        answers = list(item.get_answers())
+        try:
+            answers += list(item.get_wrong_answers())
+        except AttributeError:
+            pass
+        item_answers[str(item.ident)] = answers
+    return dict((question_id, item_answers[item_id])
+                for question_id, item_id in item_ids.iteritems()
+                if item_id in item_answers)
+
+def get_section_responses(bank, section):
+    """
+    Return all of the submitted responses in a section, as a dict of
+    str(question_id) -> response, or None if the backend cannot list them
+    """
+    try:
+        response_list = bank.get_responses(section.ident)
+    except (AttributeError, Unimplemented, Unsupported):
+        return None
+
+    responses = {}
+    for response in response_list:
+        # unanswered questions may come back as empty responses
+        if not response._my_map.get('recordTypeIds'):
+            continue
+        try:
+            responses[str(response.get_item_id())] = response
+        except (KeyError, IllegalState):
+            continue
+    return responses
+
 def get_session(manager, object_type, session_type):
     """get session type for object, using the manager"""
     if manager._proxy is not None:
@@ -0,0 +1,121 @@
+"""Micro-benchmarks for the hot paths in utilities.general
+
+run from the project root with:
+
+    python -m utilities.benchmarks
+"""
+import os
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'producer_main.settings')
+
+from dlkit.abstract_osid.assessment import objects as abc_assessment_objects
+from dlkit.abstract_osid.learning import objects as abc_learning_objects
+from dlkit.abstract_osid.repository import objects as abc_repository_objects
+from dlkit.abstract_osid.type import objects as abc_type_objects
+from dlkit.abstract_osid.grading import objects as abc_grading_objects
+from dlkit.abstract_osid.resource import objects as abc_resource_objects
+
+from . import general as gutils
+
+
+NUM_ITEMS = 10000
+REPEAT = 5
+ITEM_TYPES = ['Asset', 'Composition', 'AssessmentOffered', 'GradeEntry', 'Repository']
+ROOT_URL = 'https://localhost/api/v1/repository/compositions/foo/assets/'
+
+
+def legacy_is_osid_list(a_list):
+    """the isinstance() chain that extract_items used to run"""
+    return not (not isinstance(a_list, list) and
+                not isinstance(a_list, abc_type_objects.TypeList) and
+                not isinstance(a_list, abc_assessment_objects.AssessmentList) and
+                not isinstance(a_list, abc_assessment_objects.BankList) and
+                not isinstance(a_list, abc_assessment_objects.ItemList) and
+                not isinstance(a_list, abc_assessment_objects.AnswerList) and
+                not isinstance(a_list, abc_assessment_objects.QuestionList) and
+                not isinstance(a_list, abc_assessment_objects.AssessmentOfferedList) and
+                not isinstance(a_list, abc_assessment_objects.AssessmentTakenList) and
+                not isinstance(a_list, abc_assessment_objects.ResponseList) and
+                not isinstance(a_list, abc_repository_objects.RepositoryList) and
+                not isinstance(a_list, abc_repository_objects.AssetList) and
+                not isinstance(a_list, abc_repository_objects.CompositionList) and
+                not isinstance(a_list, abc_resource_objects.BinList) and
+                not isinstance(a_list, abc_resource_objects.ResourceList) and
+                not isinstance(a_list, abc_grading_objects.GradebookList) and
+                not isinstance(a_list, abc_grading_objects.GradeSystemList) and
+                not isinstance(a_list, abc_grading_objects.GradebookColumnList) and
+                not isinstance(a_list, abc_grading_objects.GradeEntryList) and
+                not isinstance(a_list, abc_learning_objects.ObjectiveList) and
+                not isinstance(a_list, abc_learning_objects.ObjectiveBankList))
+
+
+def legacy_link_items(items, root_url_base, root_url_offered_or_taken):
+    """the per-item _link branches that extract_items used to run"""
+    for index, item in enumerate(items):
+        item_id = item['id']
+        if (isinstance(item, abc_assessment_objects.AssessmentOffered) or
+                item['type'] == 'AssessmentOffered'):
+            items[index]['_link'] = root_url_offered_or_taken + '../../../assessmentsoffered/' + \
+                                    gutils.my_unquote(item_id) + '/'
+        elif (isinstance(item, abc_assessment_objects.AssessmentTaken) or
+              item['type'] == 'AssessmentTaken'):
+            items[index]['_link'] = root_url_offered_or_taken + '../../../assessmentstaken/' + \
+                                    gutils.my_unquote(item_id) + '/'
+        elif ((isinstance(item, abc_repository_objects.Asset) or
+                item['type'] == 'Asset') and
+                '/compositions/' in root_url_base):
+            items[index]['_link'] = root_url_base + '../../../assets/' + gutils.my_unquote(item_id) + '/'
+        elif ((isinstance(item, abc_grading_objects.GradeEntry) or
+                item['type'] == 'GradeEntry') and
+                '/columns/' in root_url_base):
+            items[index]['_link'] = '{0}../../../entries/{1}/'.format(root_url_base,
+                                                                      gutils.my_unquote(item_id))
+        else:
+            items[index]['_link'] = root_url_base + gutils.my_unquote(item_id) + '/'
+
+
+def link_items(items, root_url_base, root_url_offered_or_taken):
+    """the dispatch-table version used by extract_items now"""
+    link_prefixes = gutils.get_link_prefixes(root_url_base, root_url_offered_or_taken)
+    default_prefix = link_prefixes[None]
+    for item in items:
+        item['_link'] = link_prefixes.get(item['type'], default_prefix) + gutils.my_unquote(item['id']) + '/'
+
+
+def get_items():
+    return [{'id': 'repository.Asset%3A{0}%40ODL.MIT.EDU'.format(i),
+             'type': ITEM_TYPES[i % len(ITEM_TYPES)]}
+            for i in range(NUM_ITEMS)]
+
+
+def report(name, func):
+    best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print '{0:<40} {1:8.2f} ms total {2:8.3f} us / item'.format(name,
+                                                                 best * 1000,
+                                                                 best * 1000000 / NUM_ITEMS)
+
+
+def main():
+    items = get_items()
+    osid_lists = [object() for i in range(NUM_ITEMS)]
+
+    print 'per-item overhead over {0} items, best of {1}'.format(NUM_ITEMS, REPEAT)
+    report('list type check (isinstance chain)',
+           lambda: [legacy_is_osid_list(l) for l in osid_lists])
+    report('list type check (class cache)',
+           lambda: [gutils.is_osid_list(l) for l in osid_lists])
+    report('_link (isinstance / string branches)',
+           lambda: legacy_link_items(items, ROOT_URL, ROOT_URL))
+    report('_link (dispatch table)',
+           lambda: link_items(items, ROOT_URL, ROOT_URL))
+
+    legacy_items = get_items()
+    legacy_link_items(legacy_items, ROOT_URL, ROOT_URL)
+    new_items = get_items()
+    link_items(new_items, ROOT_URL, ROOT_URL)
+    assert legacy_items == new_items, 'dispatch table produces different _links'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""In-process caches used by the utilities, and which Django caches are shared"""
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+_MISSING = object()
+
+# these keep their entries in each process, so a value invalidated in one
+# process is still served by the others
+PROCESS_LOCAL_BACKENDS = ['django.core.cache.backends.dummy.DummyCache',
+                          'django.core.cache.backends.locmem.LocMemCache']
+
+
+class LRUCache(object):
+    """Thread-safe, size-bounded cache with an optional time-to-live.
+
+    When the cache is full, the least recently used entry is evicted.
+    Entries older than their ttl (in seconds) are treated as missing.
+    """
+    def __init__(self, max_size=128, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def _expires_at(self, ttl):
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is None:
+            return None
+        return time.time() + ttl
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires_at = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires_at is not None and expires_at <= time.time():
+                return default
+            # re-insert so that the key becomes the most recently used
+            self._data[key] = (value, expires_at)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, self._expires_at(ttl))
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def setdefault(self, key, default, ttl=None):
+        """atomically get the current value, or store and return default"""
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                self.set(key, default, ttl=ttl)
+                value = default
+            return value
+
+
+def is_shared_cache():
+    """
+    whether the default Django cache is shared by every process (including
+    celery workers), so that caches which are invalidated on change can use
+    it. SHARED_CACHE overrides the guess from the backend, i.e. for a single
+    process with LocMemCache
+    """
+    shared_cache = getattr(settings, 'SHARED_CACHE', None)
+    if shared_cache is not None:
+        return shared_cache
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return backend not in PROCESS_LOCAL_BACKENDS
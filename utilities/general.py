@@ -1,18 +1,22 @@
 import re
 import json
+import math
+import base64
 import pickle
+import hashlib
 import random
 import string
+import threading
 import traceback
 
 from bson.errors import InvalidId
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from itertools import islice
 
-from django.http import QueryDict
+from django.http import QueryDict, StreamingHttpResponse
 from django.db import IntegrityError
 from django.utils.http import unquote, quote
-# http://www.django-rest-framework.org/api-guide/pagination
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.contrib.auth.models import User
 from django.conf import settings
 
@@ -36,15 +40,136 @@ from dysonx.dysonx import DysonXUtil, ABS_PATH
 from inflection import underscore
 
 from rest_framework import exceptions, status
-from rest_framework.pagination import (
-    PaginationSerializer, DefaultObjectSerializer
-)
+from rest_framework.templatetags.rest_framework import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from .cache import LRUCache
+
 
 WORDIGNORECASE_STRING_MATCH_TYPE = Type(**String().get_type_data('WORDIGNORECASE'))
 
+SERVICE_MANAGERS = [('am', 'ASSESSMENT'),
+                    ('cm', 'COMMENTING'),
+                    ('gm', 'GRADING'),
+                    ('lm', 'LEARNING'),
+                    ('rm', 'REPOSITORY')]
+MANAGER_NICKNAMES = [manager[0] for manager in SERVICE_MANAGERS]
+
+# headers that change the proxy condition, besides the user
+PROXY_CONDITION_HEADERS = ['HTTP_LTI_USER_ID',
+                           'HTTP_LTI_TOOL_CONSUMER_INSTANCE_GUID',
+                           'HTTP_LTI_USER_ROLE',
+                           'HTTP_LTI_BANK']
+
+# the session only keeps this key; the managers themselves live in a
+# per-process pool, so they are not pickled on every request
+MANAGER_POOL_SESSION_KEY = 'managerPoolKey'
+MANAGER_POOL = LRUCache(max_size=getattr(settings, 'MANAGER_POOL_SIZE', 256),
+                        ttl=getattr(settings, 'MANAGER_POOL_TTL', 3600))
+
+# object id -> catalog (repository / bank / gradebook) id, shared by all
+# requests in a process. Objects rarely move between catalogs, and the
+# entries are dropped when they are assigned / unassigned / deleted here,
+# but the TTL bounds how stale other processes can be
+CATALOG_ID_CACHE = LRUCache(max_size=getattr(settings, 'CATALOG_ID_CACHE_SIZE', 10000),
+                            ttl=getattr(settings, 'CATALOG_ID_CACHE_TTL', 300))
+# catalog objects, per request (and thread). Only set while a view handles
+# a request, so code outside of views always gets fresh catalogs
+_REQUEST_CATALOGS = threading.local()
+
+# thread pool shared by all requests that fan backend queries out, so the
+# number of concurrent queries per process stays bounded
+CONCURRENT_QUERY_WORKERS = getattr(settings, 'CONCURRENT_QUERY_WORKERS', 8)
+_QUERY_EXECUTOR = None
+_QUERY_EXECUTOR_LOCK = threading.Lock()
+
+# exported OLX tarballs are streamed to the client in chunks of this many bytes
+OLX_DOWNLOAD_CHUNK_SIZE = getattr(settings, 'OLX_DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+
+# the OsidList types that extract_items pages through, instead of
+# treating them as a single object
+OSID_LIST_TYPES = (list,
+                   abc_type_objects.TypeList,
+                   abc_assessment_objects.AssessmentList,
+                   abc_assessment_objects.BankList,
+                   abc_assessment_objects.ItemList,
+                   abc_assessment_objects.AnswerList,
+                   abc_assessment_objects.QuestionList,
+                   abc_assessment_objects.AssessmentOfferedList,
+                   abc_assessment_objects.AssessmentTakenList,
+                   abc_assessment_objects.ResponseList,
+                   abc_repository_objects.RepositoryList,
+                   abc_repository_objects.AssetList,
+                   abc_repository_objects.CompositionList,
+                   abc_resource_objects.BinList,
+                   abc_resource_objects.ResourceList,
+                   abc_grading_objects.GradebookList,
+                   abc_grading_objects.GradeSystemList,
+                   abc_grading_objects.GradebookColumnList,
+                   abc_grading_objects.GradeEntryList,
+                   abc_learning_objects.ObjectiveList,
+                   abc_learning_objects.ObjectiveBankList)
+
+# objects that clean_up_dl_objects converts into their object_map
+CONVERTIBLE_DL_OBJECT_TYPES = (abc_assessment_objects.Bank,
+                               abc_assessment_objects.Assessment)
+
+# concrete class -> result of the isinstance() checks above, filled in
+# as new classes are seen so each class only walks its MRO once
+_IS_OSID_LIST = {}
+_IS_CONVERTIBLE_DL_OBJECT = {}
+
+# object type -> (which root url to use, url path relative to it, required
+# substring of the root url). Types not listed here, or whose required
+# substring is not in the url, link to <root url base>/<id>/
+ITEM_LINK_RULES = {
+    # make assessment offerings point two levels back, to just
+    # <bank_id>/offerings/<offering_id>
+    'AssessmentOffered': ('offered_or_taken', '../../../assessmentsoffered/', None),
+    'AssessmentTaken': ('offered_or_taken', '../../../assessmentstaken/', None),
+    'Asset': ('base', '../../../assets/', '/compositions/'),
+    'GradeEntry': ('base', '../../../entries/', '/columns/')
+}
+
+
+class AcceptedResponse(Response):
+    """for work that has been queued, but is not done yet"""
+    def __init__(self, *args, **kwargs):
+        super(AcceptedResponse, self).__init__(status=status.HTTP_202_ACCEPTED, *args, **kwargs)
+
+
+class ChainedList(object):
+    """
+    Chains OsidLists (or lists / iterables) end to end, so a page can be
+    sliced out of them without pulling the objects in front of the page.
+    Lists with a known length are skipped over whole, using the count
+    from the backend; plain iterables (i.e. filtered generators) have
+    to be walked up to the page.
+    """
+    def __init__(self, lists):
+        self._lists = [a_list for a_list in lists if a_list is not None]
+
+    def get_slice(self, offset, limit):
+        results = []
+        for a_list in self._lists:
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            list_len = get_list_length(a_list)
+            if list_len is None:
+                iterator = iter(a_list)
+                offset -= sum(1 for obj in islice(iterator, offset))
+                if offset > 0:
+                    continue
+                results += list(islice(iterator, remaining))
+            elif offset >= list_len:
+                offset -= list_len
+            else:
+                results += get_list_slice(a_list, offset, remaining)
+                offset = 0
+        return results
+
 
 class CreatedResponse(Response):
     def __init__(self, *args, **kwargs):
@@ -74,52 +199,21 @@ class DLKitSessionsManager(APIView):
             handle_exceptions(ex)
 
 
-class DLSerializer(DefaultObjectSerializer):
-    def to_native(self, obj):
-        results = []
-        for item in obj:
-            try:
-                if isinstance(item, tuple):
-                    item_map = item[0].object_map
-                    item_map.update({
-                        'canEdit': item[1]
-                    })
-                else:
-                    item_map = item.object_map
-                results.append(item_map)
-            except:
-                results.append(item)
-        return results
-
-
-class DLPaginationSerializer(PaginationSerializer):
-    """To return an object's object_map instead of the __dict__ or dir() values that
-    the built-in serializer returns
-
-    """
-    class Meta:
-        object_serializer_class = DLSerializer
-
-
-def activate_managers(request):
+def activate_managers(request, nicknames=None):
     """
-    Create initial managers and store them in the user session
+    Create initial managers and store them in the manager pool.
+    Only the managers in nicknames are created, if given
     """
-    managers = [('am', 'ASSESSMENT'),
-        ('cm', 'COMMENTING'),
-        ('gm', 'GRADING'),
-        ('lm', 'LEARNING'),
-        ('rm', 'REPOSITORY')]
-
-    for manager in managers:
-        nickname = manager[0]
-        service_name = manager[1]
-        if nickname not in request.session:
-            condition = PROXY_SESSION.get_proxy_condition()
-            condition.set_http_request(request)
-            proxy = PROXY_SESSION.get_proxy(condition)
-            set_session_data(request, nickname, RUNTIME.get_service_manager(service_name,
-                                                                            proxy=proxy))
+    for nickname, service_name in SERVICE_MANAGERS:
+        if nicknames is not None and nickname not in nicknames:
+            continue
+        if get_session_data(request, nickname) is None:
+            set_session_data(request, nickname, get_service_manager(request, service_name))
+
+    # managers used to be pickled into the session; drop any leftovers
+    for nickname in MANAGER_NICKNAMES:
+        if nickname in request.session:
+            del request.session[nickname]
     return request
 
 
@@ -174,8 +268,7 @@ def clean_up_dl_objects(data):
     if isinstance(data, dict):
         results = {}
         for key, value in data.iteritems():
-            if (isinstance(value, abc_assessment_objects.Bank) or
-                    isinstance(value, abc_assessment_objects.Assessment)):
+            if is_convertible_dl_object(value):
                 results[key] = convert_dl_object(value)
             else:
                 results[key] = value
@@ -192,12 +285,19 @@ def clean_up_post(bank, item):
             bank.delete_assessment(item.ident)
         elif isinstance(item, abc_assessment_objects.Answer):
             bank.delete_answer(item.ident)
+        forget_object_catalog_id(item.ident)
 
 
 def clean_up_path(path):
     return path.replace('//', '/')
 
 
+def clear_request_catalogs(start_request=False):
+    """drop the catalogs cached for the current request; start_request
+    turns caching on for the rest of the request"""
+    _REQUEST_CATALOGS.catalogs = {} if start_request else None
+
+
 def config_osid_object_querier(querier, params):
     for param, value in params.iteritems():
         try:
@@ -238,6 +338,20 @@ def convert_to_osid_id(id):
         return id
 
 
+def decode_cursor(cursor):
+    """cursors are opaque to clients; internally they are just an offset"""
+    if cursor is None or cursor == '':
+        return 0
+    try:
+        decoded = base64.urlsafe_b64decode(str(cursor))
+        offset = int(decoded.split('o=')[-1])
+        if offset < 0:
+            raise ValueError
+        return offset
+    except (TypeError, ValueError):
+        raise exceptions.ParseError('Invalid cursor.')
+
+
 def dl_dumps(obj):
     try:
         clean_obj = strip_object_ids(obj)
@@ -246,8 +360,12 @@ def dl_dumps(obj):
         return pickle.dumps(obj)
 
 
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode('o={0}'.format(offset))
+
+
 def extract_items(request, a_list, bank=None, section=None):
-    from .assessment import get_question_status  # import here to prevent circular imports
+    from .assessment import get_question_statuses  # import here to prevent circular imports
 
     results = {
         '_links': {
@@ -256,91 +374,72 @@ def extract_items(request, a_list, bank=None, section=None):
         'data'  : []
     }
 
-    if (not isinstance(a_list, list) and
-        not isinstance(a_list, abc_type_objects.TypeList) and
-        not isinstance(a_list, abc_assessment_objects.AssessmentList) and
-        not isinstance(a_list, abc_assessment_objects.BankList) and
-        not isinstance(a_list, abc_assessment_objects.ItemList) and
-        not isinstance(a_list, abc_assessment_objects.AnswerList) and
-        not isinstance(a_list, abc_assessment_objects.QuestionList) and
-        not isinstance(a_list, abc_assessment_objects.AssessmentOfferedList) and
-        not isinstance(a_list, abc_assessment_objects.AssessmentTakenList) and
-        not isinstance(a_list, abc_assessment_objects.ResponseList) and
-        not isinstance(a_list, abc_repository_objects.RepositoryList) and
-        not isinstance(a_list, abc_repository_objects.AssetList) and
-        not isinstance(a_list, abc_repository_objects.CompositionList) and
-        not isinstance(a_list, abc_resource_objects.BinList) and
-        not isinstance(a_list, abc_resource_objects.ResourceList) and
-        not isinstance(a_list, abc_grading_objects.GradebookList) and
-        not isinstance(a_list, abc_grading_objects.GradeSystemList) and
-        not isinstance(a_list, abc_grading_objects.GradebookColumnList) and
-        not isinstance(a_list, abc_grading_objects.GradeEntryList) and
-        not isinstance(a_list, abc_learning_objects.ObjectiveList) and
-        not isinstance(a_list, abc_learning_objects.ObjectiveBankList)):
+    if not is_osid_list(a_list):
         a_list = [a_list]
     try:
         list_len = a_list.available()
     except AttributeError:
         list_len = len(a_list)
     if list_len > 0:
-        paginated = paginate(list(a_list), request)
+        if is_cursor_request(request):
+            paginated = paginate_by_cursor(a_list, request, list_len)
+        else:
+            paginated = paginate(a_list, request, count=list_len)
 
-        #for item in a_list:
         results.update({
             'data': paginated
         })
-        for index, item in enumerate(paginated['results']):
-            # for questions, need to add in their status
-            if (isinstance(item, abc_assessment_objects.Question) or
-                (isinstance(item, dict) and
-                'Question' in item['type'])):
-                if isinstance(item, dict):
-                    item_id = Id(item['id'])
-                else:
-                    item_id = item.ident
-                status = get_question_status(bank, section, item_id)
-                # item_json.update(status)
-                results['data']['results'][index].update(status)
-
-            # results['data'].append(item_json)
-
-        root_url_base = append_slash(
-            request.build_absolute_uri().split('?')[0].replace('/query', ''))
-        root_url_offered_or_taken = append_slash(
-            request.build_absolute_uri().split('?page')[0])
-
-        #for item in serialized_data['results']:
-        for index, item in enumerate(paginated['results']):
-            item_id = item['id']
-            # make assessment offerings point two levels back, to just
-            # <bank_id>/offerings/<offering_id>
-            if (isinstance(item, abc_assessment_objects.AssessmentOffered) or
-                    item['type'] == 'AssessmentOffered'):
-                results['data']['results'][index]['_link'] = root_url_offered_or_taken + \
-                                                             '../../../assessmentsoffered/' + \
-                                                             my_unquote(item_id) + '/'
-            elif (isinstance(item, abc_assessment_objects.AssessmentTaken) or
-                  item['type'] == 'AssessmentTaken'):
-                results['data']['results'][index]['_link'] = root_url_offered_or_taken + \
-                                                             '../../../assessmentstaken/' + \
-                                                             my_unquote(item_id) + '/'
-            elif ((isinstance(item, abc_repository_objects.Asset) or
-                    item['type'] == 'Asset') and
-                    '/compositions/' in root_url_base):
-                results['data']['results'][index]['_link'] = root_url_base + '../../../assets/' + \
-                                                             my_unquote(item_id) + '/'
-            elif ((isinstance(item, abc_grading_objects.GradeEntry) or
-                    item['type'] == 'GradeEntry') and
-                    '/columns/' in root_url_base):
-                results['data']['results'][index]['_link'] = '{0}../../../entries/{1}/'.format(root_url_base,
-                                                                                               my_unquote(item_id))
-            else:
-                results['data']['results'][index]['_link'] = root_url_base + my_unquote(item_id) + '/'
+
+        url = request.build_absolute_uri().split('?')[0]
+        link_prefixes = get_link_prefixes(append_slash(url.replace('/query', '')),
+                                          append_slash(url))
+        default_prefix = link_prefixes[None]
+
+        questions = []
+        for item in paginated['results']:
+            item_type = item['type']
+            if 'Question' in item_type:
+                questions.append(item)
+            item['_link'] = link_prefixes.get(item_type, default_prefix) + my_unquote(item['id']) + '/'
+
+        # for questions, need to add in their status. Resolve the whole
+        # page at once, so the section's responses are only fetched once
+        if len(questions) > 0:
+            statuses = get_question_statuses(bank, section, [Id(q['id']) for q in questions])
+            for question in questions:
+                question.update(statuses[str(Id(question['id']))])
     else:
         results['data'] = {'count': 0, 'next': None, 'results': [], 'previous': None}
     return results
 
 
+def forget_object_catalog_id(object_id):
+    """call after an object is assigned to / unassigned from a catalog, or deleted"""
+    CATALOG_ID_CACHE.delete(str(clean_id(object_id)))
+
+
+def get_catalog(manager, catalog_type, catalog_id):
+    """
+    manager.get_<catalog_type>(catalog_id), reusing the catalog if this
+    request already loaded it. Each caller gets its own services adapter
+    around the loaded catalog, so the views that one caller sets (i.e.
+    federated or unsequestered) do not leak into the others
+    """
+    catalog_id = clean_id(catalog_id)
+    catalogs = getattr(_REQUEST_CATALOGS, 'catalogs', None)
+    if catalogs is None:
+        return getattr(manager, 'get_{0}'.format(catalog_type))(catalog_id)
+
+    key = (id(manager), catalog_type, str(catalog_id))
+    if key not in catalogs:
+        catalogs[key] = getattr(manager, 'get_{0}'.format(catalog_type))(catalog_id)
+    catalog = catalogs[key]
+    return catalog.__class__(catalog._provider_manager,
+                             catalog._catalog,
+                             catalog._runtime,
+                             catalog._proxy)
+
+
 def get_data_from_request(request):
     """
     Because data might be in bad JSON form, might be in a string...
@@ -410,10 +509,142 @@ def get_data_from_request(request):
     return data
 
 
+def get_manager_fingerprint(manager):
+    """
+    Cheap stand-in for a manager's state -- which manager object it is,
+    and which proxy (user / condition) it acts for
+    """
+    if manager is None:
+        return None
+    return id(manager), id(getattr(manager, '_proxy', None))
+
+
+def get_manager_pool_key(request):
+    """
+    Managers are pooled per user and proxy condition. The key is
+    remembered in the session, and only re-written when it changes
+    (i.e. a different user or different LTI headers)
+    """
+    condition = [request.user.username]
+    meta = getattr(request, 'META', {})
+    condition += [meta.get(header, '') for header in PROXY_CONDITION_HEADERS]
+    key = hashlib.md5(u'|'.join(condition).encode('utf-8')).hexdigest()
+
+    session = getattr(request, 'session', None)
+    if session is not None and session.get(MANAGER_POOL_SESSION_KEY) != key:
+        session[MANAGER_POOL_SESSION_KEY] = key
+    return key
+
+
+def get_absolute_uri(request):
+    try:
+        return request.build_absolute_uri()
+    except AttributeError:
+        return ''
+
+
+def get_link_prefixes(root_url_base, root_url_offered_or_taken):
+    """
+    Resolve ITEM_LINK_RULES against the urls of this request, into a map of
+    object type -> link prefix. The None key holds the default prefix
+    """
+    root_urls = {
+        'base': root_url_base,
+        'offered_or_taken': root_url_offered_or_taken
+    }
+    prefixes = {
+        None: root_url_base
+    }
+    for item_type, rule in ITEM_LINK_RULES.iteritems():
+        root_url = root_urls[rule[0]]
+        if rule[2] is None or rule[2] in root_url:
+            prefixes[item_type] = root_url + rule[1]
+    return prefixes
+
+
+def get_list_length(a_list):
+    """number of elements in a list or OsidList, or None if it cannot
+    be known without iterating"""
+    try:
+        return a_list.available()
+    except AttributeError:
+        try:
+            return len(a_list)
+        except TypeError:
+            return None
+
+
+def get_list_slice(a_list, offset, limit):
+    """
+    Pull only the elements [offset, offset + limit) out of a list or
+    OsidList. OsidLists skip() past the offset where supported
+    """
+    if isinstance(a_list, list):
+        return a_list[offset:offset + limit]
+    if offset > 0:
+        try:
+            a_list.skip(offset)
+        except (AttributeError, Unsupported):
+            next(islice(a_list, offset - 1, offset), None)
+    return list(islice(a_list, limit))
+
+
+def get_manager(request, nickname):
+    """get a single manager from the pool, creating it on first use"""
+    activate_managers(request, [nickname])
+    return get_session_data(request, nickname)
+
+
+def get_object_catalog_id(get_lookup_session, object_id, object_type, catalog_key):
+    """
+    the id of the catalog that an object belongs to, i.e. its repositoryId,
+    which is cached so the object is only loaded the first time.
+    get_lookup_session is only called on a cache miss
+    """
+    object_id = clean_id(object_id)
+    catalog_id = CATALOG_ID_CACHE.get(str(object_id))
+    if catalog_id is None:
+        lookup_session = get_lookup_session()
+        object_ = getattr(lookup_session, 'get_{0}'.format(object_type))(object_id)
+        catalog_id = object_.object_map[catalog_key]
+        CATALOG_ID_CACHE.set(str(object_id), catalog_id)
+    return catalog_id
+
+
+def get_olx_download_response(filename, olx):
+    """
+    stream an exported OLX tarball to the client in chunks, instead of
+    copying the whole buffer into the response first
+    """
+    olx.seek(0)
+    response = StreamingHttpResponse(iter_file_chunks(olx, OLX_DOWNLOAD_CHUNK_SIZE),
+                                     content_type='application/tar')
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
+
+
+def get_query_executor():
+    global _QUERY_EXECUTOR
+    with _QUERY_EXECUTOR_LOCK:
+        if _QUERY_EXECUTOR is None:
+            _QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=CONCURRENT_QUERY_WORKERS)
+        return _QUERY_EXECUTOR
+
+
+def get_service_manager(request, service_name):
+    condition = PROXY_SESSION.get_proxy_condition()
+    condition.set_http_request(request)
+    proxy = PROXY_SESSION.get_proxy(condition)
+    return RUNTIME.get_service_manager(service_name, proxy=proxy)
+
+
 def get_session_data(request, item_type):
     # get a manager
     try:
-        if item_type in request.session:
+        if item_type in MANAGER_NICKNAMES:
+            managers = MANAGER_POOL.get(get_manager_pool_key(request), {})
+            return managers.get(item_type)
+        elif item_type in request.session:
             return pickle.loads(str(request.session[item_type]))
         else:
             return None
@@ -458,6 +689,46 @@ def id_generator(size=8, chars=string.ascii_uppercase + string.digits):
     return ''.join(random.choice(chars) for x in range(size))
 
 
+def is_convertible_dl_object(obj):
+    obj_class = type(obj)
+    try:
+        return _IS_CONVERTIBLE_DL_OBJECT[obj_class]
+    except KeyError:
+        result = _IS_CONVERTIBLE_DL_OBJECT[obj_class] = isinstance(obj, CONVERTIBLE_DL_OBJECT_TYPES)
+        return result
+
+
+def is_cursor_request(request):
+    """cursor pagination is used when a cursor or limit is given
+    without a page"""
+    try:
+        params = request.QUERY_PARAMS
+    except AttributeError:
+        return False
+    return 'page' not in params and ('cursor' in params or 'limit' in params)
+
+
+def is_osid_list(obj):
+    obj_class = type(obj)
+    try:
+        return _IS_OSID_LIST[obj_class]
+    except KeyError:
+        result = _IS_OSID_LIST[obj_class] = isinstance(obj, OSID_LIST_TYPES)
+        return result
+
+
+def iter_file_chunks(file_obj, chunk_size):
+    """read a file in chunks, and close it when done"""
+    try:
+        while True:
+            chunk = file_obj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file_obj.close()
+
+
 def log_error(module, ex):
     import logging
     template = "An exception of type {0} occurred in {1}. Arguments:\n{2!r}"
@@ -474,6 +745,18 @@ def manage_lti_headers(request):
         store_lti_user(request)
 
 
+def map_concurrently(func, items):
+    """
+    like map(), but runs func for each of the items in the shared query
+    thread pool. Results are in the same order as the items, and the first
+    exception raised by func is re-raised here
+    """
+    items = list(items)
+    if CONCURRENT_QUERY_WORKERS <= 1 or len(items) <= 1:
+        return map(func, items)
+    return list(get_query_executor().map(func, items))
+
+
 def my_unquote(str):
     if '%40' in str:
         return unquote(str)
@@ -481,27 +764,100 @@ def my_unquote(str):
         return str
 
 
-def paginate(data, request, items_per_page=10):
+def paginate(data, request, items_per_page=10, count=None):
+    """
+    Page through data with ?page=N (or ?page=all). Only the requested page
+    is pulled out of data and serialized, so an OsidList is not
+    materialized just to show one page. Returns the same structure as
+    the DRF PaginationSerializer: count, next, previous, results
+    """
     # http://www.django-rest-framework.org/api-guide/pagination
+    if count is None:
+        count = len(data)
     try:
         page_num = request.QUERY_PARAMS.get('page')
     except (AttributeError, KeyError):
         page_num = 'all'
     if page_num == 'all':
-        items_per_page = len(data)
+        items_per_page = max(count, 1)
         page_num = 1
-    paginator = Paginator(data, items_per_page)
+    num_pages = max(int(math.ceil(count / float(items_per_page))), 1)
+    try:
+        page_num = int(page_num)
+        if page_num < 1 or page_num > num_pages:
+            page_num = num_pages
+    except (TypeError, ValueError):
+        page_num = 1
+
+    offset = (page_num - 1) * items_per_page
+    results = serialize_items(get_list_slice(data, offset, items_per_page))
+
+    url = get_absolute_uri(request)
+    next_url = None
+    previous_url = None
+    if page_num < num_pages:
+        next_url = replace_query_param(url, 'page', page_num + 1)
+    if page_num > 1:
+        previous_url = replace_query_param(url, 'page', page_num - 1)
+
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': results
+    }
+
+
+def paginate_by_cursor(data, request, count, default_limit=10):
+    """
+    Page through data with ?cursor=<opaque cursor>&limit=N. next and previous
+    are URLs carrying the cursors for the neighboring pages
+    """
+    params = request.QUERY_PARAMS
     try:
-        page = paginator.page(page_num)
-    except PageNotAnInteger:
-        page = paginator.page(1)
-    except EmptyPage:
-        page = paginator.page(paginator.num_pages)
+        limit = max(int(params.get('limit', default_limit)), 1)
+    except (TypeError, ValueError):
+        raise exceptions.ParseError('Invalid limit.')
+    offset = decode_cursor(params.get('cursor'))
 
-    serializer = DLPaginationSerializer(instance=page, context={'request': request})
-    # serializer = PaginationSerializer(instance=page, context={'request': request})
+    if offset < count:
+        results = serialize_items(get_list_slice(data, offset, limit))
+    else:
+        results = []
 
-    return serializer.data
+    url = get_absolute_uri(request)
+    next_url = None
+    previous_url = None
+    if offset + limit < count:
+        next_url = replace_query_param(url, 'cursor', encode_cursor(offset + limit))
+    if offset > 0:
+        previous_url = replace_query_param(url, 'cursor', encode_cursor(max(offset - limit, 0)))
+
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': results
+    }
+
+
+def serialize_items(items):
+    """To return each item's object_map instead of the __dict__ or dir() values that
+    the built-in serializer returns. (item, canEdit) tuples get canEdit added"""
+    results = []
+    for item in items:
+        try:
+            if isinstance(item, tuple):
+                item_map = item[0].object_map
+                item_map.update({
+                    'canEdit': item[1]
+                })
+            else:
+                item_map = item.object_map
+            results.append(item_map)
+        except:
+            results.append(item)
+    return results
 
 
 def set_form_basics(form, data):
@@ -528,8 +884,16 @@ def set_form_basics(form, data):
 
 
 def set_session_data(request, item_type, data):
-    request.session[item_type] = pickle.dumps(data)
-    request.session.modified = True
+    """only write when the data changed, so that reads do not turn
+    into session writes"""
+    if item_type in MANAGER_NICKNAMES:
+        managers = MANAGER_POOL.setdefault(get_manager_pool_key(request), {})
+        if get_manager_fingerprint(managers.get(item_type)) != get_manager_fingerprint(data):
+            managers[item_type] = data
+    else:
+        pickled_data = pickle.dumps(data)
+        if request.session.get(item_type) != pickled_data:
+            request.session[item_type] = pickled_data  # marks the session as modified
 
 
 def set_user(request):
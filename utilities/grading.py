@@ -1,6 +1,5 @@
 import inflection
 
-from dlkit.runtime import RUNTIME, PROXY_SESSION
 from dlkit.runtime.errors import IllegalState
 
 from .general import *
@@ -8,13 +7,10 @@ from .general import *
 
 def activate_managers(request):
     """
-    Create an initial grading manager and store it in the user session
+    Create an initial grading manager and store it in the manager pool
     """
-    if 'gm' not in request.session:
-        condition = PROXY_SESSION.get_proxy_condition()
-        condition.set_http_request(request)
-        proxy = PROXY_SESSION.get_proxy(condition)
-        set_session_data(request, 'gm', RUNTIME.get_service_manager('GRADING', proxy=proxy))
+    if get_session_data(request, 'gm') is None:
+        set_session_data(request, 'gm', get_service_manager(request, 'GRADING'))
 
     return request
 
@@ -52,10 +48,11 @@ def get_object_gradebook(manager, object_id, object_type='gradebook_column', gra
     """Get the object's repository even without the repositoryId"""
     # primarily used for Asset
     if gradebook_id is None:
-        lookup_session = get_session(manager, object_type, 'lookup')
-        object_ = getattr(lookup_session, 'get_{0}'.format(object_type))(clean_id(object_id))
-        gradebook_id = object_.object_map['gradebookId']
-    return manager.get_gradebook(clean_id(gradebook_id))
+        gradebook_id = get_object_catalog_id(lambda: get_session(manager, object_type, 'lookup'),
+                                             object_id,
+                                             object_type,
+                                             'gradebookId')
+    return get_catalog(manager, 'gradebook', gradebook_id)
 
 def get_session(manager, object_type, session_type):
     """get session type for object, using the manager"""
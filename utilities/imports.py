@@ -0,0 +1,120 @@
+"""Checkpoint journals for course imports.
+
+A journal is keyed by the hash of the uploaded course and the repository it is
+imported into, so when an import is retried (or the same course is uploaded
+again after its worker died), the stages that were already done are skipped.
+DysonX creates a course in one call, so there is no checkpoint inside it. Journals are append-only files of JSON lines, and need to be on
+storage that every worker shares, like the uploads. A journal that has not
+been written to for IMPORT_JOURNAL_TTL seconds is dropped.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from django.conf import settings
+
+
+IMPORT_HASH_CHUNK_SIZE = 1024 * 1024
+IMPORT_JOURNAL_ROOT = getattr(settings, 'IMPORT_JOURNAL_ROOT', None) or \
+    os.path.join(settings.MEDIA_ROOT or tempfile.gettempdir(), 'import_journals')
+IMPORT_JOURNAL_TTL = getattr(settings, 'IMPORT_JOURNAL_TTL', 86400)
+
+
+def _is_expired(path):
+    try:
+        return time.time() - os.path.getmtime(path) > IMPORT_JOURNAL_TTL
+    except OSError:
+        return False
+
+
+class ImportJournal(object):
+    """the stages that are done, and the ids of the objects done in each"""
+    def __init__(self, import_key):
+        self.import_key = import_key
+
+    @property
+    def path(self):
+        return os.path.join(IMPORT_JOURNAL_ROOT, '{0}.jsonl'.format(self.import_key))
+
+    def _append(self, entry):
+        try:
+            os.makedirs(IMPORT_JOURNAL_ROOT)
+        except OSError:
+            if not os.path.isdir(IMPORT_JOURNAL_ROOT):
+                raise
+        # one write per line, so lines from different workers do not interleave
+        with open(self.path, 'a') as journal:
+            journal.write(json.dumps(entry) + '\n')
+
+    def _read(self):
+        if _is_expired(self.path):
+            self.delete()
+            return []
+        try:
+            with open(self.path) as journal:
+                lines = journal.readlines()
+        except IOError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # a partial line from a worker that died while writing it
+                continue
+        return entries
+
+    def add_done_ids(self, stage, ids):
+        self._append({
+            'ids': [str(i) for i in ids],
+            'stage': stage
+        })
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def get_done_ids(self, stage):
+        done_ids = set()
+        for entry in self._read():
+            if entry['stage'] == stage:
+                done_ids.update(entry.get('ids', []))
+        return done_ids
+
+    def is_done(self, stage):
+        return any(entry['stage'] == stage and entry.get('done', False)
+                   for entry in self._read())
+
+    def mark_done(self, stage):
+        self._append({
+            'done': True,
+            'stage': stage
+        })
+
+
+def delete_expired_journals():
+    """i.e. of imports whose worker died before it could clean up"""
+    try:
+        filenames = os.listdir(IMPORT_JOURNAL_ROOT)
+    except OSError:
+        return
+    for filename in filenames:
+        path = os.path.join(IMPORT_JOURNAL_ROOT, filename)
+        if _is_expired(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_import_key(upload, repository_id):
+    """the hash of the uploaded course file, and the repository it goes into"""
+    digest = hashlib.sha1()
+    for chunk in iter(lambda: upload.read(IMPORT_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    digest.update(str(repository_id))
+    return digest.hexdigest()
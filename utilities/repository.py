@@ -1,9 +1,21 @@
+import os
+import json
+import errno
 import time
+import base64
+import shutil
+import tempfile
+import urlparse
+
+from collections import OrderedDict
+from StringIO import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
 
 from dlkit.records.registry import COMPOSITION_GENUS_TYPES,\
     COMPOSITION_RECORD_TYPES, REPOSITORY_GENUS_TYPES, REPOSITORY_RECORD_TYPES
 
-from dlkit.runtime import RUNTIME, PROXY_SESSION
 from dlkit.runtime.primordium import DataInputStream, DateTime
 from dlkit.runtime.errors import IllegalState, AlreadyExists
 
@@ -11,25 +23,44 @@ from dysonx.dysonx import get_or_create_user_repo, get_enclosed_object_asset,\
     _get_or_create_root_repo
 
 from .general import *
+from .snapshots import bump_tree_version
 
 EDX_COMPOSITION_RECORD_TYPE = Type(**COMPOSITION_RECORD_TYPES['edx-composition'])
 LORE_REPOSITORY = Type(**REPOSITORY_RECORD_TYPES['lore-repo'])
 DOMAIN_REPO_GENUS = Type(**REPOSITORY_GENUS_TYPES['domain-repo'])
 
+# stop serving a cached signed URL this many seconds before it expires
+SIGNED_URL_EXPIRATION_MARGIN = getattr(settings, 'SIGNED_URL_EXPIRATION_MARGIN', 300)
+
+# exported run OLX is kept on disk, per repository and content version,
+# with the name to download it as next to it
+EXPORT_ROOT = getattr(settings, 'EXPORT_ROOT', None) or \
+    os.path.join(settings.MEDIA_ROOT or tempfile.gettempdir(), 'exports')
+EXPORT_ARTIFACT_NAME = 'olx'
+EXPORT_FILENAME_NAME = 'filename'
+EXPORT_LOCK_TIMEOUT = getattr(settings, 'EXPORT_LOCK_TIMEOUT', 3600)
+
+
+def _get_export_dir(repository_id):
+    return os.path.join(EXPORT_ROOT, str(clean_id(repository_id).identifier))
+
+def _get_export_lock_path(repository_id, version):
+    # hidden, so it is not taken for a version of the artifact
+    return os.path.join(_get_export_dir(repository_id), '.{0}.lock'.format(version))
 
 def _get_genus_type(type_label):
     return Type(**COMPOSITION_GENUS_TYPES[type_label])
 
+def _get_signed_url_cache_key(asset_content_id):
+    return 'signed_url:{0}'.format(str(asset_content_id))
+
 
 def activate_managers(request):
     """
-    Create an initial assessment manager and store it in the user session
+    Create an initial assessment manager and store it in the manager pool
     """
-    if 'rm' not in request.session:
-        condition = PROXY_SESSION.get_proxy_condition()
-        condition.set_http_request(request)
-        proxy = PROXY_SESSION.get_proxy(condition)
-        set_session_data(request, 'rm', RUNTIME.get_service_manager('REPOSITORY', proxy=proxy))
+    if get_session_data(request, 'rm') is None:
+        set_session_data(request, 'rm', get_service_manager(request, 'REPOSITORY'))
 
     return request
 
@@ -43,6 +74,7 @@ def append_child_composition(repository, parent, child):
     form = repository.get_composition_form_for_update(parent.ident)
     form.set_children(current_children_ids)
     repository.update_composition(form)
+    bump_tree_version(repository.ident)
     return repository.get_composition(child.ident)
 
 def attach_asset_content_to_asset(bundle):
@@ -66,6 +98,7 @@ def attach_asset_content_to_asset(bundle):
     content_form.set_data(blob)
 
     repository.create_asset_content(content_form)
+    set_asset_has_contents(repository, asset.ident, True)
 
 def clean_up_dangling_references(rm, composition_id):
     # check all repositories for references to this composition, and remove
@@ -90,6 +123,7 @@ def clean_up_dangling_references(rm, composition_id):
             updated_child_ids = [clean_id(i) for i in current_child_idstrs]
             form.set_children(updated_child_ids)
             repo.update_composition(form)
+            bump_tree_version(repo.ident)
         except (PermissionDenied, NotFound, IllegalState):
             pass
 
@@ -151,6 +185,44 @@ def create_resource_wrapper(repository, resource):
     # repository.add_asset(resource.ident, composition.ident)
     # return repository.get_composition(composition.ident)
 
+def _make_dirs(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+def _write_export_file(version_dir, name, source):
+    """
+    write to a hidden temporary file first and then rename it, so a
+    partial file is never read
+    """
+    handle, temp_path = tempfile.mkstemp(prefix='.', dir=version_dir)
+    with os.fdopen(handle, 'wb') as export_file:
+        source.seek(0)
+        shutil.copyfileobj(source, export_file)
+    path = os.path.join(version_dir, name)
+    os.rename(temp_path, path)
+    return path
+
+def finish_export(repository_id, version):
+    """
+    release the lock from start_export, and return the usernames of
+    everyone who asked for this export while it ran
+    """
+    lock_path = _get_export_lock_path(repository_id, version)
+    # renamed first, so no more usernames are added while it is read
+    released_path = '{0}.released'.format(lock_path)
+    try:
+        os.rename(lock_path, released_path)
+    except OSError:
+        return []
+    try:
+        with open(released_path) as lock:
+            return [username.strip() for username in lock if username.strip()]
+    finally:
+        os.remove(released_path)
+
 def get_asset_content_type_from_runtime(repository):
     type_list = []
     try:
@@ -162,6 +234,47 @@ def get_asset_content_type_from_runtime(repository):
         pass
     return type_list
 
+def get_asset_content_urls(asset_contents):
+    """
+    {asset_content_id: url} for these asset contents. Signing a CloudFront
+    URL is expensive, so signed URLs are cached until shortly before they
+    expire, and a whole page of asset contents is looked up at once.
+    Asset contents without a URL are left out
+    """
+    asset_contents = list(asset_contents)
+    keys = dict((_get_signed_url_cache_key(asset_content.ident), str(asset_content.ident))
+                for asset_content in asset_contents)
+    urls = dict((keys[key], url) for key, url in cache.get_many(keys.keys()).iteritems())
+
+    for asset_content in asset_contents:
+        asset_content_id = str(asset_content.ident)
+        if asset_content_id in urls:
+            continue
+        try:
+            url = asset_content.get_url()
+        except IllegalState:
+            # does not have a URL
+            continue
+        urls[asset_content_id] = url
+
+        expiration = get_signed_url_expiration(url)
+        if expiration is not None:
+            timeout = int(expiration - time.time()) - SIGNED_URL_EXPIRATION_MARGIN
+            if timeout > 0:
+                cache.set(_get_signed_url_cache_key(asset_content_id), url, timeout)
+    return urls
+
+def get_asset_ids_without_has_contents(repository):
+    """
+    the ids of the assets in this repository (and its children) that do
+    not have hasContents yet. Collected up front, because updating the
+    assets changes the query results
+    """
+    repository.use_federated_repository_view()
+    querier = repository.get_asset_query()
+    querier._add_match('hasContents', None, True)
+    return [asset.ident for asset in repository.get_assets_by_query(querier)]
+
 def get_course_node(repository):
     try:
         course_node = repository.course_node
@@ -192,16 +305,39 @@ def get_object_repository(manager, object_id, object_type='asset', repository_id
     """Get the object's repository even without the repositoryId"""
     # primarily used for Asset
     if repository_id is None:
-        lookup_session = get_session(manager, object_type, 'lookup')
-        try:
-            lookup_session.use_unsequestered_composition_view()
-        except AttributeError:
-            pass
-        if isinstance(object_id, basestring):
-            object_id = clean_id(object_id)
-        object_ = getattr(lookup_session, 'get_{0}'.format(object_type))(object_id)
-        repository_id = object_.object_map['repositoryId']
-    return manager.get_repository(clean_id(repository_id))
+        def get_lookup_session():
+            lookup_session = get_session(manager, object_type, 'lookup')
+            try:
+                lookup_session.use_unsequestered_composition_view()
+            except AttributeError:
+                pass
+            return lookup_session
+        repository_id = get_object_catalog_id(get_lookup_session,
+                                              object_id,
+                                              object_type,
+                                              'repositoryId')
+    return get_catalog(manager, 'repository', repository_id)
+
+def get_signed_url_expiration(url):
+    """
+    the epoch time that a CloudFront signed URL expires at, from either
+    a canned (Expires) or custom (Policy) policy. None if not signed
+    """
+    try:
+        query = urlparse.parse_qs(urlparse.urlparse(url).query)
+    except (AttributeError, TypeError):
+        return None
+    try:
+        if 'Expires' in query:
+            return int(query['Expires'][0])
+        if 'Policy' in query:
+            # CloudFront swaps out the characters that are invalid in URLs
+            policy = query['Policy'][0].replace('-', '+').replace('_', '=').replace('~', '/')
+            policy = json.loads(base64.b64decode(policy))
+            return int(policy['Statement'][0]['Condition']['DateLessThan']['AWS:EpochTime'])
+    except (ValueError, TypeError, KeyError, IndexError):
+        pass
+    return None
 
 def get_session(manager, object_type, session_type):
     """get session type for object, using the manager"""
@@ -212,6 +348,58 @@ def get_session(manager, object_type, session_type):
     session.use_federated_repository_view()
     return session
 
+def get_session_for_repository(manager, object_type, session_type, repository_id):
+    """get session type for objects in one repository (and its children), using the manager"""
+    get_session_method = getattr(manager, 'get_{0}_{1}_session_for_repository'.format(object_type,
+                                                                                    session_type))
+    if manager._proxy is not None:
+        session = get_session_method(clean_id(repository_id), proxy=manager._proxy)
+    else:
+        session = get_session_method(clean_id(repository_id))
+    session.use_federated_repository_view()
+    return session
+
+def open_export_artifact(repository_id, version):
+    """
+    (filename, file) for the exported OLX of this version of the
+    repository, or None if it has not been exported yet
+    """
+    version_dir = os.path.join(_get_export_dir(repository_id), version)
+    try:
+        with open(os.path.join(version_dir, EXPORT_FILENAME_NAME)) as filename:
+            return filename.read(), open(os.path.join(version_dir, EXPORT_ARTIFACT_NAME), 'rb')
+    except (OSError, IOError):
+        # not exported, or replaced by a newer version in the meantime
+        return None
+
+def save_export_artifact(repository_id, version, filename, olx):
+    """
+    write exported OLX to disk for this version of the repository, and
+    remove the artifacts of older versions. Returns the artifact path
+    """
+    export_dir = _get_export_dir(repository_id)
+    version_dir = os.path.join(export_dir, version)
+    _make_dirs(version_dir)
+
+    # the artifact goes in last, so there is always a filename to serve it with
+    _write_export_file(version_dir, EXPORT_FILENAME_NAME, StringIO(os.path.basename(filename)))
+    path = _write_export_file(version_dir, EXPORT_ARTIFACT_NAME, olx)
+
+    for old_version in os.listdir(export_dir):
+        if old_version != version and not old_version.startswith('.'):
+            shutil.rmtree(os.path.join(export_dir, old_version), ignore_errors=True)
+    return path
+
+def set_asset_has_contents(repository, asset_id, has_contents):
+    """
+    Persist whether an asset has any asset contents, so that searches can
+    filter out enclosure assets in the query instead of checking every asset
+    """
+    form = repository.get_asset_form_for_update(asset_id)
+    if form._my_map.get('hasContents') != has_contents:
+        form._my_map['hasContents'] = has_contents
+        repository.update_asset(form)
+
 def set_enclosed_object_provider_id(request, catalog, enclosed_object, provider_id_str):
     activate_managers(request)
     rm = get_session_data(request, 'rm')
@@ -221,38 +409,117 @@ def set_enclosed_object_provider_id(request, catalog, enclosed_object, provider_
     asset = repo.update_asset(form)
     return asset
 
+def start_export(repository_id, version, username):
+    """
+    False if this version of the repository is already being exported,
+    so that repeated download requests do not queue more exports. The
+    lock is a file next to the artifacts, so every process sees it, and
+    one older than EXPORT_LOCK_TIMEOUT is taken over. It lists the users
+    who asked for the export, to notify once it is done
+    """
+    _make_dirs(_get_export_dir(repository_id))
+    lock_path = _get_export_lock_path(repository_id, version)
+    try:
+        if time.time() - os.path.getmtime(lock_path) > EXPORT_LOCK_TIMEOUT:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+        started = True
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
+        try:
+            lock = os.open(lock_path, os.O_RDWR | os.O_APPEND)
+        except OSError:
+            # the export just finished, so the next request gets it
+            return False
+        started = False
+    try:
+        with os.fdopen(lock, 'a+') as lock_file:
+            lock_file.seek(0)
+            # only once per user, so polling does not keep a stale lock fresh
+            if username not in [line.strip() for line in lock_file]:
+                lock_file.seek(0, os.SEEK_END)
+                lock_file.write(username + '\n')
+    except (IOError, OSError):
+        pass
+    return started
+
+def update_asset_has_contents(repository, asset_id):
+    """re-check an asset's contents after they were changed, and update its hasContents flag"""
+    asset = repository.get_asset(asset_id)
+    set_asset_has_contents(repository, asset_id, asset.get_asset_contents().available() > 0)
+
 def update_asset_urls(repository, asset, params=None):
     """update the asset URLs on assetContents with CloudFront URLs
     asset can be either the dlkit Asset or it's object map
     """
-    if isinstance(asset, dict):
-        asset_object = repository.get_asset(Id(asset['id']))
-        asset_map = asset
-    else:
-        asset_object = asset
-        asset_map = asset.object_map
+    return update_assets_urls(repository, [asset], params)[0]
 
-    cloudfront_url_map = {}
+def update_assets_urls(repository, assets, params=None, asset_objects=None):
+    """update_asset_urls for a page of assets, which gets all their
+    URLs in one batch. Returns the asset maps, in order.
+    asset_objects is an optional {asset_id: Asset} map, so that
+    asset maps do not have to be fetched again
+    """
+    if asset_objects is None:
+        asset_objects = {}
+    asset_maps = []
+    asset_contents = []
+    for asset in assets:
+        if isinstance(asset, dict):
+            asset_object = asset_objects.get(asset['id'])
+            if asset_object is None:
+                asset_object = repository.get_asset(Id(asset['id']))
+            asset_map = asset
+        else:
+            asset_object = asset
+            asset_map = asset.object_map
+        asset_maps.append(asset_map)
+        asset_contents.append(list(asset_object.get_asset_contents()))
 
-    for index, asset_content in enumerate(asset_object.get_asset_contents()):
-        try:
-            cloudfront_url_map[str(asset_content.ident)] = asset_content.get_url()
-        except IllegalState:
-            # does not have
-            pass
-        try:
-            if params is not None:
-                if 'renderable_edxml' in params:
-                    asset_map['assetContents'][index]['text']['text'] = asset_content.get_edxml_with_aws_urls()
-        except AttributeError:
-            pass
+    cloudfront_url_map = get_asset_content_urls(asset_content
+                                                for contents in asset_contents
+                                                for asset_content in contents)
 
-    for index, asset_content in enumerate(asset_map['assetContents']):
-        if asset_content['id'] in cloudfront_url_map:
-            asset_content['url'] = cloudfront_url_map[asset_content['id']]
-            asset_map['assetContents'][index]['url'] = cloudfront_url_map[asset_content['id']]
+    for asset_map, contents in zip(asset_maps, asset_contents):
+        for index, asset_content in enumerate(contents):
+            try:
+                if params is not None:
+                    if 'renderable_edxml' in params:
+                        asset_map['assetContents'][index]['text']['text'] = asset_content.get_edxml_with_aws_urls()
+            except AttributeError:
+                pass
 
-    return asset_map
+        for asset_content in asset_map['assetContents']:
+            if asset_content['id'] in cloudfront_url_map:
+                asset_content['url'] = cloudfront_url_map[asset_content['id']]
+
+    return asset_maps
+
+def update_assets_urls_by_repository(manager, asset_maps, params=None, asset_objects=None):
+    """
+    update_assets_urls for a page of asset maps from different repositories.
+    Assets are grouped by their repositoryId, and each repository is only
+    looked up once, if any of its assets are not in asset_objects
+    """
+    if asset_objects is None:
+        asset_objects = {}
+    repository_asset_maps = OrderedDict()
+    for asset_map in asset_maps:
+        repository_asset_maps.setdefault(asset_map['repositoryId'], []).append(asset_map)
+
+    for repository_id, maps in repository_asset_maps.iteritems():
+        repository = None
+        if any(asset_map['id'] not in asset_objects for asset_map in maps):
+            repository = get_object_repository(manager,
+                                               maps[0]['id'],
+                                               'asset',
+                                               repository_id=repository_id)
+        update_assets_urls(repository, maps, params, asset_objects)
+    return asset_maps
 
 def update_composition_assets(am, rm, username, repository, composition_id, asset_ids):
     # remove current assets first, if they exist
@@ -278,6 +545,7 @@ def update_composition_assets(am, rm, username, repository, composition_id, asse
                 run_bank.get_item(clean_id(asset_id))
             except NotFound:
                 am.assign_item_to_bank(clean_id(asset_id), run_bank.ident)
+                forget_object_catalog_id(asset_id)
 
             # need to find the assessment associated with this item from user_bank
             user_repo = get_or_create_user_repo(username)
@@ -286,10 +554,13 @@ def update_composition_assets(am, rm, username, repository, composition_id, asse
             querier.match_item_id(clean_id(asset_id), True)
             assessment = user_bank.get_assessments_by_query(querier).next()  # assume only one??
             enclosed_asset = get_enclosed_object_asset(user_repo, assessment)
+            # enclosures have no asset contents, so searches can skip them
+            set_asset_has_contents(user_repo, enclosed_asset.ident, False)
             try:
                 rm.assign_asset_to_repository(enclosed_asset.ident, repository.ident)
             except AlreadyExists:
                 pass
+            forget_object_catalog_id(enclosed_asset.ident)
 
             # finally, add the enclosure asset to the run repository composition
             repository.add_asset(enclosed_asset.ident,
@@ -318,6 +589,7 @@ def update_composition_children(repository, composition_id, children_ids,
             child = repository.get_composition(original_child_id)
             if child.is_sequestered():
                 repository.delete_composition(child.ident)
+                forget_object_catalog_id(child.ident)
         except NotFound:
             pass
 
@@ -372,6 +644,7 @@ def update_composition_children(repository, composition_id, children_ids,
                 run_bank.get_item(item_id)
             except NotFound:
                 am.assign_item_to_bank(item_id, run_bank.ident)
+                forget_object_catalog_id(item_id)
 
             # need to find the assessment associated with this item from user_bank
             user_repo = get_or_create_user_repo(username)
@@ -395,15 +668,20 @@ def update_composition_children(repository, composition_id, children_ids,
             user_repo.add_asset(assessment.ident, wrapper_composition.ident)
 
             enclosed_asset = get_enclosed_object_asset(user_repo, assessment)
+            # enclosures have no asset contents, so searches can skip them
+            set_asset_has_contents(user_repo, enclosed_asset.ident, False)
             try:
                 rm.assign_asset_to_repository(enclosed_asset.ident, repository.ident)
             except AlreadyExists:
                 pass
+            forget_object_catalog_id(enclosed_asset.ident)
 
             unified_list.append(wrapper_composition.ident)
 
     form.set_children(unified_list)
-    return repository.update_composition(form)
+    updated_composition = repository.update_composition(form)
+    bump_tree_version(repository.ident)
+    return updated_composition
 
 def update_edx_composition_boolean(form, bool_type, bool_value):
     if bool_type == 'visible_to_students':
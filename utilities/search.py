@@ -0,0 +1,190 @@
+"""Shared caches for the repository search and query plan endpoints.
+
+Every repository / bank has a generation, which is replaced whenever an
+object in it (or its children) changes. Cached values for a domain (or user)
+repository are stored with the generations of the catalogs they were built
+from -- the domain itself, and its courses and runs -- and are only served
+while all of those are unchanged. A generation that is missing from the
+cache (i.e. culled) counts as changed, so values are recomputed instead of
+served stale. The generations are read before a value is built (see
+get_generations), so a value built while one of its catalogs changed is
+stored as stale, instead of as current. Uses the Django cache, so values are only cached when CACHES
+is shared by every process (see is_shared_cache); otherwise invalidations
+would not be seen by the other processes, and every read is a miss.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import is_shared_cache
+from .general import clean_id
+from .snapshots import bump_tree_version
+
+
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 3600)
+OBJECTIVE_NAME_TIMEOUT = getattr(settings, 'OBJECTIVE_NAME_TIMEOUT', 86400)
+
+
+def _get_cache_key(*parts):
+    return 'search:{0}'.format(':'.join(str(part) for part in parts))
+
+
+def _get_catalog_key(catalog_id):
+    """repositories and banks share identifiers, so only key on that part"""
+    return str(clean_id(catalog_id).identifier)
+
+
+def _get_domain_cache(domain_id, name, signature=''):
+    """the cached value, or None if any catalog it was built from changed"""
+    if not is_shared_cache():
+        return None
+    entry = cache.get(_get_cache_key(name, _get_catalog_key(domain_id), signature))
+    if entry is None or _get_generations(entry['generations'].keys()) != entry['generations']:
+        return None
+    return entry['value']
+
+
+def _get_generation(catalog_key):
+    generation_key = _get_cache_key('generation', catalog_key)
+    generation = cache.get(generation_key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(generation_key, generation, None):
+            generation = cache.get(generation_key, generation)
+    return generation
+
+
+def _get_generations(catalog_keys):
+    """{catalog_key: generation}, starting new generations for missing ones"""
+    keys = dict((_get_cache_key('generation', catalog_key), catalog_key)
+                for catalog_key in catalog_keys)
+    generations = dict((keys[key], generation)
+                       for key, generation in cache.get_many(keys.keys()).iteritems())
+    for catalog_key in catalog_keys:
+        if catalog_key not in generations:
+            generations[catalog_key] = _get_generation(catalog_key)
+    return generations
+
+
+def _set_domain_cache(domain_id, name, value, generations, signature=''):
+    """generations are from get_generations, taken before value was built"""
+    if not is_shared_cache():
+        return
+    cache.set(_get_cache_key(name, _get_catalog_key(domain_id), signature),
+              {
+                  'generations': generations,
+                  'value': value
+              },
+              SEARCH_CACHE_TIMEOUT)
+
+
+def get_export_generations(run_id, catalog_ids):
+    """
+    the generations of the run, catalog_ids (i.e. its courses), and the
+    catalogs that its last cached export version was hashed from, to read
+    before hashing the run again
+    """
+    catalog_keys = set(_get_catalog_key(catalog_id) for catalog_id in catalog_ids)
+    catalog_keys.add(_get_catalog_key(run_id))
+    if is_shared_cache():
+        entry = cache.get(_get_cache_key('export', _get_catalog_key(run_id), ''))
+        if entry is not None:
+            catalog_keys.update(entry['generations'])
+    return _get_generations(catalog_keys)
+
+
+def get_export_version(run_id):
+    """the cached export version of a run, or None"""
+    return _get_domain_cache(run_id, 'export')
+
+
+def get_facet_index(domain_id, signature):
+    """
+    per-run facet counts for a domain, for one set of query filters:
+    {run_id: {'total': int, 'resource_type': {...}, 'learning_objective': {...}}}
+    """
+    return _get_domain_cache(domain_id, 'facets', signature) or {}
+
+
+def get_generations(domain_id, catalog_ids):
+    """
+    the current generations of the domain and the catalogs (its courses
+    or runs) that a value is about to be built from, to pass to its setter
+    """
+    catalog_keys = set(_get_catalog_key(catalog_id) for catalog_id in catalog_ids)
+    catalog_keys.add(_get_catalog_key(domain_id))
+    return _get_generations(catalog_keys)
+
+
+def get_objective_counts(domain_id):
+    """
+    {objective_id: number of objects in the domain that use it}, or None.
+    Dropped whenever an object in the domain changes, like the facets
+    """
+    return _get_domain_cache(domain_id, 'objectives')
+
+
+def get_objective_names(objective_ids):
+    """the cached display names of these objectives, as {objective_id: name}"""
+    keys = dict((_get_cache_key('objective', objective_id), objective_id)
+                for objective_id in objective_ids)
+    names = cache.get_many(keys.keys())
+    return dict((keys[key], name) for key, name in names.iteritems())
+
+
+def get_query_signature(*filters):
+    return hashlib.md5(repr(filters)).hexdigest()
+
+
+def get_run_map(domain_id):
+    """the cached {run_id: 'course name, run name'} map of a domain, or None"""
+    return _get_domain_cache(domain_id, 'runs')
+
+
+def invalidate_search_caches(catalog_id):
+    """
+    call after an object in this repository / bank is created, updated
+    or deleted, or the repository itself or its children change, to drop
+    the cached run maps, facets and objective counts of every domain it
+    is part of, and the composition tree snapshots with objects in it
+    """
+    cache.set(_get_cache_key('generation', _get_catalog_key(catalog_id)),
+              uuid.uuid4().hex,
+              None)
+    bump_tree_version(catalog_id)
+
+
+def set_export_version(run_id, version, generations, catalog_ids):
+    """
+    generations are from get_export_generations, and catalog_ids are of
+    every object that was hashed into version
+    """
+    catalog_keys = set(_get_catalog_key(catalog_id) for catalog_id in catalog_ids)
+    if not catalog_keys.issubset(generations):
+        # some catalogs were not known before hashing, so their changes
+        # during it could be missed; remember them for the next time
+        generations = dict(generations)
+        generations.update(_get_generations(catalog_keys.difference(generations)))
+        version = None
+    _set_domain_cache(run_id, 'export', version, generations)
+
+
+def set_facet_index(domain_id, signature, index, generations):
+    _set_domain_cache(domain_id, 'facets', index, generations, signature)
+
+
+def set_objective_counts(domain_id, objective_counts, generations):
+    _set_domain_cache(domain_id, 'objectives', objective_counts, generations)
+
+
+def set_objective_names(names):
+    cache.set_many(dict((_get_cache_key('objective', objective_id), name)
+                        for objective_id, name in names.iteritems()),
+                   OBJECTIVE_NAME_TIMEOUT)
+
+
+def set_run_map(domain_id, run_map, generations):
+    """generations are of the domain, and the courses and runs in the run map"""
+    _set_domain_cache(domain_id, 'runs', run_map, generations)
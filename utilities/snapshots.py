@@ -0,0 +1,126 @@
+"""Cached snapshots of nested composition trees.
+
+Every repository / bank has a tree version, which is bumped whenever a
+composition's children (or an object) in it change. A snapshot is stored with
+the versions of every catalog that the objects in its tree are assigned to,
+and is only served while none of those changed, so a change in one course
+leaves the snapshots of the others alone. The versions are read before a
+tree is built, so a tree built during a change is stored as stale; the
+catalogs of a tree are only known once it is built, so a snapshot that found
+new ones records them, and is only served after the next build. Uses the
+Django cache, so snapshots are only kept when CACHES is shared by every
+process (see is_shared_cache).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import is_shared_cache
+from .general import clean_id
+
+
+TREE_SNAPSHOT_TIMEOUT = getattr(settings, 'TREE_SNAPSHOT_TIMEOUT', 300)
+
+
+def _get_catalog_key(catalog_id):
+    """repositories and banks share identifiers, so only key on that part"""
+    return str(clean_id(catalog_id).identifier)
+
+
+def _get_snapshot_key(pool_key, name, *params):
+    return 'snapshots:{0}:{1}:{2}'.format(name,
+                                          pool_key,
+                                          ':'.join(str(param) for param in params))
+
+
+def _get_version_key(catalog_key):
+    return 'snapshots:version:{0}'.format(catalog_key)
+
+
+def _get_versions(catalog_keys):
+    keys = dict((_get_version_key(catalog_key), catalog_key) for catalog_key in catalog_keys)
+    versions = dict((keys[key], version)
+                    for key, version in cache.get_many(keys.keys()).iteritems())
+    for catalog_key in catalog_keys:
+        if catalog_key not in versions:
+            # time-based, so that versions do not repeat if the counter is evicted
+            version = int(time.time() * 1000)
+            if not cache.add(_get_version_key(catalog_key), version, None):
+                version = cache.get(_get_version_key(catalog_key), version)
+            versions[catalog_key] = version
+    return versions
+
+
+def bump_tree_version(catalog_id):
+    """
+    call after a composition's children, or an object, in this
+    repository / bank change
+    """
+    try:
+        cache.incr(_get_version_key(_get_catalog_key(catalog_id)))
+    except ValueError:
+        # not in the cache (anymore), so start over past any old version
+        _get_versions([_get_catalog_key(catalog_id)])
+
+
+def get_tree_catalog_ids(tree):
+    """the repositories and banks that the objects in a tree are assigned to"""
+    catalog_ids = set()
+    level = [tree]
+    while len(level) > 0:
+        next_level = []
+        for obj_map in level:
+            catalog_ids.update(obj_map.get('assignedRepositoryIds', []))
+            catalog_ids.update(obj_map.get('assignedBankIds', []))
+            next_level += [child for child in obj_map.get('children', [])
+                           if isinstance(child, dict)]
+        level = next_level
+    return catalog_ids
+
+
+def get_tree_snapshot(pool_key, name, *params):
+    """
+    the cached snapshot for this manager pool key (i.e. the user and
+    proxy conditions, which decide canEdit) and params, or None
+    """
+    if not is_shared_cache():
+        return None
+    snapshot = cache.get(_get_snapshot_key(pool_key, name, *params))
+    if (snapshot is None or snapshot['versions'] is None or
+            _get_versions(snapshot['versions'].keys()) != snapshot['versions']):
+        return None
+    return snapshot['tree']
+
+
+def get_tree_versions(catalog_ids, pool_key, name, *params):
+    """
+    the current versions of catalog_ids (i.e. the repository of the tree's
+    root), and of the catalogs recorded by the last snapshot for these
+    params, to read before building the tree
+    """
+    catalog_keys = set(_get_catalog_key(catalog_id) for catalog_id in catalog_ids)
+    if is_shared_cache():
+        snapshot = cache.get(_get_snapshot_key(pool_key, name, *params))
+        if snapshot is not None:
+            catalog_keys.update(snapshot['catalog_keys'])
+    return _get_versions(catalog_keys)
+
+
+def set_tree_snapshot(versions, tree, pool_key, name, *params):
+    """versions are from get_tree_versions, taken before the tree was built"""
+    if not is_shared_cache():
+        return
+    catalog_keys = set(_get_catalog_key(catalog_id) for catalog_id in get_tree_catalog_ids(tree))
+    if not catalog_keys.issubset(versions):
+        # some catalogs were not known before the build, so their changes
+        # during it could be missed; remember them for the next build
+        catalog_keys.update(versions)
+        versions = None
+    cache.set(_get_snapshot_key(pool_key, name, *params),
+              {
+                  'catalog_keys': list(catalog_keys),
+                  'tree': tree,
+                  'versions': versions
+              },
+              TREE_SNAPSHOT_TIMEOUT)
@@ -27,6 +27,7 @@ ABS_PATH = os.path.abspath(os.path.join(PROJECT_PATH, os.pardir))
                    CLOUDFRONT_DISTRO_ID='E1OEKZHRUO35M9',
                    S3_BUCKET='mitodl-repository-test',
                    CELERY_ALWAYS_EAGER=True,
+                   SHARED_CACHE=True,
                    TEST=True)
 class DjangoTestCase(APITestCase, MockTestCase):
     """
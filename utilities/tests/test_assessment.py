@@ -0,0 +1,118 @@
+from dlkit.runtime.errors import NotFound
+from dlkit.runtime.primitives import Id
+
+from utilities import assessment as autils
+from utilities.testing import DjangoTestCase
+
+
+FILES_SUBMISSION = 'answer-record-type%3Afiles-submission%40ODL.MIT.EDU'
+
+
+class FakeResponse(object):
+    def __init__(self, item_id, record_type_ids):
+        self._item_id = item_id
+        self._my_map = {
+            'recordTypeIds': record_type_ids
+        }
+
+    def get_item_id(self):
+        return self._item_id
+
+
+class FakeSection(object):
+    ident = Id('assessment.AssessmentSection%3A1%40ODL.MIT.EDU')
+
+
+class FakeItem(object):
+    def __init__(self, item_id):
+        self.ident = Id(item_id)
+
+    def get_answers(self):
+        return []
+
+    def get_wrong_answers(self):
+        return []
+
+
+class FakeItemLookupSession(object):
+    def __init__(self, bank):
+        self._bank = bank
+
+    def get_items_by_ids(self, item_ids):
+        self._bank.num_calls += 1
+        return [FakeItem(str(item_id)) for item_id in item_ids]
+
+
+class FakeSectionWithQuestions(FakeSection):
+    """a section that maps its questions to the items they are from"""
+    def __init__(self, bank, question_ids):
+        self._bank = bank
+        self._my_map = {
+            'questions': [{
+                '_id': question_id.identifier,
+                'questionId': 'assessment.Item%3Aitem{0}%40ODL.MIT.EDU'.format(question_id.identifier)
+            } for question_id in question_ids]
+        }
+
+    def _get_item_lookup_session(self):
+        return FakeItemLookupSession(self._bank)
+
+
+class FakeBank(object):
+    """records how many backend calls are made"""
+    def __init__(self, responses):
+        self._responses = responses
+        self.num_calls = 0
+
+    def get_answers(self, section_id, question_id):
+        self.num_calls += 1
+        return []
+
+    def get_response(self, section_id, question_id):
+        self.num_calls += 1
+        for response in self._responses:
+            if str(response.get_item_id()) == str(question_id) and response._my_map['recordTypeIds']:
+                return response
+        raise NotFound()
+
+    def get_responses(self, section_id):
+        self.num_calls += 1
+        return iter(self._responses)
+
+
+class QuestionStatusTests(DjangoTestCase):
+    """Test that question statuses can be resolved for a whole page at once
+
+    """
+    def setUp(self):
+        super(QuestionStatusTests, self).setUp()
+        self.question_ids = [Id('assessment.Item%3A{0}%40ODL.MIT.EDU'.format(i)) for i in range(10)]
+        responses = [FakeResponse(question_id, [FILES_SUBMISSION])
+                     for question_id in self.question_ids[0:3]]
+        responses.append(FakeResponse(self.question_ids[3], []))
+        self.bank = FakeBank(responses)
+        self.section = FakeSection()
+
+    def tearDown(self):
+        super(QuestionStatusTests, self).tearDown()
+
+    def test_batched_statuses_match_single_statuses(self):
+        statuses = autils.get_question_statuses(self.bank, self.section, self.question_ids)
+        for question_id in self.question_ids:
+            self.assertEqual(
+                statuses[str(question_id)],
+                autils.get_question_status(self.bank, self.section, question_id)
+            )
+
+    def test_responses_are_fetched_once_per_page(self):
+        statuses = autils.get_question_statuses(self.bank, self.section, self.question_ids)
+        self.assertEqual(self.bank.num_calls, 4)  # 1 for the responses, 3 for answers
+        self.assertTrue(statuses[str(self.question_ids[0])]['responded'])
+        self.assertFalse(statuses[str(self.question_ids[3])]['responded'])
+
+    def test_answers_are_looked_up_once_per_page(self):
+        section = FakeSectionWithQuestions(self.bank, self.question_ids)
+        statuses = autils.get_question_statuses(self.bank, section, self.question_ids)
+        self.assertEqual(self.bank.num_calls, 2)  # 1 for the responses, 1 for the items
+        self.assertTrue(statuses[str(self.question_ids[0])]['responded'])
+        self.assertFalse(statuses[str(self.question_ids[3])]['responded'])
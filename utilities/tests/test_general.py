@@ -0,0 +1,412 @@
+import os
+import time
+
+from StringIO import StringIO
+
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+
+from utilities import general as gutils
+from utilities.cache import LRUCache, is_shared_cache
+from utilities.testing import DjangoTestCase, create_test_request
+
+
+class LRUCacheTests(DjangoTestCase):
+    """Test the in-process LRU cache
+
+    """
+    def setUp(self):
+        super(LRUCacheTests, self).setUp()
+        self.cache = LRUCache(max_size=2)
+
+    def tearDown(self):
+        super(LRUCacheTests, self).tearDown()
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('c', self.cache)
+
+    def test_expired_entries_are_missing(self):
+        self.cache.set('a', 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_setdefault_returns_existing_value(self):
+        first = self.cache.setdefault('a', {})
+        second = self.cache.setdefault('a', {})
+        self.assertIs(first, second)
+
+
+class SharedCacheTests(DjangoTestCase):
+    """Test which cache backends are taken to be shared by every process
+
+    """
+    def setUp(self):
+        super(SharedCacheTests, self).setUp()
+
+    def tearDown(self):
+        super(SharedCacheTests, self).tearDown()
+
+    @override_settings(SHARED_CACHE=None,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_cache_is_not_shared(self):
+        self.assertFalse(is_shared_cache())
+
+    @override_settings(SHARED_CACHE=None,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+                                           'LOCATION': '127.0.0.1:11211'}})
+    def test_memcached_is_shared(self):
+        self.assertTrue(is_shared_cache())
+
+    @override_settings(SHARED_CACHE=True,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_setting_overrides_backend(self):
+        self.assertTrue(is_shared_cache())
+
+
+class ManagerPoolTests(DjangoTestCase):
+    """Test that managers are pooled per process instead of pickled
+    into the session
+
+    """
+    def setUp(self):
+        super(ManagerPoolTests, self).setUp()
+
+    def tearDown(self):
+        super(ManagerPoolTests, self).tearDown()
+
+    def test_session_only_holds_pool_key(self):
+        for nickname in gutils.MANAGER_NICKNAMES:
+            self.assertNotIn(nickname, self.req.session)
+        self.assertIn(gutils.MANAGER_POOL_SESSION_KEY, self.req.session)
+
+    def test_managers_are_reused_across_requests(self):
+        rm = gutils.get_session_data(self.req, 'rm')
+        self.assertIsNotNone(rm)
+
+        second_req = create_test_request(self.user)
+        gutils.activate_managers(second_req)
+        self.assertIs(
+            gutils.get_session_data(second_req, 'rm'),
+            rm
+        )
+
+    def test_different_users_get_different_managers(self):
+        student_req = create_test_request(self.student)
+        gutils.activate_managers(student_req)
+        self.assertIsNot(
+            gutils.get_session_data(student_req, 'rm'),
+            gutils.get_session_data(self.req, 'rm')
+        )
+
+    def test_lti_headers_change_pool_key(self):
+        lti_req = create_test_request(self.user)
+        lti_req.META['HTTP_LTI_USER_ROLE'] = 'Learner'
+        self.assertNotEqual(
+            gutils.get_manager_pool_key(lti_req),
+            gutils.get_manager_pool_key(self.req)
+        )
+
+
+class SessionWriteTests(DjangoTestCase):
+    """Test that the session is only marked as modified when
+    its data changes
+
+    """
+    def setUp(self):
+        super(SessionWriteTests, self).setUp()
+        self.second_req = create_test_request(self.user)
+        gutils.get_manager_pool_key(self.second_req)
+        self.second_req.session.modified = False
+
+    def tearDown(self):
+        super(SessionWriteTests, self).tearDown()
+
+    def test_reusing_pooled_managers_does_not_modify_session(self):
+        gutils.activate_managers(self.second_req)
+        rm = gutils.get_session_data(self.second_req, 'rm')
+        gutils.set_session_data(self.second_req, 'rm', rm)
+        self.assertFalse(self.second_req.session.modified)
+
+    def test_unchanged_session_data_does_not_modify_session(self):
+        gutils.set_session_data(self.second_req, 'foo', {'bar': 1})
+        self.assertTrue(self.second_req.session.modified)
+
+        self.second_req.session.modified = False
+        gutils.set_session_data(self.second_req, 'foo', {'bar': 1})
+        self.assertFalse(self.second_req.session.modified)
+
+
+class FakeOsidList(object):
+    """iterates like an OsidList, and records how many elements
+    were pulled out of it"""
+    def __init__(self, elements):
+        self._elements = list(elements)
+        self.num_pulled = 0
+
+    def __iter__(self):
+        return self
+
+    def available(self):
+        return len(self._elements)
+
+    def next(self):
+        if len(self._elements) == 0:
+            raise StopIteration
+        self.num_pulled += 1
+        return self._elements.pop(0)
+
+    def skip(self, n):
+        del self._elements[0:n]
+
+
+class PaginationTests(DjangoTestCase):
+    """Test that pagination only pulls the requested page out of
+    OsidLists
+
+    """
+    def get_request(self, query_string):
+        return Request(RequestFactory().get('/api/v1/repository/assets/?' + query_string))
+
+    def setUp(self):
+        super(PaginationTests, self).setUp()
+        self.elements = [{'id': str(i), 'type': 'Asset'} for i in range(25)]
+
+    def tearDown(self):
+        super(PaginationTests, self).tearDown()
+
+    def test_page_only_pulls_one_page(self):
+        osid_list = FakeOsidList(self.elements)
+        page = gutils.paginate(osid_list, self.get_request('page=2'), count=25)
+
+        self.assertEqual(
+            [r['id'] for r in page['results']],
+            [str(i) for i in range(10, 20)]
+        )
+        self.assertEqual(osid_list.num_pulled, 10)
+        self.assertEqual(page['count'], 25)
+        self.assertIn('page=3', page['next'])
+        self.assertIn('page=1', page['previous'])
+
+    def test_out_of_range_page_returns_last_page(self):
+        page = gutils.paginate(FakeOsidList(self.elements), self.get_request('page=10'), count=25)
+        self.assertEqual(
+            [r['id'] for r in page['results']],
+            [str(i) for i in range(20, 25)]
+        )
+        self.assertIsNone(page['next'])
+
+    def test_page_all_returns_everything(self):
+        page = gutils.paginate(FakeOsidList(self.elements), self.get_request('page=all'), count=25)
+        self.assertEqual(len(page['results']), 25)
+
+    def test_can_walk_list_with_cursors(self):
+        request = self.get_request('limit=10')
+        self.assertTrue(gutils.is_cursor_request(request))
+
+        seen = []
+        page = gutils.paginate_by_cursor(FakeOsidList(self.elements), request, 25)
+        seen += [r['id'] for r in page['results']]
+        while page['next'] is not None:
+            cursor = page['next'].split('cursor=')[-1].split('&')[0]
+            request = self.get_request('limit=10&cursor=' + cursor)
+            page = gutils.paginate_by_cursor(FakeOsidList(self.elements), request, 25)
+            seen += [r['id'] for r in page['results']]
+
+        self.assertEqual(seen, [str(i) for i in range(25)])
+        self.assertIsNotNone(page['previous'])
+
+    def test_bad_cursor_raises_parse_error(self):
+        request = self.get_request('cursor=notacursor')
+        self.assertRaises(ParseError,
+                          gutils.paginate_by_cursor,
+                          FakeOsidList(self.elements),
+                          request,
+                          25)
+
+
+class ChainedListTests(DjangoTestCase):
+    """Test that pages are sliced out of chained lists without pulling
+    the objects in front of them
+
+    """
+    def setUp(self):
+        super(ChainedListTests, self).setUp()
+        self.first = FakeOsidList(range(0, 10))
+        self.second = FakeOsidList(range(10, 20))
+        self.third = FakeOsidList(range(20, 30))
+
+    def tearDown(self):
+        super(ChainedListTests, self).tearDown()
+
+    def test_skips_whole_lists_before_page(self):
+        chained = gutils.ChainedList([self.first, self.second, self.third])
+        self.assertEqual(chained.get_slice(12, 5), range(12, 17))
+        self.assertEqual(self.first.num_pulled, 0)
+        self.assertEqual(self.second.num_pulled, 5)
+        self.assertEqual(self.third.num_pulled, 0)
+
+    def test_page_can_span_lists(self):
+        chained = gutils.ChainedList([self.first, None, self.second, self.third])
+        self.assertEqual(chained.get_slice(8, 15), range(8, 23))
+
+    def test_filtered_lists_are_walked(self):
+        evens = (i for i in range(0, 10) if i % 2 == 0)
+        chained = gutils.ChainedList([evens, self.second])
+        self.assertEqual(chained.get_slice(3, 4), [6, 8, 10, 11])
+        self.assertEqual(self.second.num_pulled, 2)
+
+    def test_page_past_the_end_is_empty(self):
+        chained = gutils.ChainedList([self.first, self.second])
+        self.assertEqual(chained.get_slice(40, 10), [])
+
+
+class MapConcurrentlyTests(DjangoTestCase):
+    """Test that fanned out queries come back in order
+
+    """
+    def setUp(self):
+        super(MapConcurrentlyTests, self).setUp()
+
+    def tearDown(self):
+        super(MapConcurrentlyTests, self).tearDown()
+
+    def test_results_are_in_order(self):
+        def slow_square(i):
+            time.sleep(0.01 * (10 - i))
+            return i * i
+        self.assertEqual(gutils.map_concurrently(slow_square, range(10)),
+                         [i * i for i in range(10)])
+
+    def test_exceptions_are_raised(self):
+        def fail(i):
+            raise KeyError(i)
+        self.assertRaises(KeyError, gutils.map_concurrently, fail, range(3))
+
+
+class FakeLookupSession(object):
+    """records how many objects were loaded"""
+    def __init__(self, catalog_id):
+        self.catalog_id = catalog_id
+        self.num_lookups = 0
+
+    def get_asset(self, asset_id):
+        self.num_lookups += 1
+        lookup_session = self
+
+        class FakeAsset(object):
+            object_map = {
+                'id': str(asset_id),
+                'repositoryId': lookup_session.catalog_id
+            }
+        return FakeAsset()
+
+
+class FakeCatalog(object):
+    """wraps a provider catalog, like the services catalogs"""
+    def __init__(self, provider_manager, catalog, runtime, proxy):
+        self._provider_manager = provider_manager
+        self._catalog = catalog
+        self._runtime = runtime
+        self._proxy = proxy
+        self.federated = False
+
+    def use_federated_repository_view(self):
+        self.federated = True
+
+
+class FakeCatalogManager(object):
+    """records how many catalogs were loaded"""
+    def __init__(self):
+        self.num_lookups = 0
+
+    def get_repository(self, repository_id):
+        self.num_lookups += 1
+        return FakeCatalog(self, object(), None, None)
+
+
+class CatalogCacheTests(DjangoTestCase):
+    """Test that object catalog ids are cached across requests, and
+    catalogs within a request
+
+    """
+    def setUp(self):
+        super(CatalogCacheTests, self).setUp()
+        self.asset_id = 'repository.Asset%3A000000000000000000000001%40ODL.MIT.EDU'
+        self.repository_id = 'repository.Repository%3A000000000000000000000002%40ODL.MIT.EDU'
+        self.lookup_session = FakeLookupSession(self.repository_id)
+        gutils.forget_object_catalog_id(self.asset_id)
+
+    def tearDown(self):
+        gutils.clear_request_catalogs()
+        super(CatalogCacheTests, self).tearDown()
+
+    def get_catalog_id(self):
+        return gutils.get_object_catalog_id(lambda: self.lookup_session,
+                                            self.asset_id,
+                                            'asset',
+                                            'repositoryId')
+
+    def test_object_is_only_loaded_once(self):
+        self.assertEqual(self.get_catalog_id(), self.repository_id)
+        self.assertEqual(self.get_catalog_id(), self.repository_id)
+        self.assertEqual(self.lookup_session.num_lookups, 1)
+
+    def test_forgetting_object_loads_it_again(self):
+        self.get_catalog_id()
+        gutils.forget_object_catalog_id(self.asset_id)
+        self.get_catalog_id()
+        self.assertEqual(self.lookup_session.num_lookups, 2)
+
+    def test_catalogs_are_reused_within_a_request(self):
+        manager = FakeCatalogManager()
+        gutils.clear_request_catalogs(start_request=True)
+        first = gutils.get_catalog(manager, 'repository', self.repository_id)
+        second = gutils.get_catalog(manager, 'repository', self.repository_id)
+        self.assertIs(first._catalog, second._catalog)
+        self.assertEqual(manager.num_lookups, 1)
+
+    def test_reused_catalogs_do_not_share_views(self):
+        manager = FakeCatalogManager()
+        gutils.clear_request_catalogs(start_request=True)
+        gutils.get_catalog(manager, 'repository', self.repository_id).use_federated_repository_view()
+        self.assertFalse(gutils.get_catalog(manager, 'repository', self.repository_id).federated)
+
+    def test_catalogs_are_not_reused_outside_of_requests(self):
+        manager = FakeCatalogManager()
+        gutils.clear_request_catalogs()
+        gutils.get_catalog(manager, 'repository', self.repository_id)
+        gutils.get_catalog(manager, 'repository', self.repository_id)
+        self.assertEqual(manager.num_lookups, 2)
+
+
+class OlxDownloadTests(DjangoTestCase):
+    """Test that exported OLX is streamed in chunks
+
+    """
+    def setUp(self):
+        super(OlxDownloadTests, self).setUp()
+        self.olx = StringIO('x' * (gutils.OLX_DOWNLOAD_CHUNK_SIZE * 2 + 10))
+        self.olx.seek(0, os.SEEK_END)
+
+    def tearDown(self):
+        super(OlxDownloadTests, self).tearDown()
+
+    def test_olx_is_streamed_in_chunks(self):
+        response = gutils.get_olx_download_response('course.tar.gz', self.olx)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=course.tar.gz')
+
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(''.join(chunks)), gutils.OLX_DOWNLOAD_CHUNK_SIZE * 2 + 10)
+        self.assertTrue(self.olx.closed)
@@ -0,0 +1,75 @@
+import os
+import time
+import shutil
+import tempfile
+
+from StringIO import StringIO
+
+from utilities import imports as iutils
+from utilities.testing import DjangoTestCase
+
+
+class ImportJournalTests(DjangoTestCase):
+    """Test that import checkpoints are kept per upload and repository
+
+    """
+    def setUp(self):
+        super(ImportJournalTests, self).setUp()
+        self.original_journal_root = iutils.IMPORT_JOURNAL_ROOT
+        iutils.IMPORT_JOURNAL_ROOT = tempfile.mkdtemp()
+        self.repository_id = 'repository.Repository%3A000000000000000000000001%40ODL.MIT.EDU'
+        self.import_key = iutils.get_import_key(StringIO('course'), self.repository_id)
+        self.journal = iutils.ImportJournal(self.import_key)
+
+    def tearDown(self):
+        shutil.rmtree(iutils.IMPORT_JOURNAL_ROOT, ignore_errors=True)
+        iutils.IMPORT_JOURNAL_ROOT = self.original_journal_root
+        super(ImportJournalTests, self).tearDown()
+
+    def test_same_upload_gets_same_journal(self):
+        self.journal.mark_done('course')
+        journal = iutils.ImportJournal(iutils.get_import_key(StringIO('course'), self.repository_id))
+        self.assertTrue(journal.is_done('course'))
+
+    def test_other_repository_gets_other_journal(self):
+        other_repository_id = 'repository.Repository%3A000000000000000000000002%40ODL.MIT.EDU'
+        self.assertNotEqual(iutils.get_import_key(StringIO('course'), other_repository_id),
+                            self.import_key)
+
+    def test_done_ids_are_collected_per_stage(self):
+        self.journal.add_done_ids('assets', ['asset1', 'asset2'])
+        self.journal.add_done_ids('assets', ['asset2', 'asset3'])
+        self.journal.add_done_ids('items', ['item1'])
+        self.assertEqual(self.journal.get_done_ids('assets'), set(['asset1', 'asset2', 'asset3']))
+        self.assertFalse(self.journal.is_done('assets'))
+
+    def test_partial_lines_are_ignored(self):
+        self.journal.add_done_ids('assets', ['asset1'])
+        with open(self.journal.path, 'a') as journal:
+            journal.write('{"ids": ["asset2"')
+        self.assertEqual(self.journal.get_done_ids('assets'), set(['asset1']))
+
+    def test_deleted_journal_starts_over(self):
+        self.journal.mark_done('course')
+        self.journal.delete()
+        self.assertFalse(self.journal.is_done('course'))
+        self.assertEqual(self.journal.get_done_ids('assets'), set())
+
+    def test_expired_journal_starts_over(self):
+        self.journal.mark_done('course')
+        expired = time.time() - iutils.IMPORT_JOURNAL_TTL - 1
+        os.utime(self.journal.path, (expired, expired))
+        self.assertFalse(self.journal.is_done('course'))
+        self.assertFalse(os.path.exists(self.journal.path))
+
+    def test_expired_journals_are_deleted(self):
+        self.journal.mark_done('course')
+        other_journal = iutils.ImportJournal(iutils.get_import_key(StringIO('other'),
+                                                                   self.repository_id))
+        other_journal.mark_done('course')
+        expired = time.time() - iutils.IMPORT_JOURNAL_TTL - 1
+        os.utime(other_journal.path, (expired, expired))
+
+        iutils.delete_expired_journals()
+        self.assertTrue(os.path.exists(self.journal.path))
+        self.assertFalse(os.path.exists(other_journal.path))
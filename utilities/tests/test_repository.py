@@ -0,0 +1,219 @@
+import time
+import json
+import base64
+import shutil
+import tempfile
+
+from StringIO import StringIO
+
+from dlkit.runtime.errors import IllegalState
+from dlkit.runtime.primitives import Id
+
+from utilities import repository as rutils
+from utilities.testing import DjangoTestCase
+
+
+class FakeAssetContent(object):
+    """records how many URLs were signed"""
+    def __init__(self, identifier, expires_in=3600):
+        self.ident = Id('repository.AssetContent%3A{0}%40ODL.MIT.EDU'.format(identifier))
+        self.expires_in = expires_in
+        self.num_signed = 0
+
+    def get_url(self):
+        if self.expires_in is None:
+            raise IllegalState()
+        self.num_signed += 1
+        return 'https://foo.cloudfront.net/{0}?Expires={1}&Signature=abc&Key-Pair-Id=def'.format(
+            self.ident.identifier,
+            int(time.time()) + self.expires_in)
+
+
+class SignedUrlCacheTests(DjangoTestCase):
+    """Test that signed asset content URLs are cached until
+    shortly before they expire
+
+    """
+    def setUp(self):
+        super(SignedUrlCacheTests, self).setUp()
+        self.asset_contents = [FakeAssetContent(i) for i in range(5)]
+
+    def tearDown(self):
+        super(SignedUrlCacheTests, self).tearDown()
+
+    def test_urls_are_signed_once(self):
+        first_urls = rutils.get_asset_content_urls(self.asset_contents)
+        second_urls = rutils.get_asset_content_urls(self.asset_contents)
+        self.assertEqual(first_urls, second_urls)
+        self.assertEqual(len(first_urls), 5)
+        for asset_content in self.asset_contents:
+            self.assertEqual(asset_content.num_signed, 1)
+
+    def test_urls_about_to_expire_are_not_cached(self):
+        asset_content = FakeAssetContent('soon', expires_in=rutils.SIGNED_URL_EXPIRATION_MARGIN - 1)
+        rutils.get_asset_content_urls([asset_content])
+        rutils.get_asset_content_urls([asset_content])
+        self.assertEqual(asset_content.num_signed, 2)
+
+    def test_asset_contents_without_urls_are_left_out(self):
+        urls = rutils.get_asset_content_urls([FakeAssetContent('none', expires_in=None)])
+        self.assertEqual(urls, {})
+
+    def test_can_read_expiration_from_custom_policy(self):
+        policy = base64.b64encode(json.dumps({
+            'Statement': [{
+                'Resource': 'https://foo.cloudfront.net/bar',
+                'Condition': {
+                    'DateLessThan': {
+                        'AWS:EpochTime': 1500000000
+                    }
+                }
+            }]
+        })).replace('+', '-').replace('=', '_').replace('/', '~')
+        url = 'https://foo.cloudfront.net/bar?Policy={0}&Signature=abc'.format(policy)
+        self.assertEqual(rutils.get_signed_url_expiration(url), 1500000000)
+
+    def test_unsigned_urls_have_no_expiration(self):
+        self.assertIsNone(rutils.get_signed_url_expiration('https://foo.s3.amazonaws.com/bar'))
+
+
+class FakeAsset(object):
+    def __init__(self, identifier, repository_id):
+        self.ident = Id('repository.Asset%3A{0}%40ODL.MIT.EDU'.format(identifier))
+        self.repository_id = repository_id
+        self.asset_contents = [FakeAssetContent(identifier)]
+
+    @property
+    def object_map(self):
+        return {
+            'id': str(self.ident),
+            'repositoryId': self.repository_id,
+            'assetContents': [{
+                'id': str(asset_content.ident),
+                'url': ''
+            } for asset_content in self.asset_contents]
+        }
+
+    def get_asset_contents(self):
+        return iter(self.asset_contents)
+
+
+class FakeRepository(object):
+    def __init__(self, assets):
+        self.assets = dict((str(asset.ident), asset) for asset in assets)
+        self.num_lookups = 0
+
+    def get_asset(self, asset_id):
+        self.num_lookups += 1
+        return self.assets[str(asset_id)]
+
+
+class FakeManager(object):
+    def __init__(self, repositories):
+        self.repositories = repositories
+        self.num_lookups = 0
+
+    def get_repository(self, repository_id):
+        self.num_lookups += 1
+        return self.repositories[str(repository_id)]
+
+
+class AssetUrlsByRepositoryTests(DjangoTestCase):
+    """Test that a page of assets from different repositories looks up
+    each repository once, and reuses the asset objects it already has
+
+    """
+    def setUp(self):
+        super(AssetUrlsByRepositoryTests, self).setUp()
+        repository_ids = ['repository.Repository%3A{0}%40ODL.MIT.EDU'.format(i) for i in range(2)]
+        self.assets = [FakeAsset(i, repository_ids[i % 2]) for i in range(6)]
+        self.repositories = dict((repository_id,
+                                  FakeRepository([asset for asset in self.assets
+                                                  if asset.repository_id == repository_id]))
+                                 for repository_id in repository_ids)
+        self.manager = FakeManager(self.repositories)
+
+    def tearDown(self):
+        super(AssetUrlsByRepositoryTests, self).tearDown()
+
+    def test_asset_objects_are_reused(self):
+        asset_maps = [asset.object_map for asset in self.assets]
+        asset_objects = dict((str(asset.ident), asset) for asset in self.assets)
+        rutils.update_assets_urls_by_repository(self.manager, asset_maps, asset_objects=asset_objects)
+        self.assertEqual(self.manager.num_lookups, 0)
+        for asset_map in asset_maps:
+            self.assertIn('Expires=', asset_map['assetContents'][0]['url'])
+
+    def test_each_repository_is_looked_up_once(self):
+        asset_maps = [asset.object_map for asset in self.assets]
+        rutils.update_assets_urls_by_repository(self.manager, asset_maps)
+        self.assertEqual(self.manager.num_lookups, 2)
+        for repository in self.repositories.values():
+            self.assertEqual(repository.num_lookups, 3)
+
+
+class ExportArtifactTests(DjangoTestCase):
+    """Test that exported OLX is kept on disk per repository version
+
+    """
+    def setUp(self):
+        super(ExportArtifactTests, self).setUp()
+        self.original_export_root = rutils.EXPORT_ROOT
+        rutils.EXPORT_ROOT = tempfile.mkdtemp()
+        self.repository_id = 'repository.Repository%3A000000000000000000000001%40ODL.MIT.EDU'
+
+    def tearDown(self):
+        shutil.rmtree(rutils.EXPORT_ROOT, ignore_errors=True)
+        rutils.EXPORT_ROOT = self.original_export_root
+        super(ExportArtifactTests, self).tearDown()
+
+    def test_can_reopen_saved_artifact(self):
+        self.assertIsNone(rutils.open_export_artifact(self.repository_id, 'v1'))
+        rutils.save_export_artifact(self.repository_id, 'v1', 'course.tar.gz', StringIO('olx'))
+
+        filename, artifact = rutils.open_export_artifact(self.repository_id, 'v1')
+        self.assertEqual(filename, 'course.tar.gz')
+        self.assertEqual(artifact.read(), 'olx')
+        artifact.close()
+
+    def test_new_version_replaces_old_artifact(self):
+        rutils.save_export_artifact(self.repository_id, 'v1', 'course.tar.gz', StringIO('old'))
+        rutils.save_export_artifact(self.repository_id, 'v2', 'course.tar.gz', StringIO('new'))
+        self.assertIsNone(rutils.open_export_artifact(self.repository_id, 'v1'))
+
+        filename, artifact = rutils.open_export_artifact(self.repository_id, 'v2')
+        self.assertEqual(artifact.read(), 'new')
+        artifact.close()
+
+    def test_artifact_is_served_with_its_filename(self):
+        rutils.save_export_artifact(self.repository_id, 'v1', 'exports/course.tar.gz', StringIO('olx'))
+        self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+
+        filename, artifact = rutils.open_export_artifact(self.repository_id, 'v1')
+        self.assertEqual(filename, 'course.tar.gz')
+        artifact.close()
+        rutils.finish_export(self.repository_id, 'v1')
+
+    def test_only_one_export_per_version(self):
+        self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        self.assertFalse(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        rutils.finish_export(self.repository_id, 'v1')
+        self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        rutils.finish_export(self.repository_id, 'v1')
+
+    def test_stale_export_lock_is_taken_over(self):
+        self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        original_timeout = rutils.EXPORT_LOCK_TIMEOUT
+        rutils.EXPORT_LOCK_TIMEOUT = -1
+        try:
+            self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        finally:
+            rutils.EXPORT_LOCK_TIMEOUT = original_timeout
+        rutils.finish_export(self.repository_id, 'v1')
+
+    def test_everyone_waiting_for_an_export_is_returned_once(self):
+        self.assertTrue(rutils.start_export(self.repository_id, 'v1', 'user1'))
+        self.assertFalse(rutils.start_export(self.repository_id, 'v1', 'user2'))
+        self.assertFalse(rutils.start_export(self.repository_id, 'v1', 'user2'))
+        self.assertEqual(rutils.finish_export(self.repository_id, 'v1'), ['user1', 'user2'])
+        self.assertEqual(rutils.finish_export(self.repository_id, 'v1'), [])
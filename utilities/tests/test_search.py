@@ -0,0 +1,187 @@
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from utilities import search as sutils
+from utilities.testing import DjangoTestCase
+
+
+DOMAIN_ID = 'repository.Repository%3A000000000000000000000001%40ODL.MIT.EDU'
+RUN_ID = 'repository.Repository%3A000000000000000000000002%40ODL.MIT.EDU'
+RUN_BANK_ID = 'assessment.Bank%3A000000000000000000000002%40ODL.MIT.EDU'
+OTHER_RUN_ID = 'repository.Repository%3A000000000000000000000003%40ODL.MIT.EDU'
+
+
+class FacetIndexTests(DjangoTestCase):
+    """Test that the shared facet index is dropped when objects
+    in one of its runs change
+
+    """
+    def setUp(self):
+        super(FacetIndexTests, self).setUp()
+        self.signature = sutils.get_query_signature(None, None, None, False)
+        self.index = {
+            RUN_ID: {
+                'total': 1,
+                'resource_type': {},
+                'learning_objective': {}
+            }
+        }
+        sutils.set_facet_index(DOMAIN_ID, self.signature, self.index,
+                               sutils.get_generations(DOMAIN_ID, [RUN_ID]))
+
+    def tearDown(self):
+        super(FacetIndexTests, self).tearDown()
+
+    def test_can_read_index(self):
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), self.index)
+
+    def test_other_filters_have_their_own_index(self):
+        signature = sutils.get_query_signature(None, None, ['foo'], False)
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, signature), {})
+
+    def test_changing_run_invalidates_index(self):
+        sutils.invalidate_search_caches(RUN_ID)
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), {})
+
+    def test_changing_run_bank_invalidates_index(self):
+        sutils.invalidate_search_caches(RUN_BANK_ID)
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), {})
+
+    def test_changing_unrelated_run_keeps_index(self):
+        sutils.invalidate_search_caches(OTHER_RUN_ID)
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), self.index)
+
+    def test_missing_generation_invalidates_index(self):
+        cache.delete(sutils._get_cache_key('generation', sutils._get_catalog_key(RUN_ID)))
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), {})
+
+    def test_index_built_during_a_change_is_ignored(self):
+        generations = sutils.get_generations(DOMAIN_ID, [RUN_ID])
+        sutils.invalidate_search_caches(RUN_ID)
+        sutils.set_facet_index(DOMAIN_ID, self.signature, self.index, generations)
+        self.assertEqual(sutils.get_facet_index(DOMAIN_ID, self.signature), {})
+
+
+class RunMapTests(DjangoTestCase):
+    """Test that the cached run map is dropped when the repository
+    hierarchy changes
+
+    """
+    def setUp(self):
+        super(RunMapTests, self).setUp()
+        self.course_id = 'repository.Repository%3A000000000000000000000004%40ODL.MIT.EDU'
+        self.run_map = {
+            RUN_ID: 'course, run'
+        }
+        sutils.set_run_map(DOMAIN_ID, self.run_map,
+                           sutils.get_generations(DOMAIN_ID, [self.course_id, RUN_ID]))
+
+    def tearDown(self):
+        super(RunMapTests, self).tearDown()
+
+    def test_can_read_run_map(self):
+        self.assertEqual(sutils.get_run_map(DOMAIN_ID), self.run_map)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_cache_is_not_used(self):
+        self.assertIsNone(sutils.get_run_map(DOMAIN_ID))
+
+    def test_changing_domain_children_invalidates_run_map(self):
+        sutils.invalidate_search_caches(DOMAIN_ID)
+        self.assertIsNone(sutils.get_run_map(DOMAIN_ID))
+
+    def test_changing_course_children_invalidates_run_map(self):
+        sutils.invalidate_search_caches(self.course_id)
+        self.assertIsNone(sutils.get_run_map(DOMAIN_ID))
+
+    def test_run_map_built_during_a_change_is_ignored(self):
+        generations = sutils.get_generations(DOMAIN_ID, [self.course_id, RUN_ID])
+        sutils.invalidate_search_caches(DOMAIN_ID)
+        sutils.set_run_map(DOMAIN_ID, self.run_map, generations)
+        self.assertIsNone(sutils.get_run_map(DOMAIN_ID))
+
+
+class ObjectiveCountsTests(DjangoTestCase):
+    """Test that the learning objective counts are dropped when
+    objects in the domain change
+
+    """
+    def setUp(self):
+        super(ObjectiveCountsTests, self).setUp()
+        self.lo_1 = 'mc3-objective%3A1%40MIT-OEIT'
+        self.lo_2 = 'mc3-objective%3A2%40MIT-OEIT'
+        generations = sutils.get_generations(DOMAIN_ID, [RUN_ID])
+        sutils.set_run_map(DOMAIN_ID, {RUN_ID: 'course, run'}, generations)
+        sutils.set_objective_counts(DOMAIN_ID, {self.lo_1: 2}, generations)
+
+    def tearDown(self):
+        super(ObjectiveCountsTests, self).tearDown()
+
+    def test_can_read_counts(self):
+        self.assertEqual(sutils.get_objective_counts(DOMAIN_ID), {self.lo_1: 2})
+
+    def test_changing_run_drops_counts(self):
+        sutils.invalidate_search_caches(RUN_ID)
+        self.assertIsNone(sutils.get_objective_counts(DOMAIN_ID))
+
+    def test_changing_run_bank_drops_counts(self):
+        sutils.invalidate_search_caches(RUN_BANK_ID)
+        self.assertIsNone(sutils.get_objective_counts(DOMAIN_ID))
+
+    def test_counts_built_during_a_change_are_ignored(self):
+        generations = sutils.get_generations(DOMAIN_ID, [RUN_ID])
+        sutils.invalidate_search_caches(RUN_BANK_ID)
+        sutils.set_objective_counts(DOMAIN_ID, {self.lo_1: 3}, generations)
+        self.assertIsNone(sutils.get_objective_counts(DOMAIN_ID))
+
+    def test_objective_names_are_cached(self):
+        sutils.set_objective_names({self.lo_1: 'first'})
+        self.assertEqual(sutils.get_objective_names([self.lo_1, self.lo_2]), {self.lo_1: 'first'})
+
+
+class ExportVersionTests(DjangoTestCase):
+    """Test that cached export versions are dropped when any catalog
+    they were hashed from changes
+
+    """
+    def setUp(self):
+        super(ExportVersionTests, self).setUp()
+        self.user_repo_id = 'repository.Repository%3A000000000000000000000005%40ODL.MIT.EDU'
+        self.set_version()
+        # the first hash finds the user repository, so hash again
+        self.set_version()
+
+    def tearDown(self):
+        super(ExportVersionTests, self).tearDown()
+
+    def set_version(self):
+        generations = sutils.get_export_generations(RUN_ID, [DOMAIN_ID])
+        sutils.set_export_version(RUN_ID, 'v1', generations, [RUN_ID, DOMAIN_ID, self.user_repo_id])
+
+    def test_can_read_version(self):
+        self.assertEqual(sutils.get_export_version(RUN_ID), 'v1')
+
+    def test_changing_run_drops_version(self):
+        sutils.invalidate_search_caches(RUN_ID)
+        self.assertIsNone(sutils.get_export_version(RUN_ID))
+
+    def test_changing_repository_of_an_object_drops_version(self):
+        sutils.invalidate_search_caches(self.user_repo_id)
+        self.assertIsNone(sutils.get_export_version(RUN_ID))
+
+    def test_changing_unrelated_run_keeps_version(self):
+        sutils.invalidate_search_caches(OTHER_RUN_ID)
+        self.assertEqual(sutils.get_export_version(RUN_ID), 'v1')
+
+    def test_version_with_new_catalogs_is_served_after_next_hash(self):
+        cache.clear()
+        self.set_version()
+        self.assertIsNone(sutils.get_export_version(RUN_ID))
+        self.set_version()
+        self.assertEqual(sutils.get_export_version(RUN_ID), 'v1')
+
+    def test_version_hashed_during_a_change_is_ignored(self):
+        generations = sutils.get_export_generations(RUN_ID, [DOMAIN_ID])
+        sutils.invalidate_search_caches(self.user_repo_id)
+        sutils.set_export_version(RUN_ID, 'v2', generations, [RUN_ID, DOMAIN_ID, self.user_repo_id])
+        self.assertIsNone(sutils.get_export_version(RUN_ID))
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from utilities import search as sutils
+from utilities import snapshots as snutils
+from utilities.testing import DjangoTestCase
+
+
+COURSE_NODE_ID = 'repository.Composition%3A000000000000000000000001%40ODL.MIT.EDU'
+RUN_ID = 'repository.Repository%3A000000000000000000000002%40ODL.MIT.EDU'
+USER_REPO_ID = 'repository.Repository%3A000000000000000000000003%40ODL.MIT.EDU'
+OTHER_RUN_ID = 'repository.Repository%3A000000000000000000000004%40ODL.MIT.EDU'
+
+
+class TreeSnapshotTests(DjangoTestCase):
+    """Test that tree snapshots are ignored once the tree version of
+    one of their repositories changes
+
+    """
+    def setUp(self):
+        super(TreeSnapshotTests, self).setUp()
+        self.tree = {
+            'id': COURSE_NODE_ID,
+            'assignedRepositoryIds': [RUN_ID],
+            'children': [{
+                'id': 'repository.Asset%3A000000000000000000000005%40ODL.MIT.EDU',
+                'assignedRepositoryIds': [USER_REPO_ID]
+            }]
+        }
+        self.set_snapshot()
+        # the first build finds the user repository, so build again
+        self.set_snapshot()
+
+    def set_snapshot(self):
+        versions = snutils.get_tree_versions([RUN_ID], 'user1', 'tree', COURSE_NODE_ID)
+        snutils.set_tree_snapshot(versions, self.tree, 'user1', 'tree', COURSE_NODE_ID)
+
+    def tearDown(self):
+        super(TreeSnapshotTests, self).tearDown()
+
+    def test_can_read_snapshot(self):
+        self.assertEqual(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID), self.tree)
+
+    def test_snapshots_are_per_user(self):
+        self.assertIsNone(snutils.get_tree_snapshot('user2', 'tree', COURSE_NODE_ID))
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_cache_is_not_used(self):
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))
+
+    def test_bumping_version_invalidates_snapshot(self):
+        snutils.bump_tree_version(RUN_ID)
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))
+
+    def test_bumping_version_of_child_repository_invalidates_snapshot(self):
+        snutils.bump_tree_version(USER_REPO_ID)
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))
+
+    def test_bumping_version_of_other_repository_keeps_snapshot(self):
+        snutils.bump_tree_version(OTHER_RUN_ID)
+        self.assertEqual(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID), self.tree)
+
+    def test_snapshot_with_new_repositories_is_served_after_next_build(self):
+        cache.clear()
+        self.set_snapshot()
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))
+        self.set_snapshot()
+        self.assertEqual(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID), self.tree)
+
+    def test_changing_objects_invalidates_snapshot(self):
+        sutils.invalidate_search_caches(RUN_ID)
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))
+
+    def test_snapshot_built_during_a_change_is_ignored(self):
+        versions = snutils.get_tree_versions([RUN_ID], 'user1', 'tree', COURSE_NODE_ID)
+        snutils.bump_tree_version(USER_REPO_ID)
+        snutils.set_tree_snapshot(versions, self.tree, 'user1', 'tree', COURSE_NODE_ID)
+        self.assertIsNone(snutils.get_tree_snapshot('user1', 'tree', COURSE_NODE_ID))